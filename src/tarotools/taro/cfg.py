@@ -66,6 +66,11 @@ DEF_PERSISTENCE_TYPE = 'sqlite'
 DEF_PERSISTENCE_MAX_AGE = ''
 DEF_PERSISTENCE_MAX_RECORDS = -1
 DEF_PERSISTENCE_DATABASE = ''
+DEF_PERSISTENCE_JOURNAL_MODE = 'wal'
+DEF_PERSISTENCE_SYNCHRONOUS = 'normal'
+DEF_PERSISTENCE_BUSY_TIMEOUT = 5000
+DEF_PERSISTENCE_MMAP_SIZE = 0
+DEF_PERSISTENCE_READ_POOL_SIZE = 4
 
 DEF_LOCK_TIMEOUT = 10
 DEF_LOCK_MAX_CHECK_TIME = 0.05
@@ -87,6 +92,11 @@ persistence_type = DEF_PERSISTENCE_TYPE
 persistence_max_age = DEF_PERSISTENCE_MAX_AGE
 persistence_max_records = DEF_PERSISTENCE_MAX_RECORDS
 persistence_database = DEF_PERSISTENCE_DATABASE
+persistence_journal_mode = DEF_PERSISTENCE_JOURNAL_MODE
+persistence_synchronous = DEF_PERSISTENCE_SYNCHRONOUS
+persistence_busy_timeout = DEF_PERSISTENCE_BUSY_TIMEOUT
+persistence_mmap_size = DEF_PERSISTENCE_MMAP_SIZE
+persistence_read_pool_size = DEF_PERSISTENCE_READ_POOL_SIZE
 
 lock_timeout_sec = DEF_LOCK_TIMEOUT
 lock_max_check_time_sec = DEF_LOCK_MAX_CHECK_TIME
@@ -120,6 +130,8 @@ def set_variables(**kwargs):
 def set_minimal_config():
     global log_mode, log_stdout_level, log_file_level, log_file_path, log_timing
     global persistence_enabled, persistence_type, persistence_max_age, persistence_max_records, persistence_database
+    global persistence_journal_mode, persistence_synchronous, persistence_busy_timeout, persistence_mmap_size
+    global persistence_read_pool_size
     global lock_timeout_sec, lock_max_check_time_sec
     global plugins_enabled, plugins_load
 
@@ -134,6 +146,11 @@ def set_minimal_config():
     persistence_max_age = ''
     persistence_max_records = -1
     persistence_database = ''
+    persistence_journal_mode = 'delete'
+    persistence_synchronous = 'full'
+    persistence_busy_timeout = 0
+    persistence_mmap_size = 0
+    persistence_read_pool_size = 0
 
     lock_timeout_sec = 10000
     lock_max_check_time_sec = 50
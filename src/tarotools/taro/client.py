@@ -1,21 +1,45 @@
 """
 This module provides classes and functions for communicating with active job instances.
+
+The API servers are implemented by the job instances, not by this package. Some of the requests rely on server
+features which servers of older versions do not provide, each of them is handled by the client:
+    > Output pages (`since`, `max_bytes`, `next_cursor`) and long-polling (`wait`): the whole retained output
+      is returned instead and `follow_output` does not follow the instance further. Servers must cap the `wait`
+      value to `MAX_OUTPUT_WAIT` and must not wait at all when they handle the requests on their only serving thread
+      (see `SocketServer.has_workers`), otherwise a follower would hold all other requests to the instance.
+    > Echoing `request_metadata.request_id` in the response metadata: responses without the ID are accepted.
+    > The output search API (`/instances/output/search`): servers not providing it reply with the not found error,
+      which is included in the errors of the response.
+    > The batch API (`/batch`): servers not providing it reply with the not found error, which is included
+      in the errors of each call of the batch. The calls can then be sent one by one.
 """
 
+import asyncio
+import errno
 import json
 import logging
+import socket
+import uuid
+from contextlib import contextmanager
 from dataclasses import dataclass
 from enum import Enum, auto
 from json import JSONDecodeError
-from typing import List, Any, Dict, NamedTuple, Optional, TypeVar, Generic, Callable, Tuple
+from threading import Lock
+from typing import List, Any, Dict, NamedTuple, Optional, TypeVar, Generic, Callable, Tuple, Iterator, Union
 
 from tarotools.taro import paths
-from tarotools.taro.job import JobInstanceMetadata, JobRun
-from tarotools.taro.util.socket import SocketClient, ServerResponse, Error
+from tarotools.taro.job import JobInstanceMetadata, JobRun, JobRunView, JOB_RUN_FIELDS
+from tarotools.taro.output import OutputMatch
+from tarotools.taro.util.discovery import SocketDiscovery
+from tarotools.taro.util.socket import SocketClient, ServerResponse, Error, PayloadTooLarge, RECV_BUFFER_LENGTH, \
+    FRAME_HEADER, frame
 
 log = logging.getLogger(__name__)
 
 API_FILE_EXTENSION = '.api'
+BATCH_API = '/batch'
+DEFAULT_OUTPUT_PAGE_BYTES = 32768  # Leaves enough space for the response envelope in a single datagram
+MAX_OUTPUT_WAIT = 5  # Seconds, the maximum long-polling wait for output, longer values are capped
 
 
 class InstanceResponse(NamedTuple):
@@ -143,6 +167,12 @@ class StopResponse(JobInstanceResponse):
 @dataclass
 class OutputResponse(JobInstanceResponse):
     output: List[Tuple[str, bool]]
+    next_cursor: Optional[int] = None
+
+
+@dataclass
+class OutputSearchResponse(JobInstanceResponse):
+    matches: List[OutputMatch]
 
 
 @dataclass
@@ -151,13 +181,15 @@ class SignalProceedResponse(JobInstanceResponse):
     executed: bool
 
 
-def get_active_runs(run_match=None) -> AggregatedResponse[JobRun]:
+def get_active_runs(run_match=None, *, fields=()) -> AggregatedResponse[JobRun]:
     """
     Retrieves instance information for all active job instances for the current user.
 
     Args:
         run_match (JobRunAggregatedCriteria, optional):
             A filter for instance matching. If provided, only instances that match will be included.
+        fields (Iterable[str], optional):
+            Retrieve only these fields as :class:`JobRunView` objects. See `APIClient.get_active_runs`.
 
     Returns:
         A container holding the :class:`JobRun` objects that represent job instances.
@@ -167,8 +199,8 @@ def get_active_runs(run_match=None) -> AggregatedResponse[JobRun]:
         PayloadTooLarge: If the payload size exceeds the maximum limit.
     """
 
-    with APIClient() as client:
-        return client.get_active_runs(run_match)
+    with pooled_client() as client:
+        return client.get_active_runs(run_match, fields=fields)
 
 
 def approve_pending_instances(phase_name, instance_match=None) -> AggregatedResponse[ApprovalResponse]:
@@ -188,7 +220,7 @@ def approve_pending_instances(phase_name, instance_match=None) -> AggregatedResp
         It also includes any errors that may have happened, each one related to a specific server API.
     """
 
-    with APIClient() as client:
+    with pooled_client() as client:
         return client.approve_pending_instances(phase_name, instance_match)
 
 
@@ -209,11 +241,11 @@ def stop_instances(run_match) -> AggregatedResponse[StopResponse]:
         The stop operation might not succeed if the instance doesn't correctly handle stop/terminate signals.
     """
 
-    with APIClient() as client:
+    with pooled_client() as client:
         return client.stop_instances(run_match)
 
 
-def fetch_output(run_match=None) -> AggregatedResponse[OutputResponse]:
+def fetch_output(run_match=None, *, since=None, max_bytes=0) -> AggregatedResponse[OutputResponse]:
     """
     This function requests the last lines of the output from job instances that optionally match the provided criteria.
 
@@ -221,29 +253,366 @@ def fetch_output(run_match=None) -> AggregatedResponse[OutputResponse]:
         run_match (InstanceMatchCriteria, optional):
             The operation will affect only instances matching these criteria.
             If not provided, the tail of all instances is read.
+        since (int, Dict[str, int], optional):
+            Read a page of the output starting at this cursor. See `APIClient.fetch_output` for details.
+        max_bytes (int, optional):
+            The maximum size of the page. Used only in combination with the `since` argument.
 
     Returns:
         A container holding :class:`TailResponse` objects, each containing last lines for a respective job instance.
         It also includes any errors that may have happened, each one related to a specific server API.
     """
 
-    with APIClient() as client:
-        return client.fetch_output(run_match)
+    with pooled_client() as client:
+        return client.fetch_output(run_match, since=since, max_bytes=max_bytes)
+
+
+def follow_output(run_match=None, *, since=0, max_bytes=DEFAULT_OUTPUT_PAGE_BYTES, wait=1) \
+        -> Iterator[OutputResponse]:
+    """
+    Generator yielding new pages of the output of job instances matching the provided criteria.
+    See `APIClient.follow_output` for details.
+    """
+
+    with APIClient(timeout=min(wait, MAX_OUTPUT_WAIT) + 2) as client:
+        yield from client.follow_output(run_match, since=since, max_bytes=max_bytes, wait=wait)
+
+
+def search_output(pattern, run_match=None, *, ignore_case=False) -> AggregatedResponse[OutputSearchResponse]:
+    """
+    This function searches the output of job instances that optionally match the provided criteria.
+
+    Args:
+        pattern (str, mandatory):
+            The text to search for.
+        run_match (InstanceMatchCriteria, optional):
+            The operation will affect only instances matching these criteria.
+            If not provided, the output of all instances is searched.
+        ignore_case (bool, optional):
+            Whether the search is case-insensitive. Defaults to False.
+
+    Returns:
+        A container holding :class:`OutputSearchResponse` objects, each containing matching lines
+        for a respective job instance.
+        It also includes any errors that may have happened, each one related to a specific server API.
+    """
+
+    with pooled_client() as client:
+        return client.search_output(pattern, run_match, ignore_case=ignore_case)
 
 
 def signal_dispatch(instance_match) -> AggregatedResponse[SignalProceedResponse]:
-    with APIClient() as client:
+    with pooled_client() as client:
         return client.signal_dispatch(instance_match)
 
 
+def send_batch(batch) -> List[AggregatedResponse]:
+    """
+    Sends all calls of the batch to each API in a single request. See `APIClient.send_batch`.
+    """
+    with pooled_client() as client:
+        return client.send_batch(batch)
+
+
+DEFAULT_POOL_MAX_IDLE = 8
+
+_discovery: Optional[SocketDiscovery] = None
+_discovery_lock = Lock()
+_pool: Optional['APIClientPool'] = None
+_pool_lock = Lock()
+
+
+def api_discovery() -> SocketDiscovery:
+    """
+    Returns the process-wide cache of the API sockets shared by all clients. The janitor thread removing the stale
+    sockets is started lazily, when a client detects the first stale socket.
+
+    Returns:
+        SocketDiscovery: The discovery of the API sockets.
+    """
+    global _discovery
+    with _discovery_lock:
+        if _discovery is None:
+            _discovery = SocketDiscovery(lambda: paths.socket_dir(False), API_FILE_EXTENSION)
+            _discovery.start_janitor(lazy=True)
+        return _discovery
+
+
 def _no_resp_mapper(api_instance_response: InstanceResponse) -> InstanceResponse:
     return api_instance_response
 
 
-class APIClient(SocketClient):
+class APICall(NamedTuple):
+    """
+    A single call of an instance API.
+
+    Attributes:
+        api: The API path.
+        run_match: Criteria for instances the call is applied to.
+        req_body: The body of the request specific to the API.
+        resp_mapper: Function creating the response object from an instance response.
+        fields: Fields to include in the serialized instances (supported only by some APIs).
+    """
+    api: str
+    run_match: Any = None
+    req_body: Optional[Dict[str, Any]] = None
+    resp_mapper: Callable[[InstanceResponse], Any] = _no_resp_mapper
+    fields: Tuple[str, ...] = ()
+
+
+def _call_body(call: APICall) -> Dict[str, Any]:
+    body = dict(call.req_body) if call.req_body else {}
+    body["request_metadata"] = {"api": call.api}
+    if call.run_match and call.run_match.job_run_id_criteria:
+        body["request_metadata"]["run_match"] = call.run_match.serialize()
+    if call.fields:
+        body["request_metadata"]["fields"] = list(call.fields)
+    return body
+
+
+def _encode_request(call: APICall) -> Tuple[str, str]:
+    """
+    Returns:
+        Tuple[str, str]: The encoded request and its correlation ID.
+    """
+    request_id = uuid.uuid4().hex
+    req_body = _call_body(call)
+    req_body["request_metadata"]["request_id"] = request_id
+    return json.dumps(req_body), request_id
+
+
+def _encode_batch(calls: List[APICall]) -> Tuple[str, str]:
+    request_id = uuid.uuid4().hex
+    req_body = {
+        "request_metadata": {"api": BATCH_API, "request_id": request_id},
+        "requests": [_call_body(call) for call in calls],
+    }
+    return json.dumps(req_body), request_id
+
+
+def _job_run_mapper(inst_resp: InstanceResponse) -> JobRun:
+    return JobRun.deserialize(inst_resp.body["job_run"])
+
+
+def _job_run_view_mapper(inst_resp: InstanceResponse) -> JobRunView:
+    return JobRunView.deserialize(inst_resp.body["job_run"], inst_resp.instance_meta)
+
+
+def _approve_resp_mapper(inst_resp: InstanceResponse) -> ApprovalResponse:
+    try:
+        release_res = ApprovalResult[inst_resp.body["approval_result"].upper()]
+    except KeyError:
+        release_res = ApprovalResult.UNKNOWN
+    return ApprovalResponse(inst_resp.instance_meta, release_res)
+
+
+def _stop_resp_mapper(inst_resp: InstanceResponse) -> StopResponse:
+    return StopResponse(inst_resp.instance_meta, StopResult[inst_resp.body["stop_result"].upper()])
+
+
+def _output_resp_mapper(inst_resp: InstanceResponse) -> OutputResponse:
+    return OutputResponse(inst_resp.instance_meta, inst_resp.body["output"], inst_resp.body.get("next_cursor"))
+
+
+def _search_resp_mapper(inst_resp: InstanceResponse) -> OutputSearchResponse:
+    matches = [OutputMatch(*match) for match in inst_resp.body["matches"]]
+    return OutputSearchResponse(inst_resp.instance_meta, matches)
+
+
+def _signal_dispatch_resp_mapper(inst_resp: InstanceResponse) -> SignalProceedResponse:
+    return SignalProceedResponse(inst_resp.instance_meta, inst_resp.body["waiter_found"], inst_resp.body["executed"])
+
+
+def _active_runs_call(run_match, fields) -> APICall:
+    if not fields:
+        return APICall('/instances', run_match, resp_mapper=_job_run_mapper)
+
+    unknown = set(fields) - set(JOB_RUN_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown job run fields: {sorted(unknown)}")
+    return APICall('/instances', run_match, resp_mapper=_job_run_view_mapper, fields=tuple(fields))
+
+
+def _approve_call(phase_name, instance_match) -> APICall:
+    if not phase_name:
+        raise ValueError("Missing phase name")
+    return APICall('/instances/approve', instance_match, {"phase": phase_name}, _approve_resp_mapper)
+
+
+def _stop_call(instance_match) -> APICall:
+    if not instance_match:
+        raise ValueError('Id matching criteria is mandatory for the stop operation')
+    return APICall('/instances/stop', instance_match, resp_mapper=_stop_resp_mapper)
+
+
+def _output_call(instance_match, since, max_bytes, wait) -> APICall:
+    req_body = None
+    if since is not None:
+        req_body = {"since": since, "max_bytes": max_bytes, "wait": min(wait, MAX_OUTPUT_WAIT)}
+    return APICall('/instances/output', instance_match, req_body, _output_resp_mapper)
+
+
+def _search_output_call(pattern, instance_match, ignore_case) -> APICall:
+    if not pattern:
+        raise ValueError("Missing search pattern")
+    req_body = {"pattern": pattern, "ignore_case": ignore_case}
+    return APICall('/instances/output/search', instance_match, req_body, _search_resp_mapper)
+
+
+def _signal_dispatch_call(instance_match) -> APICall:
+    return APICall('/instances/_signal/dispatch', instance_match, resp_mapper=_signal_dispatch_resp_mapper)
+
+
+class Batch:
+    """
+    Collects API calls to be sent together by `APIClient.send_batch`.
+    The methods mirror the methods of `APIClient` and return this batch to allow chaining.
+    """
 
     def __init__(self):
-        super().__init__(lambda: paths.socket_files(API_FILE_EXTENSION), bidirectional=True)
+        self.calls: List[APICall] = []
+
+    def add(self, call: APICall) -> 'Batch':
+        self.calls.append(call)
+        return self
+
+    def get_active_runs(self, run_match=None, *, fields=()) -> 'Batch':
+        return self.add(_active_runs_call(run_match, fields))
+
+    def approve_pending_instances(self, phase_name, instance_match=None) -> 'Batch':
+        return self.add(_approve_call(phase_name, instance_match))
+
+    def stop_instances(self, instance_match) -> 'Batch':
+        return self.add(_stop_call(instance_match))
+
+    def fetch_output(self, instance_match=None, *, since=None, max_bytes=0) -> 'Batch':
+        return self.add(_output_call(instance_match, since, max_bytes, 0))
+
+    def search_output(self, pattern, instance_match=None, *, ignore_case=False) -> 'Batch':
+        return self.add(_search_output_call(pattern, instance_match, ignore_case))
+
+    def signal_dispatch(self, instance_match) -> 'Batch':
+        return self.add(_signal_dispatch_call(instance_match))
+
+
+class APIClientPool:
+    """
+    Thread-safe pool of API clients allowing to reuse their bound sockets instead of binding a new socket
+    for each request. Each client is used by a single thread at a time. Late responses to earlier requests of a reused
+    client are recognized by the correlation ID of the request and ignored.
+    """
+
+    def __init__(self, max_idle=DEFAULT_POOL_MAX_IDLE, *, timeout=2, concurrent=True):
+        """
+        Args:
+            max_idle (int): The maximum number of idle clients kept in the pool. Surplus clients are closed.
+            timeout (float): Timeout of the clients, see `APIClient`.
+            concurrent (bool): Concurrent mode of the clients, see `APIClient`.
+        """
+        self._max_idle = max_idle
+        self._timeout = timeout
+        self._concurrent = concurrent
+        self._lock = Lock()
+        # Guarded by the lock:
+        self._idle: List[APIClient] = []
+        self._closed = False
+        # ----------------------- #
+
+    @contextmanager
+    def client(self) -> Iterator['APIClient']:
+        """
+        Borrows a client from the pool for the duration of the `with` block.
+        A client whose socket failed is closed instead of being returned to the pool.
+
+        Yields:
+            APIClient: A client reserved for the calling thread.
+        """
+        with self._lock:
+            client = self._idle.pop() if self._idle else None
+        if client is None:
+            client = APIClient(timeout=self._timeout, concurrent=self._concurrent)
+
+        try:
+            yield client
+        except OSError:
+            client.close()
+            raise
+        except BaseException:
+            self._release(client)
+            raise
+        else:
+            self._release(client)
+
+    def _release(self, client):
+        client.timed_out_servers.clear()
+        client.stale_sockets.clear()
+        with self._lock:
+            if not self._closed and len(self._idle) < self._max_idle:
+                self._idle.append(client)
+                return
+        client.close()
+
+    def close(self):
+        """
+        Closes all idle clients. Clients borrowed at the moment are closed when they are returned.
+        """
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for client in idle:
+            client.close()
+
+
+def client_pool() -> APIClientPool:
+    """
+    Returns:
+        APIClientPool: The process-wide pool used by the module-level functions of this module.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = APIClientPool()
+        return _pool
+
+
+def pooled_client():
+    """
+    Borrows a client from the process-wide pool:
+
+        with pooled_client() as client:
+            client.get_active_runs()
+
+    Returns:
+        A context manager providing a client reserved for the calling thread.
+    """
+    return client_pool().client()
+
+
+def _correlated(request_id: str) -> Callable[[str], bool]:
+    def accept(resp: str) -> bool:
+        try:
+            resp_metadata = json.loads(resp).get("response_metadata")
+        except (JSONDecodeError, AttributeError):
+            return True  # Not a valid response, reported when the response is processed
+        if not isinstance(resp_metadata, dict) or "request_id" not in resp_metadata:
+            return True  # Servers not supporting the correlation IDs do not include the field in the responses
+        return resp_metadata["request_id"] == request_id
+
+    return accept
+
+
+class APIClient(SocketClient):
+
+    def __init__(self, *, timeout=2, concurrent=True):
+        """
+        Args:
+            timeout (float): Seconds to wait for the responses.
+            concurrent (bool): If True (default), the request is sent to all APIs at once and the timeout applies
+                to all responses together. Otherwise, the APIs are contacted one by one, each with its own timeout.
+        """
+        discovery = api_discovery()
+        super().__init__(discovery.sockets, bidirectional=True, timeout=timeout, concurrent=concurrent,
+                         stale_socket_hook=discovery.mark_stale)
 
     def __enter__(self):
         return self
@@ -252,23 +621,43 @@ class APIClient(SocketClient):
         self.close()
 
     def send_request(self, api: str, run_match=None, req_body=None,
-                     resp_mapper: Callable[[InstanceResponse], T] = _no_resp_mapper) -> AggregatedResponse[T]:
-        if not req_body:
-            req_body = {}
-        req_body["request_metadata"] = {"api": api}
-        if run_match and run_match.job_run_id_criteria:
-            req_body["request_metadata"]["run_match"] = run_match.serialize()
-
-        server_responses: List[ServerResponse] = self.communicate(json.dumps(req_body))
+                     resp_mapper: Callable[[InstanceResponse], T] = _no_resp_mapper, *, fields=()) \
+            -> AggregatedResponse[T]:
+        """
+        Sends the request to all APIs and processes their responses.
+
+        Each request carries a unique correlation ID in `request_metadata.request_id`. Servers echo it back in
+        the response metadata, which allows to ignore late responses to earlier requests of a reused client.
+
+        Args:
+            api (str): The API path.
+            run_match (JobRunAggregatedCriteria, optional): Criteria for instances the request is applied to.
+            req_body (dict, optional): The body of the request.
+            resp_mapper (Callable): Function creating the response object from an instance response.
+            fields (Iterable[str], optional): Projection applied by the server before it serializes the instances,
+                so only the requested fields are included in the responses.
+        """
+        req, request_id = _encode_request(APICall(api, run_match, req_body, fields=tuple(fields)))
+        server_responses: List[ServerResponse] = self.communicate(req, accept=_correlated(request_id))
         return _process_responses(server_responses, resp_mapper)
 
-    def get_active_runs(self, run_match=None) -> AggregatedResponse[JobRun]:
+    def send_call(self, call: APICall) -> AggregatedResponse:
+        return self.send_request(call.api, call.run_match, call.req_body, call.resp_mapper, fields=call.fields)
+
+    def get_active_runs(self, run_match=None, *, fields=()) -> AggregatedResponse[JobRun]:
         """
         Retrieves instance information for all active job instances for the current user.
 
+        When the `fields` argument is provided, the servers serialize only the requested parts of the instances
+        and partial :class:`JobRunView` objects are returned instead of :class:`JobRun` objects.
+        Supported fields are listed in `job.JOB_RUN_FIELDS`, for example `metadata`, `lifecycle.current`,
+        `task.summary` or `termination`.
+
         Args:
             run_match (JobRunAggregatedCriteria, optional):
                 A filter for instance matching. If provided, only instances that match will be included.
+            fields (Iterable[str], optional):
+                Retrieve only these fields of the instances.
 
         Returns:
             A container holding the :class:`JobInst` objects that represent job instances.
@@ -276,12 +665,10 @@ class APIClient(SocketClient):
 
         Raises:
             PayloadTooLarge: If the payload size exceeds the maximum limit.
+            ValueError: If an unknown field is requested.
         """
 
-        def resp_mapper(inst_resp: InstanceResponse) -> JobRun:
-            return JobRun.deserialize(inst_resp.body["job_run"])
-
-        return self.send_request('/instances', run_match, resp_mapper=resp_mapper)
+        return self.send_call(_active_runs_call(run_match, fields))
 
     def approve_pending_instances(self, phase_name, instance_match=None) -> AggregatedResponse[ApprovalResponse]:
         """
@@ -300,18 +687,7 @@ class APIClient(SocketClient):
             It also includes any errors that may have happened, each one related to a specific server API.
         """
 
-        if not phase_name:
-            raise ValueError("Missing phase name")
-
-        def approve_resp_mapper(inst_resp: InstanceResponse) -> ApprovalResponse:
-            try:
-                release_res = ApprovalResult[inst_resp.body["approval_result"].upper()]
-            except KeyError:
-                release_res = ApprovalResult.UNKNOWN
-            return ApprovalResponse(inst_resp.instance_meta, release_res)
-
-        req_body = {"phase": phase_name}
-        return self.send_request('/instances/approve', instance_match, req_body, approve_resp_mapper)
+        return self.send_call(_approve_call(phase_name, instance_match))
 
     def stop_instances(self, instance_match) -> AggregatedResponse[StopResponse]:
         """
@@ -330,40 +706,350 @@ class APIClient(SocketClient):
             The stop operation might not succeed if the instance doesn't correctly handle stop/terminate signals.
         """
 
-        if not instance_match:
-            raise ValueError('Id matching criteria is mandatory for the stop operation')
-
-        def resp_mapper(inst_resp: InstanceResponse) -> StopResponse:
-            return StopResponse(inst_resp.instance_meta, StopResult[inst_resp.body["stop_result"].upper()])
-
-        return self.send_request('/instances/stop', instance_match, resp_mapper=resp_mapper)
+        return self.send_call(_stop_call(instance_match))
 
-    def fetch_output(self, instance_match=None) -> AggregatedResponse[OutputResponse]:
+    def fetch_output(self, instance_match=None, *, since: Union[int, Dict[str, int], None] = None, max_bytes=0,
+                     wait=0) -> AggregatedResponse[OutputResponse]:
         """
         This function requests the last lines of the output from job instances
         that optionally match the provided criteria.
 
+        When the `since` cursor is provided, only a page of the output starting at the cursor is requested
+        and each response contains the cursor for reading the next page. The cursor is the number of output lines
+        already read. It can be provided either as a single value used for all instances or as a dictionary
+        of instance ID to cursor (instances missing in the dictionary are read from the beginning).
+
         Args:
             instance_match (InstanceMatchCriteria, optional):
                 The operation will affect only instances matching these criteria.
                 If not provided, the tail of all instances is read.
+            since (int, Dict[str, int], optional):
+                The cursor from which the output page is read. If not provided, the whole retained output is read.
+            max_bytes (int, optional):
+                The maximum size of the page in bytes. Zero means no limit. Used only with the `since` argument.
+            wait (float, optional):
+                Seconds the server waits for new output when there is none after the cursor (long-polling).
+                Must be lower than the timeout of this client. Used only with the `since` argument.
+                Capped to `MAX_OUTPUT_WAIT`, servers without workers reply immediately.
 
         Returns:
             A container holding :class:`TailResponse` objects, each containing last lines for a respective job instance.
             It also includes any errors that may have happened, each one related to a specific server API.
         """
 
-        def resp_mapper(inst_resp: InstanceResponse) -> OutputResponse:
-            return OutputResponse(inst_resp.instance_meta, inst_resp.body["output"])
+        return self.send_call(_output_call(instance_match, since, max_bytes, wait))
+
+    def follow_output(self, instance_match=None, *, since=0, max_bytes=DEFAULT_OUTPUT_PAGE_BYTES, wait=1) \
+            -> Iterator[OutputResponse]:
+        """
+        Generator yielding new pages of the output of job instances matching the provided criteria.
+        The output is read page by page, and the server is long-polled for new lines when the whole output
+        has been read already. The size of the pages is limited so they always fit into a single response.
+
+        The generator runs until it is closed or until no response is received (no matching instance is found or
+        all the contacted APIs failed). Instances of servers not supporting the cursor (responding without
+        `next_cursor`) yield their output once and are not followed further. Note that the `wait` value must be lower
+        than the timeout of this client.
 
-        return self.send_request('/instances/output', instance_match, resp_mapper=resp_mapper)
+        Args:
+            instance_match (InstanceMatchCriteria, optional):
+                Only the output of instances matching these criteria is followed.
+            since (int, optional):
+                The initial cursor for instances matched by the first request. Defaults to 0 (the beginning
+                of the output). Instances appearing later are always followed from the beginning of their output.
+            max_bytes (int, optional):
+                The maximum size of a single page in bytes.
+            wait (float, optional):
+                Seconds the server waits for new output before it replies with an empty page,
+                capped to `MAX_OUTPUT_WAIT`.
+
+        Yields:
+            OutputResponse: A non-empty page of output lines of a single instance.
+        """
+
+        cursors: Union[int, Dict[str, int]] = since
+        unpaged = set()  # Instances of servers not supporting the cursor, their output is yielded only once
+        while True:
+            responses, errors = self.fetch_output(instance_match, since=cursors, max_bytes=max_bytes, wait=wait)
+            if isinstance(cursors, int):
+                cursors = {}
+
+            followed = False
+            for resp in responses:
+                instance_id = resp.instance_metadata.instance_id
+                if instance_id in unpaged:
+                    continue
+                followed = True
+                if resp.next_cursor is None:
+                    # The server ignored the cursor and returned the tail of the output, which would be repeated
+                    log.warning("event=[output_paging_not_supported] instance=[%s]", instance_id)
+                    unpaged.add(instance_id)
+                else:
+                    cursors[instance_id] = resp.next_cursor
+                if resp.output:
+                    yield resp
+
+            if not followed:
+                return
+
+    def search_output(self, pattern, instance_match=None, *, ignore_case=False) \
+            -> AggregatedResponse[OutputSearchResponse]:
+        """
+        This function searches the output of job instances that optionally match the provided criteria.
+        The search is executed by the servers, and only the matching lines are returned. Servers not providing
+        the search API reply with the not found error (see the module documentation).
+
+        Args:
+            pattern (str, mandatory):
+                The text to search for.
+            instance_match (InstanceMatchCriteria, optional):
+                The operation will affect only instances matching these criteria.
+                If not provided, the output of all instances is searched.
+            ignore_case (bool, optional):
+                Whether the search is case-insensitive. Defaults to False.
+
+        Returns:
+            A container holding :class:`OutputSearchResponse` objects, each containing matching lines
+            for a respective job instance.
+            It also includes any errors that may have happened, each one related to a specific server API.
+        """
+
+        return self.send_call(_search_output_call(pattern, instance_match, ignore_case))
 
     def signal_dispatch(self, instance_match) -> AggregatedResponse[SignalProceedResponse]:
-        def resp_mapper(inst_resp: InstanceResponse) -> SignalProceedResponse:
-            return SignalProceedResponse(
-                inst_resp.instance_meta, inst_resp.body["waiter_found"], inst_resp.body["executed"])
+        return self.send_call(_signal_dispatch_call(instance_match))
 
-        return self.send_request('/instances/_signal/dispatch', instance_match, resp_mapper=resp_mapper)
+    def send_batch(self, batch: Batch) -> List[AggregatedResponse]:
+        """
+        Sends all calls of the batch to each API in a single request, so the whole batch costs only one round trip
+        to each server instead of one per call. The calls are executed by a server in the order they were added.
+        Servers not providing the batch API reply with the not found error (see the module documentation).
+
+        Example:
+            runs, outputs = client.send_batch(Batch().get_active_runs(match).fetch_output(match))
+
+        Args:
+            batch (Batch): The calls to send.
+
+        Returns:
+            List[AggregatedResponse]: Results of the calls in the order of the calls in the batch.
+            An error of a server affecting the whole batch is included in the errors of each result.
+
+        Raises:
+            PayloadTooLarge: If the payload size exceeds the maximum limit.
+        """
+        if not batch.calls:
+            return []
+
+        req, request_id = _encode_batch(batch.calls)
+        server_responses = self.communicate(req, accept=_correlated(request_id))
+        return _process_batch_responses(server_responses, [call.resp_mapper for call in batch.calls])
+
+
+class AsyncAPIClient:
+    """
+    Client of the instance APIs for asyncio applications. It mirrors the methods of `APIClient` as coroutines.
+
+    All sockets are handled by the event loop, so no thread is blocked while waiting for the responses.
+    The request is sent to all APIs at once and the responses are awaited together, with the timeout applied
+    to all of them (like the concurrent mode of `APIClient`). The client can be used by several tasks concurrently,
+    the responses are matched to the requests by their correlation IDs.
+
+    Example:
+        async with AsyncAPIClient() as client:
+            runs, errors = await client.get_active_runs()
+    """
+
+    def __init__(self, *, timeout=2, discovery: Optional[SocketDiscovery] = None):
+        """
+        Args:
+            timeout (float): Seconds to wait for the responses.
+            discovery (SocketDiscovery, optional): Discovery of the API sockets. Defaults to `api_discovery()`.
+        """
+        self._timeout = timeout
+        self._discovery = discovery or api_discovery()
+        self._sock: Optional[socket.socket] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._waiters: Dict[str, List[Tuple[Callable[[str], bool], asyncio.Future]]] = {}  # Address -> waiters
+        self._stream_servers = set()
+
+    async def __aenter__(self):
+        self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def open(self):
+        """
+        Binds the client socket and registers it in the running event loop.
+        """
+        if self._sock:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(self._sock.getsockname())
+        self._sock.setblocking(False)
+        self._loop.add_reader(self._sock.fileno(), self._on_readable)
+
+    def close(self):
+        if not self._sock:
+            return
+        self._loop.remove_reader(self._sock.fileno())
+        self._sock.close()
+        self._sock = None
+        for waiters in self._waiters.values():
+            for _, future in waiters:
+                future.cancel()
+        self._waiters.clear()
+
+    def _on_readable(self):
+        while True:
+            try:
+                datagram, address = self._sock.recvfrom(RECV_BUFFER_LENGTH)
+            except (BlockingIOError, InterruptedError):
+                return
+
+            resp = datagram.decode()
+            for waiter in self._waiters.get(address, ()):
+                accept, future = waiter
+                if not future.done() and accept(resp):
+                    future.set_result(resp)
+                    break
+            else:
+                # Most likely a late response to a request which timed out before
+                log.warning('event=[unexpected_response_ignored] socket=[%s]', address)
+
+    async def _exchange_stream(self, address, encoded) -> str:
+        reader, writer = await asyncio.open_unix_connection(address)
+        try:
+            writer.write(frame(encoded))
+            await writer.drain()
+            (length,) = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+            return (await reader.readexactly(length)).decode()
+        except asyncio.IncompleteReadError:
+            raise ConnectionError("Connection closed by the server")
+        finally:
+            writer.close()
+
+    def _send(self, server_file, encoded, accept) -> Optional[asyncio.Future]:
+        address = str(server_file)
+        if address not in self._stream_servers:
+            try:
+                self._sock.sendto(encoded, address)
+            except BlockingIOError:  # Buffer of the server socket is full
+                log.warning('event=[socket_timeout] socket=[%s]', server_file)
+                return self._loop.create_future()  # Never completed -> reported as timed out
+            except ConnectionRefusedError:
+                log.warning('event=[stale_socket] socket=[%s]', server_file)
+                self._discovery.mark_stale(server_file)
+                return None
+            except OSError as e:
+                if e.errno == errno.EPROTOTYPE:
+                    self._stream_servers.add(address)
+                elif e.errno == errno.ENOENT or e.errno == errno.EPIPE:
+                    return None  # The server closed meanwhile
+                elif e.errno == errno.EMSGSIZE:
+                    raise PayloadTooLarge(len(encoded))
+                else:
+                    raise
+            else:
+                future = self._loop.create_future()
+                self._waiters.setdefault(address, []).append((accept, future))
+                return future
+
+        return self._loop.create_task(self._exchange_stream(address, encoded))
+
+    async def _communicate(self, req: str, request_id: str) -> List[ServerResponse]:
+        self.open()
+        encoded = req.encode()
+        accept = _correlated(request_id)
+        pending = []
+        for server_file in self._discovery.sockets():
+            future = self._send(server_file, encoded, accept)
+            if future:
+                pending.append((server_file, future))
+
+        try:
+            if pending:
+                await asyncio.wait([future for _, future in pending], timeout=self._timeout)
+            responses = (self._to_response(server_file, future) for server_file, future in pending)
+            return [resp for resp in responses if resp]
+        finally:
+            for server_file, future in pending:
+                future.cancel()
+                waiters = self._waiters.get(str(server_file))
+                if waiters:
+                    waiters[:] = [w for w in waiters if w[1] is not future]
+                    if not waiters:
+                        del self._waiters[str(server_file)]
+
+    def _to_response(self, server_file, future) -> Optional[ServerResponse]:
+        server_id = server_file.stem
+        if not future.done():
+            log.warning('event=[socket_timeout] socket=[%s]', server_file)
+            return ServerResponse(server_id, None, Error.TIMEOUT)
+
+        exc = future.exception()
+        if isinstance(exc, ConnectionRefusedError):
+            log.warning('event=[stale_socket] socket=[%s]', server_file)
+            self._discovery.mark_stale(server_file)
+            return None
+        if exc:
+            log.warning('event=[stream_connection_closed] socket=[%s] error=[%s]', server_file, exc)
+            return ServerResponse(server_id, None, Error.CLOSED)
+
+        return ServerResponse(server_id, future.result())
+
+    async def send_call(self, call: APICall) -> AggregatedResponse:
+        req, request_id = _encode_request(call)
+        return _process_responses(await self._communicate(req, request_id), call.resp_mapper)
+
+    async def send_batch(self, batch: Batch) -> List[AggregatedResponse]:
+        """
+        See `APIClient.send_batch`.
+        """
+        if not batch.calls:
+            return []
+        req, request_id = _encode_batch(batch.calls)
+        server_responses = await self._communicate(req, request_id)
+        return _process_batch_responses(server_responses, [call.resp_mapper for call in batch.calls])
+
+    async def get_active_runs(self, run_match=None, *, fields=()) -> AggregatedResponse[JobRun]:
+        """
+        See `APIClient.get_active_runs`.
+        """
+        return await self.send_call(_active_runs_call(run_match, fields))
+
+    async def approve_pending_instances(self, phase_name, instance_match=None) \
+            -> AggregatedResponse[ApprovalResponse]:
+        """
+        See `APIClient.approve_pending_instances`.
+        """
+        return await self.send_call(_approve_call(phase_name, instance_match))
+
+    async def stop_instances(self, instance_match) -> AggregatedResponse[StopResponse]:
+        """
+        See `APIClient.stop_instances`.
+        """
+        return await self.send_call(_stop_call(instance_match))
+
+    async def fetch_output(self, instance_match=None, *, since: Union[int, Dict[str, int], None] = None,
+                           max_bytes=0, wait=0) -> AggregatedResponse[OutputResponse]:
+        """
+        See `APIClient.fetch_output`.
+        """
+        return await self.send_call(_output_call(instance_match, since, max_bytes, wait))
+
+    async def search_output(self, pattern, instance_match=None, *, ignore_case=False) \
+            -> AggregatedResponse[OutputSearchResponse]:
+        """
+        See `APIClient.search_output`.
+        """
+        return await self.send_call(_search_output_call(pattern, instance_match, ignore_case))
+
+    async def signal_dispatch(self, instance_match) -> AggregatedResponse[SignalProceedResponse]:
+        return await self.send_call(_signal_dispatch_call(instance_match))
 
 
 def _process_responses(server_responses: List[ServerResponse], resp_mapper: Callable[[InstanceResponse], T]) \
@@ -372,52 +1058,97 @@ def _process_responses(server_responses: List[ServerResponse], resp_mapper: Call
     errors: List[APIError] = []
 
     for server_id, resp, error in server_responses:
-        if error:
-            log.error("event=[api_error] type=[socket] error=[%s]", error)
-            errors.append(APIError(server_id, APIErrorType.SOCKET, error, None))
+        resp_body = _decode_response(server_id, resp, error, errors)
+        if resp_body is not None:
+            _map_instance_responses(server_id, resp_body, resp_mapper, responses, errors)
+
+    return AggregatedResponse(responses, errors)
+
+
+def _process_batch_responses(server_responses: List[ServerResponse], resp_mappers: List[Callable]) \
+        -> List[AggregatedResponse]:
+    results = [AggregatedResponse([], []) for _ in resp_mappers]
+
+    for server_id, resp, error in server_responses:
+        batch_errors: List[APIError] = []
+        resp_body = _decode_response(server_id, resp, error, batch_errors)
+        if resp_body is not None:
+            call_bodies = resp_body.get('responses')
+            if not isinstance(call_bodies, list) or len(call_bodies) != len(resp_mappers):
+                log.error("event=[api_error] type=[invalid_response] error=[invalid_batch_responses]")
+                batch_errors.append(APIError(server_id, APIErrorType.INVALID_RESPONSE, None, None))
+        if batch_errors:
+            for result in results:
+                result.errors.extend(batch_errors)
             continue
 
-        try:
-            resp_body = json.loads(resp)
-        except JSONDecodeError:
-            # TODO Mostly when the resp is too long (i.e. server with many instances)
-            raise
-        resp_metadata = resp_body.get("response_metadata")
-        if not resp_metadata:
-            log.error("event=[api_error] type=[invalid_response] error=[missing_response_metadata]")
+        for result, resp_mapper, call_body in zip(results, resp_mappers, call_bodies):
+            if _check_response_metadata(server_id, call_body, result.errors):
+                _map_instance_responses(server_id, call_body, resp_mapper, result.responses, result.errors)
+
+    return results
+
+
+def _decode_response(server_id, resp, error, errors: List[APIError]) -> Optional[Dict[str, Any]]:
+    """
+    Returns:
+        Optional[Dict[str, Any]]: The body of a valid response or None if an error was added to the `errors` list.
+    """
+    if error:
+        log.error("event=[api_error] type=[socket] error=[%s]", error)
+        errors.append(APIError(server_id, APIErrorType.SOCKET, error, None))
+        return None
+
+    try:
+        resp_body = json.loads(resp)
+    except JSONDecodeError:
+        # Mostly when the resp is too long (i.e. server with many instances) - use output pages for large outputs
+        log.error("event=[api_error] type=[invalid_response] error=[invalid_json] length=[%s]", len(resp))
+        errors.append(APIError(server_id, APIErrorType.INVALID_RESPONSE, None, None))
+        return None
+
+    return resp_body if _check_response_metadata(server_id, resp_body, errors) else None
+
+
+def _check_response_metadata(server_id, resp_body, errors: List[APIError]) -> bool:
+    resp_metadata = resp_body.get("response_metadata")
+    if not resp_metadata:
+        log.error("event=[api_error] type=[invalid_response] error=[missing_response_metadata]")
+        errors.append(APIError(server_id, APIErrorType.INVALID_RESPONSE, None, None))
+        return False
+    if "error" in resp_metadata:
+        code = resp_metadata.get('code')
+        reason = resp_metadata['error'].get('reason')
+        if not code or code < 400 or code >= 600:
+            log.error("event=[api_error] type=[invalid_response] error=[invalid_response_code] code=[%s]", code)
             errors.append(APIError(server_id, APIErrorType.INVALID_RESPONSE, None, None))
-            continue
-        if "error" in resp_metadata:
-            code = resp_metadata.get('code')
-            reason = resp_metadata['error'].get('reason')
-            if not code or code < 400 or code >= 600:
-                log.error("event=[api_error] type=[invalid_response] error=[invalid_response_code] code=[%s]", code)
-                errors.append(APIError(server_id, APIErrorType.INVALID_RESPONSE, None, None))
-                continue
-            if not reason:
-                log.error("event=[api_error] type=[invalid_response] error=[missing_error_reason] code=[%s]", code)
-                errors.append(APIError(server_id, APIErrorType.INVALID_RESPONSE, None, None))
-                continue
-
-            error_type = APIErrorType.API_CLIENT if code < 500 else APIErrorType.API_SERVER
-            try:
-                err_code = ErrorCode(code)
-            except ValueError:
-                log.warning("event=[unknown_error_code] code=[%s]", code)
-                err_code = ErrorCode.UNKNOWN
-            log.error("event=[api_error] type=[%s] code=[%s] reason=[%s]", error_type, err_code, reason)
-            errors.append(APIError(server_id, error_type, None, ResponseError(err_code, reason)))
-            continue
+            return False
+        if not reason:
+            log.error("event=[api_error] type=[invalid_response] error=[missing_error_reason] code=[%s]", code)
+            errors.append(APIError(server_id, APIErrorType.INVALID_RESPONSE, None, None))
+            return False
 
-        for instance_resp in resp_body['instance_responses']:
-            instance_metadata = JobInstanceMetadata.deserialize(instance_resp['instance_metadata'])
-            api_instance_response = InstanceResponse(instance_metadata, instance_resp)
-            try:
-                resp = resp_mapper(api_instance_response)
-            except (KeyError, ValueError) as e:
-                log.error("event=[api_error] type=[%s] reason=[%s]", APIErrorType.INVALID_RESPONSE, e)
-                errors.append(APIError(server_id, APIErrorType.INVALID_RESPONSE, None, None))
-                break
-            responses.append(resp)
+        error_type = APIErrorType.API_CLIENT if code < 500 else APIErrorType.API_SERVER
+        try:
+            err_code = ErrorCode(code)
+        except ValueError:
+            log.warning("event=[unknown_error_code] code=[%s]", code)
+            err_code = ErrorCode.UNKNOWN
+        log.error("event=[api_error] type=[%s] code=[%s] reason=[%s]", error_type, err_code, reason)
+        errors.append(APIError(server_id, error_type, None, ResponseError(err_code, reason)))
+        return False
 
-    return AggregatedResponse(responses, errors)
+    return True
+
+
+def _map_instance_responses(server_id, resp_body, resp_mapper, responses: List, errors: List[APIError]):
+    for instance_resp in resp_body['instance_responses']:
+        instance_metadata = JobInstanceMetadata.deserialize(instance_resp['instance_metadata'])
+        api_instance_response = InstanceResponse(instance_metadata, instance_resp)
+        try:
+            resp = resp_mapper(api_instance_response)
+        except (KeyError, ValueError) as e:
+            log.error("event=[api_error] type=[%s] reason=[%s]", APIErrorType.INVALID_RESPONSE, e)
+            errors.append(APIError(server_id, APIErrorType.INVALID_RESPONSE, None, None))
+            break
+        responses.append(resp)
@@ -1,18 +1,27 @@
 """
 Persistence storage implementation using SQLite. See `runtoolsio.runcore.persistence` module doc for much more details.
+
+Many instance processes write to the same database when they end, while other processes read the history.
+The connections are therefore configured according to the persistence configuration: WAL journal mode lets the readers
+read while a writer is writing, and the busy timeout makes a writer wait for the lock held by another process instead
+of failing with `database is locked`. All writes go through a single connection, while reads use a pool
+of read-only connections, so concurrent readers in one process do not wait for each other.
 """
 
 import datetime
 import json
 import logging
 import sqlite3
+from contextlib import contextmanager
 from datetime import timezone
-from typing import List
+from queue import LifoQueue, Empty
+from threading import Lock, RLock
+from typing import List, Optional, Tuple, Any, Iterator
 
 from tarotools.taro import cfg
 from tarotools.taro import paths
 from tarotools.taro.job import JobStats, JobInstanceMetadata, JobRun, JobRuns, InstanceTransitionObserver
-from tarotools.taro.persistence import SortCriteria
+from tarotools.taro.persistence import SortCriteria, PageToken, JobRunsPage
 from tarotools.taro.run import RunState, Lifecycle, PhaseMetadata, RunFailure, RunError, Run, TerminationInfo, \
     TerminationStatus, Outcome
 from tarotools.taro.track import TrackedTask
@@ -21,54 +30,202 @@ from tarotools.taro.util import MatchingStrategy, format_dt_sql, parse_dt_sql
 log = logging.getLogger(__name__)
 
 
+JOURNAL_MODES = ('delete', 'truncate', 'persist', 'memory', 'wal', 'off')
+SYNCHRONOUS_LEVELS = ('off', 'normal', 'full', 'extra')
+# The query text depends only on the shape of the criteria (the values are bound as parameters), so a dashboard
+# repeating its queries with different values keeps reusing the compiled statements from the cache
+STATEMENT_CACHE_SIZE = 256
+DEFAULT_FETCH_SIZE = 500
+# Rows deleted in one write transaction by the retention, so other writers do not wait for a long delete
+RETENTION_BATCH_SIZE = 1000
+# Free pages returned to the file system after the retention deleted rows
+RETENTION_VACUUM_PAGES = 1000
+
+BASE_SCHEMA_VERSION = 5  # The schema created by `_create_tables`, databases without `user_version` have this schema
+SCHEMA_VERSION = 8
+
+
 def create_persistence():
-    db_con = sqlite3.connect(cfg.persistence_database or str(paths.sqlite_db_path(True)))
-    sqlite_ = SQLite(db_con)
+    database = cfg.persistence_database or str(paths.sqlite_db_path(True))
+    db_con = connect(database)
+    read_pool = None
+    if cfg.persistence_read_pool_size > 0 and database != ':memory:':
+        read_pool = ReadConnectionPool(lambda: connect(database, read_only=True), cfg.persistence_read_pool_size)
+    sqlite_ = SQLite(db_con, read_pool=read_pool)
     sqlite_.check_tables_exist()
     return sqlite_
 
 
-def _build_where_clause(run_match, alias=''):
+def connect(database, *, read_only=False,
+            journal_mode=None, synchronous=None, busy_timeout=None, mmap_size=None) -> sqlite3.Connection:
+    """
+    Opens a connection configured by the persistence configuration. The arguments override the configured values.
+    The connection can be used by multiple threads, but not concurrently.
+
+    Args:
+        database (str): Path of the database file.
+        read_only (bool): Whether the connection is only for reading. The journal mode is not set for read connections
+            as it is a property of the database set by the writer.
+        journal_mode (str, optional): Journal mode, one of `JOURNAL_MODES`.
+        synchronous (str, optional): Synchronous level, one of `SYNCHRONOUS_LEVELS`.
+        busy_timeout (int, optional): Milliseconds to wait for a lock held by another connection.
+        mmap_size (int, optional): Maximum number of bytes of the database file accessed using memory-mapped I/O.
+
+    Returns:
+        sqlite3.Connection: The configured connection.
+
+    Raises:
+        ValueError: If the journal mode or the synchronous level is not valid.
+    """
+    journal_mode = (journal_mode or cfg.persistence_journal_mode).lower()
+    synchronous = (synchronous or cfg.persistence_synchronous).lower()
+    busy_timeout = cfg.persistence_busy_timeout if busy_timeout is None else busy_timeout
+    mmap_size = cfg.persistence_mmap_size if mmap_size is None else mmap_size
+    if journal_mode not in JOURNAL_MODES:
+        raise ValueError(f"Invalid SQLite journal mode: {journal_mode}, valid values: {JOURNAL_MODES}")
+    if synchronous not in SYNCHRONOUS_LEVELS:
+        raise ValueError(f"Invalid SQLite synchronous level: {synchronous}, valid values: {SYNCHRONOUS_LEVELS}")
+
+    conn = sqlite3.connect(database, timeout=busy_timeout / 1000, check_same_thread=False,
+                           cached_statements=STATEMENT_CACHE_SIZE)
+    try:
+        # The busy timeout must be set first as changing the journal mode can wait for other connections
+        conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout)}")
+        if read_only:
+            conn.execute("PRAGMA query_only = ON")
+        else:
+            # The pages freed by the retention are released by `incremental_vacuum`. The mode can be set only before
+            # the database is initialized (by the journal mode or the tables), so it has no effect on existing databases
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+        conn.execute(f"PRAGMA synchronous = {synchronous}")
+        conn.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+    except BaseException:
+        conn.close()
+        raise
+    return conn
+
+
+class ReadConnectionPool:
+    """
+    Thread-safe pool of read connections. The connections are opened lazily up to the size of the pool.
+    When all connections are in use, a thread waits for a connection to be returned.
+    """
+
+    def __init__(self, connection_factory, size):
+        """
+        Args:
+            connection_factory (Callable[[], sqlite3.Connection]): Opens a new read connection.
+            size (int): The maximum number of open connections.
+        """
+        if size < 1:
+            raise ValueError("Invalid argument: arg `size` must be positive but was " + str(size))
+        self._connection_factory = connection_factory
+        self._idle: LifoQueue[sqlite3.Connection] = LifoQueue()
+        self._size = size
+        self._lock = Lock()
+        # Guarded by the lock:
+        self._opened = 0
+        self._closed = False
+        # ----------------------- #
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()  # The most recently used connection has the warmest page cache
+        except Empty:
+            pass
+
+        with self._lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Cannot use a closed connection pool")
+            if self._opened < self._size:
+                conn = self._connection_factory()
+                self._opened += 1
+                return conn
+
+        return self._idle.get()
+
+    def _release(self, conn):
+        with self._lock:
+            if self._closed:
+                conn.close()
+                return
+        self._idle.put(conn)
+
+    def close(self):
+        """
+        Closes the idle connections. The connections currently in use are closed when they are returned.
+        """
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except Empty:
+                break
+
+
+def _build_where_clause(run_match, alias='') -> Tuple[str, List[Any]]:
+    """
+    Builds the WHERE clause for the criteria. All values are passed as bind parameters, so the text of the clause
+    depends only on the structure of the criteria.
+
+    Returns:
+        Tuple[str, List[Any]]: The clause (empty if there are no criteria) and its parameters.
+    """
     # TODO Post fetch filter for criteria not supported in WHERE (instance parameters, etc.)
     if not run_match:
-        return ""
+        return "", []
 
     if alias and not alias.endswith('.'):
         alias = alias + "."
 
-    job_conditions = [f'{alias}job_id = "{j}"' for j in run_match.jobs]
+    params = []
+
+    job_conditions = []
+    for j in run_match.jobs:
+        job_conditions.append(f'{alias}job_id = ?')
+        params.append(j)
 
     id_conditions = []
+    id_params = []
     for c in run_match.job_run_id_criteria:
         if c.strategy == MatchingStrategy.ALWAYS_TRUE:
             id_conditions.clear()
+            id_params.clear()
             break
         if c.strategy == MatchingStrategy.ALWAYS_FALSE:
             id_conditions = ['1=0']
+            id_params.clear()
             break
 
         conditions = []
         op = ' AND ' if c.match_both_ids else ' OR '
-        if c.job_id:
-            if c.strategy == MatchingStrategy.PARTIAL:
-                conditions.append(f'{alias}job_id GLOB "*{c.job_id}*"')
-            elif c.strategy == MatchingStrategy.FN_MATCH:
-                conditions.append(f'{alias}job_id GLOB "{c.job_id}"')
-            elif c.strategy == MatchingStrategy.EXACT:
-                conditions.append(f'{alias}job_id = "{c.job_id}"')
-            else:
-                raise ValueError(f"Matching strategy {c.strategy} is not supported")
-        if c.run_id:
+        for column, value in (('job_id', c.job_id), ('run_id', c.run_id)):
+            if not value:
+                continue
             if c.strategy == MatchingStrategy.PARTIAL:
-                conditions.append(f'{alias}run_id GLOB "*{c.run_id}*"')
+                conditions.append(f'{alias}{column} GLOB ?')
+                id_params.append(f'*{value}*')
             elif c.strategy == MatchingStrategy.FN_MATCH:
-                conditions.append(f'{alias}run_id GLOB "{c.run_id}"')
+                conditions.append(f'{alias}{column} GLOB ?')
+                id_params.append(value)
             elif c.strategy == MatchingStrategy.EXACT:
-                conditions.append(f'{alias}run_id = "{c.run_id}"')
+                conditions.append(f'{alias}{column} = ?')
+                id_params.append(value)
             else:
                 raise ValueError(f"Matching strategy {c.strategy} is not supported")
 
         id_conditions.append(op.join(conditions))
+    params += id_params
 
     int_criteria = run_match.interval_criteria
     int_conditions = []
@@ -82,12 +239,11 @@ def _build_where_clause(run_match, alias=''):
 
         conditions = []
         if c.from_dt:
-            conditions.append(f"{e} >= '{format_dt_sql(c.from_dt)}'")
+            conditions.append(f"{e} >= ?")
+            params.append(format_dt_sql(c.from_dt))
         if c.to_dt:
-            if c.include_to:
-                conditions.append(f"{e} <= '{format_dt_sql(c.to_dt)}'")
-            else:
-                conditions.append(f"{e} < '{format_dt_sql(c.to_dt)}'")
+            conditions.append(f"{e} <= ?" if c.include_to else f"{e} < ?")
+            params.append(format_dt_sql(c.to_dt))
 
         int_conditions.append("(" + " AND ".join(conditions) + ")")
 
@@ -98,9 +254,8 @@ def _build_where_clause(run_match, alias=''):
         if outcomes := run_match.termination_criteria.outcomes:
             range_conditions = []
             for outcome in outcomes:
-                start, end = outcome.value.start, outcome.value.stop
-                range_condition = f"({alias}termination_status BETWEEN {start} AND {end})"
-                range_conditions.append(range_condition)
+                range_conditions.append(f"({alias}termination_status BETWEEN ? AND ?)")
+                params += [outcome.value.start, outcome.value.stop]
 
             if range_conditions:
                 combined_condition = " OR ".join(range_conditions)
@@ -108,22 +263,249 @@ def _build_where_clause(run_match, alias=''):
 
     all_conditions_list = (job_conditions, id_conditions, int_conditions, term_conditions)
     all_conditions_str = ["(" + " OR ".join(c_list) + ")" for c_list in all_conditions_list if c_list]
-
-    return " WHERE {conditions}".format(conditions=" AND ".join(all_conditions_str))
+    if not all_conditions_str:
+        return "", []
+
+    return " WHERE {conditions}".format(conditions=" AND ".join(all_conditions_str)), params
+
+
+def _migrate_to_v6(c):
+    # Composite index for the job history sorted by the end time, indexes for the other sort criteria
+    c.execute("CREATE INDEX IF NOT EXISTS job_id_ended_index ON history (job_id, ended)")
+    c.execute("CREATE INDEX IF NOT EXISTS created_index ON history (created)")
+    c.execute("CREATE INDEX IF NOT EXISTS exec_time_index ON history (exec_time)")
+    c.execute("DROP INDEX IF EXISTS job_id_index")  # Prefix of the composite index
+
+
+_JOB_STATS_COLUMNS = (
+    "job_id, count, first_created, last_created, fastest_time, slowest_time, total_time, timed_count, "
+    "last_rowid, last_time, last_term_status, failed, warnings, dirty")
+
+
+def _aggregate_job_stats_sql(job_filter=''):
+    """
+    Returns:
+        str: Query aggregating the `job_stats` rows from the history, optionally limited by the job filter condition.
+    """
+    fault = Outcome.FAULT.value
+    where = 'WHERE ' + job_filter if job_filter else ''
+    # The last row of each job is found once per job, not for each row of the job
+    return f"""
+        SELECT
+            h.job_id, count(*), min(h.created), max(h.created), min(h.exec_time), max(h.exec_time),
+            total(h.exec_time), count(h.exec_time), last.rowid, last.exec_time, last.termination_status,
+            count(CASE WHEN h.termination_status BETWEEN {fault.start} AND {fault.stop} THEN 1 END),
+            count(h.warnings), 0
+        FROM history h
+        INNER JOIN (SELECT h.job_id, max(h.rowid) AS rowid FROM history h {where} GROUP BY h.job_id) l
+            ON l.job_id = h.job_id
+        INNER JOIN history last ON last.rowid = l.rowid
+        {where}
+        GROUP BY h.job_id
+    """
+
+
+def _migrate_to_v7(c):
+    # Per job statistics maintained incrementally on insert, the rows of the jobs with deleted history
+    # are marked as dirty by the trigger and recalculated by the writer (see `SQLite._refresh_job_stats`)
+    fault = Outcome.FAULT.value
+    c.execute("""CREATE TABLE IF NOT EXISTS job_stats
+                 (job_id text PRIMARY KEY,
+                 count int,
+                 first_created timestamp,
+                 last_created timestamp,
+                 fastest_time real,
+                 slowest_time real,
+                 total_time real,
+                 timed_count int,
+                 last_rowid int,
+                 last_time real,
+                 last_term_status int,
+                 failed int,
+                 warnings int,
+                 dirty int)
+                 """)
+    c.execute(f"""CREATE TRIGGER IF NOT EXISTS job_stats_insert AFTER INSERT ON history
+                  BEGIN
+                      INSERT INTO job_stats ({_JOB_STATS_COLUMNS})
+                      VALUES (new.job_id, 1, new.created, new.created, new.exec_time, new.exec_time,
+                              coalesce(new.exec_time, 0), new.exec_time IS NOT NULL, new.rowid, new.exec_time,
+                              new.termination_status, new.termination_status BETWEEN {fault.start} AND {fault.stop},
+                              new.warnings IS NOT NULL, 0)
+                      ON CONFLICT (job_id) DO UPDATE SET
+                          count = count + 1,
+                          first_created = coalesce(min(first_created, excluded.first_created), first_created,
+                                                   excluded.first_created),
+                          last_created = coalesce(max(last_created, excluded.last_created), last_created,
+                                                  excluded.last_created),
+                          fastest_time = coalesce(min(fastest_time, excluded.fastest_time), fastest_time,
+                                                  excluded.fastest_time),
+                          slowest_time = coalesce(max(slowest_time, excluded.slowest_time), slowest_time,
+                                                  excluded.slowest_time),
+                          total_time = total_time + excluded.total_time,
+                          timed_count = timed_count + excluded.timed_count,
+                          last_rowid = excluded.last_rowid,
+                          last_time = excluded.last_time,
+                          last_term_status = excluded.last_term_status,
+                          failed = failed + excluded.failed,
+                          warnings = warnings + excluded.warnings;
+                  END""")
+    c.execute("""CREATE TRIGGER IF NOT EXISTS job_stats_delete AFTER DELETE ON history
+                 BEGIN
+                     UPDATE job_stats SET dirty = 1 WHERE job_id = old.job_id;
+                 END""")
+    c.execute("DELETE FROM job_stats")
+    c.execute(f"INSERT INTO job_stats ({_JOB_STATS_COLUMNS}) {_aggregate_job_stats_sql()}")
+
+
+def _migrate_to_v8(c):
+    # The count of the dirty rows is kept exact, so the total number of the history rows is known without counting
+    c.execute("DROP TRIGGER IF EXISTS job_stats_delete")
+    c.execute("""CREATE TRIGGER job_stats_delete AFTER DELETE ON history
+                 BEGIN
+                     UPDATE job_stats SET dirty = 1, count = count - 1 WHERE job_id = old.job_id;
+                 END""")
+
+
+# Schema version -> migration from the previous version
+_MIGRATIONS = {
+    6: _migrate_to_v6,
+    7: _migrate_to_v7,
+    8: _migrate_to_v8,
+}
+
+
+# Sort criteria -> (sort column, index of the column in the history row)
+_SORT_COLUMNS = {
+    SortCriteria.CREATED: ('h.created', 4),
+    SortCriteria.ENDED: ('h.ended', 5),
+    SortCriteria.TIME: ('h.exec_time', 6),
+}
+_ROW_ID_INDEX = 15  # Selected after all the history columns
+
+
+def _job_runs_query(run_match, sort, *, asc, limit, offset, last, paged=False, after: Optional[PageToken] = None) \
+        -> Tuple[str, List[Any]]:
+    if sort not in _SORT_COLUMNS:
+        raise ValueError(sort)
+    sort_column = _SORT_COLUMNS[sort][0]
+
+    where, params = _build_where_clause(run_match, alias='h')
+    if after:
+        keyset_condition, keyset_params = _keyset_condition(sort_column, asc, after)
+        where += (" AND " if where else " WHERE ") + keyset_condition
+        params += keyset_params
+    statement = "SELECT *, h.rowid FROM history h" + where
+
+    if last:
+        statement += " GROUP BY h.job_id HAVING ROWID = max(ROWID) "
+
+    direction = " ASC" if asc else " DESC"
+    # The row ID makes the order deterministic for equal sort values, which the keyset pagination relies on.
+    # The pages are in the exact reverse order for the descending sort, so the keyset condition is an index range.
+    nulls = " NULLS FIRST" if paged and not asc else ""
+    statement += " ORDER BY " + sort_column + direction + nulls + ", h.rowid" + direction + " LIMIT ? OFFSET ?"
+
+    log.debug("event=[executing_query] statement=[%s]", statement)
+    return statement, [*params, limit, offset]
+
+
+def _keyset_condition(sort_column, asc, after: PageToken) -> Tuple[str, List[Any]]:
+    """
+    Returns:
+        Tuple[str, List[Any]]: The condition selecting the rows after the token position and its parameters.
+        The rows with NULL sort value are first in both directions of the paged query.
+    """
+    if after.sort_value is None:
+        if asc:
+            return f"({sort_column} IS NOT NULL OR h.rowid > ?)", [after.row_id]
+        return f"({sort_column} IS NOT NULL OR h.rowid < ?)", [after.row_id]
+
+    if asc:
+        return f"({sort_column}, h.rowid) > (?, ?)", [after.sort_value, after.row_id]
+    return f"({sort_column}, h.rowid) < (?, ?)", [after.sort_value, after.row_id]
+
+
+def _to_job_run(t):
+    metadata = JobInstanceMetadata(t[0], t[1], t[2], {}, json.loads(t[3]) if t[3] else dict())
+    ended_at = parse_dt_sql(t[5])
+    phases = tuple(PhaseMetadata.deserialize(p) for p in json.loads(t[7]))
+    lifecycle = Lifecycle.deserialize(json.loads(t[8]))
+    term_status = TerminationStatus[t[9]]
+    failure = RunFailure.deserialize(json.loads(t[10])) if t[10] else None
+    error = RunError.deserialize(json.loads(t[11])) if t[11] else None
+    task = TrackedTask.deserialize(json.loads(t[12])) if t[12] else None
+    run = Run(phases, lifecycle, TerminationInfo(term_status, ended_at, failure, error))
+
+    return JobRun(metadata, run, task)
+
+
+def _to_job_stats(t):
+    job_id = t[0]
+    count = t[1]
+    first_at = parse_dt_sql(t[2])
+    last_at = parse_dt_sql(t[3])
+    fastest = datetime.timedelta(seconds=t[4]) if t[4] else None
+    average = datetime.timedelta(seconds=t[5]) if t[5] else None
+    slowest = datetime.timedelta(seconds=t[6]) if t[6] else None
+    last_time = datetime.timedelta(seconds=t[7]) if t[7] else None
+    last_term_status = TerminationStatus[t[8]] if t[8] else TerminationStatus.UNKNOWN
+    failed_count = t[9]
+    warn_count = t[10]
+
+    return JobStats(
+        job_id, count, first_at, last_at, fastest, average, slowest, last_time, last_term_status, failed_count,
+        warn_count
+    )
 
 
 class SQLite(InstanceTransitionObserver):
 
-    def __init__(self, connection):
+    def __init__(self, connection, *, read_pool: Optional[ReadConnectionPool] = None):
+        """
+        Args:
+            connection (sqlite3.Connection): Connection used for writing (and for reading when there is no pool).
+            read_pool (ReadConnectionPool, optional): Pool of connections used for reading.
+        """
         self._conn = connection
+        self._read_pool = read_pool
+        self._write_lock = RLock()  # Reentrant, so the thread iterating over the writer connection can also write
+
+    @contextmanager
+    def _reading(self):
+        if self._read_pool:
+            with self._read_pool.connection() as conn:
+                yield conn
+        else:
+            with self._write_lock:
+                yield self._conn
+
+    @contextmanager
+    def _writing(self):
+        with self._write_lock:
+            yield self._conn
 
     def new_instance_phase(self, job_run: JobRun, previous_phase, new_phase, ordinal):
         if new_phase.run_state == RunState.ENDED:
             self.store_job_runs(job_run)
 
     def check_tables_exist(self):
-        # Version 5
-        c = self._conn.cursor()
+        """
+        Creates the tables if they do not exist and migrates the schema to `SCHEMA_VERSION`.
+        The version of the schema is stored in `PRAGMA user_version`.
+        """
+        with self._writing() as conn:
+            conn.execute("BEGIN IMMEDIATE")  # Serializes the check with other processes opening the database
+            try:
+                self._create_tables(conn)
+                self._migrate(conn)
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    def _create_tables(self, conn):
+        c = conn.cursor()
         c.execute(''' SELECT count(name) FROM sqlite_master WHERE type='table' AND name='history' ''')
         if c.fetchone()[0] != 1:
             c.execute('''CREATE TABLE history
@@ -145,69 +527,202 @@ class SQLite(InstanceTransitionObserver):
                          ''')
             c.execute('''CREATE INDEX job_id_index ON history (job_id)''')
             c.execute('''CREATE INDEX instance_id_index ON history (instance_id)''')
-            c.execute('''CREATE INDEX ended_index ON history (ended)''')  # TODO created + exec_time idx too
+            c.execute('''CREATE INDEX ended_index ON history (ended)''')
+            c.execute(f"PRAGMA user_version = {BASE_SCHEMA_VERSION}")
             log.debug('event=[table_created] table=[history]')
-            self._conn.commit()
+
+    def _migrate(self, conn):
+        c = conn.cursor()
+        version = c.execute("PRAGMA user_version").fetchone()[0] or BASE_SCHEMA_VERSION
+        if version > SCHEMA_VERSION:
+            log.warning(f"event=[unknown_schema_version] version=[{version}] supported_version=[{SCHEMA_VERSION}]")
+            return
+
+        for target_version in range(version + 1, SCHEMA_VERSION + 1):
+            _MIGRATIONS[target_version](c)
+            c.execute(f"PRAGMA user_version = {target_version}")
+            log.debug(f"event=[schema_migrated] version=[{target_version}]")
 
     def read_job_runs(self, run_match=None, sort=SortCriteria.ENDED, *, asc=True, limit=-1, offset=-1, last=False) \
             -> JobRuns:
-        def sort_exp():
-            if sort == SortCriteria.CREATED:
-                return 'h.created'
-            if sort == SortCriteria.ENDED:
-                return 'h.ended'
-            if sort == SortCriteria.TIME:
-                return "julianday(h.ended) - julianday(h.created)"
-            raise ValueError(sort)
-
-        statement = "SELECT * FROM history h"
-        statement += _build_where_clause(run_match, alias='h')
-
-        if last:
-            statement += " GROUP BY h.job_id HAVING ROWID = max(ROWID) "
-
-        statement += " ORDER BY " + sort_exp() + (" ASC" if asc else " DESC") + " LIMIT ? OFFSET ?"
-
-        log.debug("event=[executing_query] statement=[%s]", statement)
-        c = self._conn.execute(statement, (limit, offset))
-
-        def to_job_info(t):
-            metadata = JobInstanceMetadata(t[0], t[1], t[2], {}, json.loads(t[3]) if t[3] else dict())
-            ended_at = parse_dt_sql(t[5])
-            phases = tuple(PhaseMetadata.deserialize(p) for p in json.loads(t[7]))
-            lifecycle = Lifecycle.deserialize(json.loads(t[8]))
-            term_status = TerminationStatus[t[9]]
-            failure = RunFailure.deserialize(json.loads(t[10])) if t[10] else None
-            error = RunError.deserialize(json.loads(t[11])) if t[11] else None
-            task = TrackedTask.deserialize(json.loads(t[12])) if t[12] else None
-            run = Run(phases, lifecycle, TerminationInfo(term_status, ended_at, failure, error))
-
-            return JobRun(metadata, run, task)
-
-        return JobRuns((to_job_info(row) for row in c.fetchall()))
-
-    def clean_up(self, max_records, max_age):
-        if max_records >= 0:
-            self._max_rows(max_records)
+        statement, params = _job_runs_query(run_match, sort, asc=asc, limit=limit, offset=offset, last=last)
+        with self._reading() as conn:
+            rows = conn.execute(statement, params).fetchall()
+
+        return JobRuns((_to_job_run(row) for row in rows))
+
+    def iter_job_runs(self, run_match=None, sort=SortCriteria.ENDED, *, asc=True, limit=-1, offset=-1, last=False,
+                      fetch_size=DEFAULT_FETCH_SIZE) -> Iterator[JobRun]:
+        """
+        Same as `read_job_runs`, but the rows are fetched in chunks and the runs are created lazily as the iterator
+        is consumed, so the memory use does not depend on the number of the read runs.
+
+        A read connection is held until the iterator is exhausted or closed. Without the read pool, this is
+        the writer connection, so writes from other threads wait until then. Rows written by the iterating thread
+        itself during the iteration may or may not be included.
+
+        Args:
+            fetch_size (int): Number of rows fetched from the database at once.
+        """
+        statement, params = _job_runs_query(run_match, sort, asc=asc, limit=limit, offset=offset, last=last)
+        with self._reading() as conn:
+            c = conn.execute(statement, params)
+            try:
+                while rows := c.fetchmany(fetch_size):
+                    for row in rows:
+                        yield _to_job_run(row)
+            finally:
+                c.close()
+
+    def read_job_runs_page(self, run_match=None, sort=SortCriteria.ENDED, *, asc=True, limit=100, page_token=None) \
+            -> JobRunsPage:
+        """
+        Reads a page of the history using keyset pagination, see `persistence.read_instances_page`.
+        """
+        if limit < 1:
+            raise ValueError("Invalid argument: arg `limit` must be positive but was " + str(limit))
+        after = PageToken.decode(page_token) if page_token else None
+        if after and (after.sort, after.asc) != (sort, asc):
+            raise ValueError(f"Page token issued for different sorting: {after.sort.name} asc={after.asc}")
+
+        # One more row is read to find out whether there is a next page
+        statement, params = _job_runs_query(
+            run_match, sort, asc=asc, limit=limit + 1, offset=-1, last=False, paged=True, after=after)
+        with self._reading() as conn:
+            rows = conn.execute(statement, params).fetchall()
+
+        next_page_token = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last_row = rows[-1]
+            sort_value = last_row[_SORT_COLUMNS[sort][1]]
+            next_page_token = PageToken(sort, asc, sort_value, last_row[_ROW_ID_INDEX]).encode()
+
+        return JobRunsPage(JobRuns((_to_job_run(row) for row in rows)), next_page_token)
+
+    def clean_up(self, max_records, max_age, *, max_batches=None, slack=0) -> int:
+        """
+        Retention of the history. The rows to delete are located using the `ended` index and deleted in batches
+        of `RETENTION_BATCH_SIZE` rows, each in its own transaction. The number of the rows is known from
+        the `job_stats` table, so checking the limit does not count the history. The freed pages are then released
+        by incremental vacuum (databases created before the incremental auto-vacuum was enabled keep their free pages
+        for reuse).
+
+        With `slack`, the retention starts only when more than `slack` rows are to be deleted, and then deletes all
+        of them (up to `max_batches`). Calling it after each store then locates the cutoff and refreshes the statistics
+        once per `slack` stored rows, not for each stored row.
+
+        Args:
+            max_records (int): The maximum number of rows to retain, -1 for no limit.
+            max_age (relativedelta, optional): The maximum age of the rows to retain.
+            max_batches (int, optional): The maximum number of batches deleted by this call, None for no limit.
+                The rest of the rows is deleted by the following calls.
+            slack (int): The number of rows over the limits tolerated before the retention starts.
+
+        Returns:
+            int: Number of deleted rows.
+        """
+        deleted = batches = 0
         if max_age:
-            self._delete_old_jobs(max_age)
-
-    def _max_rows(self, limit):
-        c = self._conn.execute("SELECT COUNT(*) FROM history")
-        count = c.fetchone()[0]
-        if count > limit:
-            self._conn.execute(
-                "DELETE FROM history WHERE rowid not in (SELECT rowid FROM history ORDER BY ended DESC LIMIT (?))",
-                (limit,))
-            self._conn.commit()
-
-    def _delete_old_jobs(self, max_age):
-        self._conn.execute("DELETE FROM history WHERE ended < (?)",
-                           ((datetime.datetime.now(tz=timezone.utc) - max_age),))
-        self._conn.commit()
+            cutoff = (format_dt_sql(datetime.datetime.now(tz=timezone.utc) - max_age), 0)  # Row IDs are positive
+            deleted, batches = self._delete_ended_before(
+                lambda conn, row_slack: self._age_cutoff(conn, cutoff, row_slack), max_batches,
+                null_ended=False, slack=slack)
+        if max_records >= 0:
+            remaining_batches = None if max_batches is None else max_batches - batches
+            deleted += self._delete_ended_before(
+                lambda conn, row_slack: self._records_cutoff(conn, max_records, row_slack), remaining_batches,
+                null_ended=True, slack=slack)[0]
+
+        if deleted:
+            with self._writing() as conn:
+                self._refresh_job_stats(conn)
+                conn.commit()
+                # Executed as a script, which steps the statement to the end (each step frees one page)
+                conn.executescript(f"PRAGMA incremental_vacuum({RETENTION_VACUUM_PAGES})")
+            log.debug(f"event=[history_retention] deleted=[{deleted}]")
+        return deleted
+
+    def _delete_ended_before(self, cutoff_provider, max_batches, *, null_ended, slack) -> Tuple[int, int]:
+        """
+        Deletes the rows before the cutoff position in the order of `(ended, rowid)` in batches.
+        Rows without the `ended` value are ordered first (as by SQLite in the ascending order).
+
+        Args:
+            cutoff_provider (Callable[[sqlite3.Connection, int], Optional[Tuple[Optional[str], int]]]):
+                Returns the `(ended, rowid)` position of the first retained row, None if nothing is to be deleted
+                or if not more than the provided number of rows is to be deleted.
+            max_batches (int, optional): The maximum number of batches, None for no limit.
+            null_ended (bool): Whether the rows without the `ended` value are deleted (when before the cutoff).
+            slack (int): Passed to the cutoff provider for the first batch, the following batches delete all the rest.
+
+        Returns:
+            Tuple[int, int]: Number of deleted rows and number of executed batches.
+        """
+        deleted = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            with self._writing() as conn:
+                cutoff = cutoff_provider(conn, 0 if batches else slack)
+                if not cutoff:
+                    break
+                ended, rowid = cutoff
+                if ended is None:
+                    condition, params = "ended IS NULL AND rowid < ?", (rowid,)
+                elif null_ended:
+                    condition, params = "(ended IS NULL OR (ended, rowid) < (?, ?))", cutoff
+                else:
+                    condition, params = "(ended, rowid) < (?, ?)", cutoff
+                c = conn.execute("DELETE FROM history WHERE rowid IN "
+                                 f"(SELECT rowid FROM history WHERE {condition} ORDER BY ended LIMIT ?)",
+                                 (*params, RETENTION_BATCH_SIZE))
+                conn.commit()
+            deleted += c.rowcount
+            batches += 1
+            if c.rowcount < RETENTION_BATCH_SIZE:
+                break
+        return deleted, batches
+
+    @staticmethod
+    def _age_cutoff(conn, cutoff, slack) -> Optional[Tuple[str, int]]:
+        """
+        Returns:
+            The cutoff if more than `slack` rows ended before it, otherwise None.
+        """
+        if slack and not conn.execute("SELECT 1 FROM history WHERE ended < ? LIMIT 1 OFFSET ?",
+                                      (cutoff[0], slack)).fetchone():
+            return None
+        return cutoff
+
+    @staticmethod
+    def _records_cutoff(conn, max_records, slack) -> Optional[Tuple[Optional[str], int]]:
+        """
+        Returns:
+            The `(ended, rowid)` position of the oldest row retained by the limit,
+            None if the limit is not exceeded by more than `slack` rows.
+            The rows without the `ended` value are the oldest (the last in the descending order), as in the versions
+            deleting all the rows at once.
+        """
+        count = conn.execute("SELECT total(count) FROM job_stats").fetchone()[0]
+        if count <= max_records + slack:
+            return None
+        if max_records == 0:
+            return conn.execute("SELECT max(ended), max(rowid) + 1 FROM history").fetchone()
+        return conn.execute("SELECT ended, rowid FROM history ORDER BY ended DESC, rowid DESC LIMIT 1 OFFSET ?",
+                            (max_records - 1,)).fetchone()
 
     def read_stats(self, run_match=None) -> List[JobStats]:
-        where = _build_where_clause(run_match, alias='h')
+        """
+        Without criteria, the statistics are read from the `job_stats` table maintained on each change of the history.
+        With criteria, the statistics are aggregated from the matching history rows.
+        """
+        where, params = _build_where_clause(run_match, alias='h')
+        if not where:
+            with self._reading() as conn:
+                rows = self._read_job_stats(conn)
+            if rows is not None:
+                return [_to_job_stats(row) for row in rows]
+
         sql = f'''
             SELECT
                 h.job_id,
@@ -219,7 +734,7 @@ class SQLite(InstanceTransitionObserver):
                 max(h.exec_time) AS "slowest_time",
                 last.exec_time AS "last_time",
                 last.termination_status AS "last_term_status",
-                COUNT(CASE WHEN h.termination_status BETWEEN {Outcome.FAULT.value.start} AND {Outcome.FAULT.value.stop} THEN 1 ELSE NULL END) AS failed,
+                COUNT(CASE WHEN h.termination_status BETWEEN ? AND ? THEN 1 ELSE NULL END) AS failed,
                 COUNT(h.warnings) AS warnings
             FROM
                 history h
@@ -230,27 +745,40 @@ class SQLite(InstanceTransitionObserver):
             GROUP BY
                 h.job_id
         '''
-        c = self._conn.execute(sql)
-
-        def to_job_stats(t):
-            job_id = t[0]
-            count = t[1]
-            first_at = parse_dt_sql(t[2])
-            last_at = parse_dt_sql(t[3])
-            fastest = datetime.timedelta(seconds=t[4]) if t[4] else None
-            average = datetime.timedelta(seconds=t[5]) if t[5] else None
-            slowest = datetime.timedelta(seconds=t[6]) if t[6] else None
-            last_time = datetime.timedelta(seconds=t[7]) if t[7] else None
-            last_term_status = TerminationStatus[t[8]] if t[8] else TerminationStatus.UNKNOWN
-            failed_count = t[9]
-            warn_count = t[10]
-
-            return JobStats(
-                job_id, count, first_at, last_at, fastest, average, slowest, last_time, last_term_status, failed_count,
-                warn_count
-            )
-
-        return [to_job_stats(row) for row in c.fetchall()]
+        with self._reading() as conn:
+            # Parameters in the order of the placeholders: the failed range, the subquery and the main query
+            fault = Outcome.FAULT.value
+            rows = conn.execute(sql, (fault.start, fault.stop, *params, *params)).fetchall()
+
+        return [_to_job_stats(row) for row in rows]
+
+    @staticmethod
+    def _read_job_stats(conn):
+        """
+        Returns:
+            The rows of the `job_stats` table in the format of the aggregation query,
+            or None if some rows are not up-to-date (the history was changed by another tool).
+        """
+        if conn.execute("SELECT 1 FROM job_stats WHERE dirty = 1 LIMIT 1").fetchone():
+            return None
+        return conn.execute('''
+            SELECT
+                job_id, count, first_created, last_created, fastest_time,
+                CASE WHEN timed_count > 0 THEN total_time / timed_count END,
+                slowest_time, last_time, last_term_status, failed, warnings
+            FROM job_stats
+        ''').fetchall()
+
+    @staticmethod
+    def _refresh_job_stats(conn):
+        """
+        Recalculates the statistics of the jobs marked as dirty by the deletion of their history rows.
+        Must be executed by the writer, preferably in the transaction deleting the rows.
+        """
+        dirty_filter = "h.job_id IN (SELECT job_id FROM job_stats WHERE dirty = 1)"
+        conn.execute(f"INSERT OR REPLACE INTO job_stats ({_JOB_STATS_COLUMNS}) "
+                     f"{_aggregate_job_stats_sql(dirty_filter)}")
+        conn.execute("DELETE FROM job_stats WHERE dirty = 1")  # No history left
 
     def store_job_runs(self, *job_runs):
         def to_tuple(r):
@@ -274,18 +802,23 @@ class SQLite(InstanceTransitionObserver):
                     )
 
         jobs = [to_tuple(j) for j in job_runs]
-        self._conn.executemany(
-            "INSERT INTO history VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            jobs
-        )
-        self._conn.commit()
+        with self._writing() as conn:
+            conn.executemany(
+                "INSERT INTO history VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                jobs
+            )
+            conn.commit()
 
     def remove_instances(self, instance_match):
-        where_clause = _build_where_clause(instance_match)
+        where_clause, params = _build_where_clause(instance_match)
         if not where_clause:
             raise ValueError("No rows to remove")
-        self._conn.execute("DELETE FROM history" + where_clause)
-        self._conn.commit()
+        with self._writing() as conn:
+            conn.execute("DELETE FROM history" + where_clause, params)
+            self._refresh_job_stats(conn)
+            conn.commit()
 
     def close(self):
+        if self._read_pool:
+            self._read_pool.close()
         self._conn.close()
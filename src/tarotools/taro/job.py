@@ -8,15 +8,17 @@ to perform the same task.
 """
 import abc
 import datetime
+import json
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from datetime import timedelta
-from threading import Thread
-from typing import Dict, Any, List, Optional, Type
+from threading import Thread, Lock
+from typing import Dict, Any, List, Optional, Type, Tuple
 
-from tarotools.taro.output import Mode
-from tarotools.taro.run import TerminationStatus, P, RunState, Run, PhaseRun, PhaseMetadata
-from tarotools.taro.track import TrackedTask
+from tarotools.taro.output import Mode, OutputPage, OutputMatch
+from tarotools.taro.run import TerminationStatus, P, RunState, Run, PhaseRun, PhaseMetadata, Lifecycle, \
+    TerminationInfo
+from tarotools.taro.track import TrackedTask, TrackedTaskObserver, Trackable
 from tarotools.taro.util import MatchingStrategy, format_dt_iso
 from tarotools.taro.util.observer import DEFAULT_OBSERVER_PRIORITY
 
@@ -333,6 +335,35 @@ class JobInstance(abc.ABC):
     def fetch_output(self, mode=Mode.HEAD, *, lines=0):
         """TODO Return an output reader object"""
 
+    def fetch_output_page(self, since=0, *, max_bytes=0, timeout=0):
+        """
+        Reads a page of output lines starting at the `since` cursor.
+        See `InMemoryOutput.fetch_page` for the description of the arguments.
+
+        Implementations keeping the output in memory should override this method to support
+        the size limit and waiting for new output. This default implementation ignores both.
+
+        Returns:
+            OutputPage: The lines of the page and the cursor for the next page.
+        """
+        lines = self.fetch_output()[since:]
+        return OutputPage(lines, since + len(lines))
+
+    def search_output(self, pattern, *, ignore_case=False):
+        """
+        Finds output lines containing the provided text.
+        See `InMemoryOutput.search` for the description of the arguments.
+
+        Implementations keeping the output in memory should override this method to use an index.
+        This default implementation scans the whole output.
+
+        Returns:
+            List[OutputMatch]: Matching lines in the order as they were produced.
+        """
+        needle = pattern.lower() if ignore_case else pattern
+        return [OutputMatch(i + 1, text, is_error) for i, (text, is_error) in enumerate(self.fetch_output())
+                if needle in (text.lower() if ignore_case else text)]
+
     @abc.abstractmethod
     def run(self):
         """
@@ -439,6 +470,50 @@ class JobRun:
             "task": self.task.serialize(),
         }
 
+    def serialize_fields(self, fields) -> Dict[str, Any]:
+        """
+        Serializes only the requested parts of this snapshot. The result can be deserialized using `JobRunView`.
+        Supported fields are listed in `JOB_RUN_FIELDS`:
+            > metadata: the instance metadata
+            > phases: metadata of all phases of the run
+            > lifecycle: the whole lifecycle of the run
+            > lifecycle.current: only the current phase run
+            > termination: the termination info
+            > task: the whole tracked task
+            > task.summary: the text summary of the tracked task
+
+        Args:
+            fields (Iterable[str]): The fields to serialize.
+
+        Returns:
+            Dict[str, Any]: Serialized fields in the same structure as `serialize` returns.
+
+        Raises:
+            ValueError: If an unknown field is requested.
+        """
+        unknown = set(fields) - set(JOB_RUN_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown job run fields: {sorted(unknown)}")
+
+        run = {}
+        if 'phases' in fields:
+            run['phases'] = [phase.serialize() for phase in self.run.phases]
+        if 'lifecycle' in fields:
+            run['lifecycle'] = self.run.lifecycle.serialize()
+        if 'lifecycle.current' in fields:
+            run['current_phase'] = self.run.lifecycle.current_run.serialize()
+        if 'termination' in fields:
+            run['termination'] = self.run.termination.serialize() if self.run.termination else None
+
+        d = {"run": run}
+        if 'metadata' in fields:
+            d['metadata'] = self.metadata.serialize()
+        if 'task' in fields:
+            d['task'] = self.task.serialize() if self.task else None
+        if 'task.summary' in fields:
+            d['task_summary'] = str(self.task) if self.task else None
+        return d
+
     @property
     def job_id(self) -> str:
         """
@@ -456,6 +531,51 @@ class JobRun:
         return self.metadata.run_id
 
 
+JOB_RUN_FIELDS = ('metadata', 'phases', 'lifecycle', 'lifecycle.current', 'termination', 'task', 'task.summary')
+
+
+@dataclass(frozen=True)
+class JobRunView:
+    """
+    Partial snapshot of job instance containing only the fields requested from `JobRun.serialize_fields`.
+    The fields which were not requested are None.
+    """
+
+    metadata: JobInstanceMetadata
+    phases: Optional[Tuple[PhaseMetadata, ...]] = None
+    lifecycle: Optional[Lifecycle] = None
+    current_phase: Optional[PhaseRun] = None
+    termination: Optional[TerminationInfo] = None
+    task: Optional[TrackedTask] = None
+    task_summary: Optional[str] = None
+
+    @classmethod
+    def deserialize(cls, as_dict, metadata=None):
+        """
+        Args:
+            as_dict: Fields serialized by `JobRun.serialize_fields`.
+            metadata (JobInstanceMetadata, optional): Metadata used when they are not included in the fields.
+        """
+        run = as_dict.get('run', {})
+        return cls(
+            JobInstanceMetadata.deserialize(as_dict['metadata']) if 'metadata' in as_dict else metadata,
+            tuple(PhaseMetadata.deserialize(p) for p in run['phases']) if 'phases' in run else None,
+            Lifecycle.deserialize(run['lifecycle']) if 'lifecycle' in run else None,
+            PhaseRun.deserialize(run['current_phase']) if 'current_phase' in run else None,
+            TerminationInfo.deserialize(run['termination']) if run.get('termination') else None,
+            TrackedTask.deserialize(as_dict['task']) if as_dict.get('task') else None,
+            as_dict.get('task_summary'),
+        )
+
+    @property
+    def job_id(self) -> str:
+        return self.metadata.job_id
+
+    @property
+    def run_id(self) -> str:
+        return self.metadata.run_id
+
+
 class JobRuns(list):
     """
     List of job instances with auxiliary methods.
@@ -522,6 +642,100 @@ class InstanceOutputObserver(abc.ABC):
     def new_instance_output(self, instance_meta: JobInstanceMetadata, phase: PhaseMetadata, output: str, is_err: bool):
         """TODO"""
 
+    def new_instance_outputs(self, outputs: List[Tuple[JobInstanceMetadata, PhaseMetadata, str, bool]]):
+        """
+        Notification about a batch of outputs received together, each as (instance_meta, phase, output, is_err)
+        tuple. Observers writing the output can override it to process the whole batch at once.
+        The default implementation calls `new_instance_output` for each output of the batch.
+        """
+        for instance_meta, phase, output, is_err in outputs:
+            self.new_instance_output(instance_meta, phase, output, is_err)
+
+
+class CachedJobRun(InstanceTransitionObserver, TrackedTaskObserver):
+    """
+    Keeps the JSON encoded snapshot of a job instance until the instance changes, so repeated requests for the state
+    of an unchanged instance do not need to create and encode a new snapshot each time. This is intended for servers
+    providing the state of their instances.
+
+    The cached snapshot is keyed by a version incremented on each phase transition and on each update of the task
+    tracker of the instance. Any change of the version makes the cached snapshot invalid.
+    """
+
+    def __init__(self, job_instance):
+        """
+        Args:
+            job_instance (JobInstance): The instance which snapshot is cached.
+        """
+        self._job_instance = job_instance
+        self._lock = Lock()
+        # Guarded by the lock:
+        self._version = 0
+        self._encoded: Dict[Tuple[str, ...], str] = {}  # Fields (empty for all) -> encoded snapshot
+        self._encoded_version = 0
+        # ----------------------- #
+        job_instance.add_observer_transition(self)
+        tracker = job_instance.task_tracker
+        if isinstance(tracker, Trackable):
+            tracker.add_observer(self)
+
+    @property
+    def version(self) -> int:
+        """
+        Returns:
+            int: The current version of the instance state.
+        """
+        with self._lock:
+            return self._version
+
+    def new_instance_phase(self, job_run: JobRun, previous_phase: PhaseRun, new_phase: PhaseRun, ordinal: int):
+        self._invalidate()
+
+    def new_trackable_update(self):
+        self._invalidate()
+
+    def _invalidate(self):
+        with self._lock:
+            self._version += 1
+
+    def encoded(self, fields=()) -> str:
+        """
+        Returns the JSON encoded snapshot of the instance as returned by `JobRun.serialize` or, when fields are
+        provided, by `JobRun.serialize_fields`. The snapshot is created only if the instance has changed since
+        the last call with the same fields.
+
+        Args:
+            fields (Iterable[str], optional): Fields to include, all fields are included if not provided.
+
+        Returns:
+            str: The encoded snapshot.
+        """
+        key = tuple(sorted(fields))
+        with self._lock:
+            version = self._version
+            if self._encoded_version == version and key in self._encoded:
+                return self._encoded[key]
+
+        job_run = self._job_instance.job_run_info()
+        encoded = json.dumps(job_run.serialize_fields(key) if key else job_run.serialize())
+
+        with self._lock:
+            if self._version == version:  # Not cached if the instance changed meanwhile
+                if self._encoded_version != version:
+                    self._encoded = {}
+                    self._encoded_version = version
+                self._encoded[key] = encoded
+        return encoded
+
+    def close(self):
+        """
+        Stops observing the changes of the instance.
+        """
+        self._job_instance.remove_observer_transition(self)
+        tracker = self._job_instance.task_tracker
+        if isinstance(tracker, Trackable):
+            tracker.remove_observer(self)
+
 
 class JobInstanceManager(ABC):
     """
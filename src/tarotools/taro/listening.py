@@ -1,13 +1,50 @@
 #  Sender, Listening
+"""
+Events are sent to the listeners as datagrams using an envelope consisting of a small header line followed by the body:
+
+    {"envelope": 1, "event_type": "...", "job_id": "...", "run_id": "...", "phase": "..."}\n{body}
+
+The header allows the receivers to filter the events without parsing the body, which contains the whole event including
+the snapshot of the instance. Receivers also accept legacy events without the header (the body only).
+
+Several envelopes can be sent in a single datagram, separated by a new line. `EventSender` uses it to batch output
+events for listeners which cannot keep up with the rate of the events.
+
+Receivers publish their filters in a sidecar file next to their socket (see `ListenerFilter`). The file is written
+before the socket is bound, and `EventSender` evaluates the filter of each listener against the header of the event,
+so events a listener would discard are not sent to it at all. The receivers still apply their filters to the received
+events, so listeners without the sidecar file and senders ignoring it work as before.
+
+Alternatively, the events can be exchanged through the shared event ring of the host (see `util.ring`). Senders append
+each event to the ring once regardless of the number of listeners, and each listener reads the ring at its own pace
+using `EventRingReader`, which passes the events to a receiver. Events overwritten before a slow listener reads them are
+counted as lost.
+"""
+
+import errno
 import json
 import logging
+import os
+import socket
+import time
 from abc import abstractmethod
+from collections import deque, OrderedDict
+from copy import copy
+from dataclasses import replace
+from itertools import islice
 from json import JSONDecodeError
+from pathlib import Path
+from threading import Lock, Event, Thread
+from typing import NamedTuple, Optional, Deque, Dict, List, Tuple
 
 from tarotools.taro import util, paths
+from tarotools.taro.criteria import JobRunIdCriterion
 from tarotools.taro.job import JobInstanceMetadata, JobRun, InstanceTransitionObserver, InstanceOutputObserver
-from tarotools.taro.run import PhaseRun, PhaseMetadata
+from tarotools.taro.run import PhaseRun, PhaseMetadata, RunState, NONE_PHASE_RUN, Lifecycle
+from tarotools.taro.util.discovery import SocketDiscovery
+from tarotools.taro.util.dispatch import DispatchQueue, DispatchStats, OverflowPolicy
 from tarotools.taro.util.observer import ObservableNotification
+from tarotools.taro.util.ring import EventRing
 from tarotools.taro.util.socket import SocketServer
 
 log = logging.getLogger(__name__)
@@ -15,11 +52,152 @@ log = logging.getLogger(__name__)
 TRANSITION_LISTENER_FILE_EXTENSION = '.tlistener'
 OUTPUT_LISTENER_FILE_EXTENSION = '.olistener'
 
+ENVELOPE_VERSION = 1
+_ENVELOPE_PREFIX = '{"envelope": '
+
+
+class EventHeader(NamedTuple):
+    """
+    The header of an event envelope.
+
+    Attributes:
+        version: Version of the envelope format.
+        event_type: Type of the event.
+        job_id: Job ID of the instance which produced the event.
+        run_id: Run ID of the instance which produced the event.
+        phase: Name of the phase the event relates to (the new phase of a transition or the phase producing output).
+    """
+    version: int
+    event_type: str
+    job_id: str
+    run_id: str
+    phase: Optional[str]
+
+    @classmethod
+    def decode(cls, header_line: str) -> 'EventHeader':
+        """
+        Raises:
+            ValueError: If the header is not valid.
+        """
+        try:
+            as_dict = json.loads(header_line)
+            return cls(as_dict['envelope'], as_dict['event_type'], as_dict['job_id'], as_dict['run_id'],
+                       as_dict.get('phase'))
+        except (JSONDecodeError, KeyError, TypeError) as e:
+            raise ValueError(f"event=[invalid_event_header] reason=[{e}]")
+
+    def encode(self) -> str:
+        return json.dumps({
+            "envelope": self.version,
+            "event_type": self.event_type,
+            "job_id": self.job_id,
+            "run_id": self.run_id,
+            "phase": self.phase,
+        })
+
+
+TRANSITION_EVENT_TYPE = 'instance_phase_transition'
+OUTPUT_EVENT_TYPE = 'instance_output'
+MAX_BATCH_BYTES = 32768  # The maximum size of a datagram with batched events in encoded bytes
+MAX_BACKLOG_EVENTS = 1000  # The maximum number of events waiting for a listener under pressure
+BACKLOG_FLUSH_INTERVAL = 0.05  # Seconds between the attempts to send the backlog when no other event is sent
+CLOSE_FLUSH_TIMEOUT = 1.0  # The maximum number of seconds the closing sender keeps trying to send the backlog
+MAX_TRACKED_INSTANCES = 10000  # Instances whose last transition ordinal is remembered to detect missed transitions
+EVENT_RING_FILE = 'events.ring'
+FILTER_FILE_SUFFIX = '.filter'
+
+
+def encode_event(event_type: str, instance_meta: JobInstanceMetadata, event, phase=None) -> str:
+    """
+    Creates an event datagram in the envelope format.
+
+    Args:
+        event_type (str): Type of the event.
+        instance_meta (JobInstanceMetadata): Metadata of the instance producing the event.
+        event (dict): The serialized event.
+        phase (str, optional): Name of the phase the event relates to.
+
+    Returns:
+        str: The encoded event.
+    """
+    header = EventHeader(ENVELOPE_VERSION, event_type, instance_meta.job_id, instance_meta.run_id, phase)
+    body = {
+        "event_metadata": {"event_type": event_type},
+        "instance_metadata": instance_meta.serialize(),
+        "event": event,
+    }
+    return header.encode() + '\n' + json.dumps(body)
+
 
 def _listener_socket_name(ext):
     return util.unique_timestamp_hex() + ext
 
 
+class ListenerFilter(NamedTuple):
+    """
+    Filter of the events published by a listener in the sidecar file next to its socket.
+    Empty fields do not restrict the events.
+
+    Attributes:
+        event_types: Only events of these types are accepted.
+        id_match: Only events of matching instances are accepted.
+        phases: Only events related to these phases are accepted. Events without a phase in the header are accepted.
+    """
+    event_types: Tuple[str, ...] = ()
+    id_match: Optional[JobRunIdCriterion] = None
+    phases: Tuple[str, ...] = ()
+
+    @classmethod
+    def deserialize(cls, as_dict) -> 'ListenerFilter':
+        id_match = as_dict.get('id_match')
+        return cls(tuple(as_dict.get('event_types') or ()),
+                   JobRunIdCriterion.deserialize(id_match) if id_match else None,
+                   tuple(as_dict.get('phases') or ()))
+
+    def serialize(self):
+        return {
+            'event_types': list(self.event_types),
+            'id_match': self.id_match.serialize() if self.id_match else None,
+            'phases': list(self.phases),
+        }
+
+    def accepts(self, header: EventHeader) -> bool:
+        if self.event_types and header.event_type not in self.event_types:
+            return False
+        if self.phases and header.phase is not None and header.phase not in self.phases:
+            return False
+        return not self.id_match or self.id_match((header.job_id, header.run_id))
+
+
+def filter_file_path(socket_path: Path) -> Path:
+    return socket_path.with_name(socket_path.name + FILTER_FILE_SUFFIX)
+
+
+def publish_filter(socket_path: Path, listener_filter: ListenerFilter):
+    """
+    Writes the filter to the sidecar file of the listener socket. The file is replaced atomically,
+    so the senders never read a partially written filter.
+    """
+    filter_path = filter_file_path(socket_path)
+    tmp_path = filter_path.with_name(filter_path.name + '.tmp')
+    tmp_path.write_text(json.dumps(listener_filter.serialize()))
+    os.replace(tmp_path, filter_path)
+
+
+def read_filter(socket_path: Path) -> Optional[ListenerFilter]:
+    """
+    Returns:
+        Optional[ListenerFilter]: The filter published by the listener or None if the listener has not published any.
+    """
+    try:
+        return ListenerFilter.deserialize(json.loads(filter_file_path(socket_path).read_text()))
+    except FileNotFoundError:
+        return None
+    except (JSONDecodeError, KeyError, TypeError, ValueError) as e:
+        log.warning(f"event=[invalid_listener_filter] listener=[{socket_path}] reason=[{e}]")
+        return None
+
+
 def _missing_field_txt(obj, missing):
     return f"event=[invalid_event] object=[{obj}] reason=[missing field: {missing}]"
 
@@ -41,42 +219,212 @@ def _read_metadata(req_body_json):
 
 
 class EventReceiver(SocketServer):
-
-    def __init__(self, socket_name, id_match=None, event_types=()):
-        super().__init__(lambda: paths.socket_path(socket_name, create=True), allow_ping=True)
+    """
+    Receives events sent by the job instances.
+
+    By default, the events are handled directly on the thread reading the socket. A slow handler (observer) then delays
+    reading of the socket and the events are lost when the socket buffer is full. To prevent this, the receiver can use
+    a bounded dispatch queue: the reading thread only pre-filters the events by their header and puts them into
+    the queue. The events are parsed and handled on the dispatching thread. The overflow policy of the queue decides
+    which events are dropped when the queue is full, and the dropped events are counted in `dispatch_stats`.
+    """
+
+    def __init__(self, socket_name, id_match=None, event_types=(), *,
+                 dispatch_capacity=0, overflow=OverflowPolicy.BLOCK, max_batch=1):
+        """
+        Args:
+            socket_name (str): File name of the receiver socket.
+            id_match (JobRunIdCriterion, optional): Only events of matching instances are handled.
+            event_types (Iterable[str], optional): Only events of these types are handled.
+            dispatch_capacity (int): Capacity of the dispatch queue. Zero (default) means events are handled
+                directly on the reading thread without a queue.
+            overflow (OverflowPolicy): What to do when the dispatch queue is full. Defaults to blocking the reading.
+            max_batch (int): The maximum number of queued events passed to `handle_events` together.
+        """
+        super().__init__(lambda: self._publish_filter(paths.socket_path(socket_name, create=True)), allow_ping=True)
+        self._filter_path: Optional[Path] = None
         self.id_match = id_match
         self.event_types = event_types
-
-    def handle(self, req_body):
+        self._dispatch: Optional[DispatchQueue[str]] = None
+        if dispatch_capacity:
+            self._dispatch = DispatchQueue(self._process_events, capacity=dispatch_capacity, overflow=overflow,
+                                           max_batch=max_batch, name='Thread-EventDispatch')
+
+    def listener_filter(self) -> ListenerFilter:
+        """
+        Returns:
+            ListenerFilter: The filter published for the senders. Subclasses extend it with their own filters.
+        """
+        id_match = self.id_match if isinstance(self.id_match, JobRunIdCriterion) else None
+        if self.id_match and id_match is None:
+            log.debug(f"event=[id_match_not_published] type=[{type(self.id_match).__name__}]")
+        return ListenerFilter(tuple(self.event_types or ()), id_match)
+
+    def _publish_filter(self, socket_path: Path) -> Path:
+        # Published before the socket is bound so the senders discovering the socket always find the filter
         try:
-            req_body_json = json.loads(req_body)
-        except JSONDecodeError:
-            log.warning(f"event=[invalid_json_event_received] length=[{len(req_body)}]")
-            return
+            publish_filter(socket_path, self.listener_filter())
+            self._filter_path = filter_file_path(socket_path)
+        except OSError as e:
+            log.warning(f"event=[listener_filter_not_published] socket=[{socket_path}] error=[{e}]")
+        return socket_path
+
+    def start(self) -> bool:
+        if self._dispatch:
+            self._dispatch.start()
+        started = super().start()
+        if not started and self._dispatch:
+            self._dispatch.close()
+        return started
+
+    @property
+    def dispatch_stats(self) -> Optional[DispatchStats]:
+        """
+        Returns:
+            Optional[DispatchStats]: Statistics of the dispatch queue or None if the queue is not used.
+        """
+        return self._dispatch.stats if self._dispatch else None
 
-        try:
-            event_type, instance_meta = _read_metadata(req_body_json)
-        except ValueError as e:
-            log.warning(e)
-            return
-
-        if (self.event_types and event_type not in self.event_types) or \
-                (self.id_match and not self.id_match(instance_meta.id)):
+    def handle(self, req_body):
+        if req_body.startswith(_ENVELOPE_PREFIX):
+            accepted = []
+            lines = req_body.split('\n')
+            # A datagram can contain several envelopes (header and body lines) batched by the sender
+            for header_line, body in zip(lines[::2], lines[1::2]):
+                try:
+                    header = EventHeader.decode(header_line)
+                except ValueError as e:
+                    log.warning(e)
+                    continue
+                if header.version > ENVELOPE_VERSION:
+                    log.warning(f"event=[unsupported_event_envelope] version=[{header.version}]")
+                    continue
+                if self.accepts_header(header):  # Otherwise filtered out without parsing the body
+                    accepted.append(body)
+        else:
+            accepted = [req_body]  # Legacy event without the header
+
+        if not accepted:
             return
-
-        self.handle_event(event_type, instance_meta, req_body_json.get('event'))
+        if self._dispatch:
+            for body in accepted:
+                self._dispatch.put(body)
+        else:
+            self._process_events(accepted)
+
+    def _process_events(self, req_bodies):
+        events = []
+        for req_body in req_bodies:
+            try:
+                req_body_json = json.loads(req_body)
+            except JSONDecodeError:
+                log.warning(f"event=[invalid_json_event_received] length=[{len(req_body)}]")
+                continue
+
+            try:
+                event_type, instance_meta = _read_metadata(req_body_json)
+            except ValueError as e:
+                log.warning(e)
+                continue
+
+            if (self.event_types and event_type not in self.event_types) or \
+                    (self.id_match and not self.id_match((instance_meta.job_id, instance_meta.run_id))):
+                continue
+
+            events.append((event_type, instance_meta, req_body_json.get('event')))
+
+        if events:
+            self.handle_events(events)
+
+    def accepts_header(self, header: EventHeader) -> bool:
+        """
+        Pre-filters the events by their header. The body of the events rejected by this method is not parsed.
+        Subclasses can extend the filter using the other fields of the header.
+
+        Args:
+            header (EventHeader): The header of the received event.
+
+        Returns:
+            bool: Whether the event should be handled.
+        """
+        if self.event_types and header.event_type not in self.event_types:
+            return False
+        return not self.id_match or self.id_match((header.job_id, header.run_id))
+
+    def handle_events(self, events):
+        """
+        Handles a batch of received events, each represented as (event_type, instance_meta, event) tuple.
+        The default implementation handles the events one by one, see `InstanceOutputReceiver` for a receiver
+        notifying its observers about the whole batch at once.
+        """
+        for event_type, instance_meta, event in events:
+            self.handle_event(event_type, instance_meta, event)
 
     @abstractmethod
     def handle_event(self, event_type, instance_meta, event):
         pass
 
+    def close(self):
+        super().close()
+        if self._filter_path:
+            self._filter_path.unlink(missing_ok=True)
+        if self._dispatch:
+            self._dispatch.close()
 
-class InstanceTransitionReceiver(EventReceiver):
+    def wait(self):
+        super().wait()
+        if self._dispatch:
+            self._dispatch.wait()
 
-    def __init__(self, id_match=None, phases=()):
-        super().__init__(_listener_socket_name(TRANSITION_LISTENER_FILE_EXTENSION), id_match)
+
+class InstanceTransitionReceiver(EventReceiver):
+    """
+    Receives phase transitions of the instances and notifies the transition observers.
+
+    The ordinal of a transition is a per-instance sequence number incremented by one with each transition. When
+    the ordinal of a received transition is not the successor of the last received ordinal of the instance, the events
+    in between were lost (e.g. dropped by a full socket buffer). The missed transitions are then recovered from
+    the lifecycle of the instance snapshot included in the received event, and the observers are notified about them
+    in the original order before the received transition. Each recovered transition is notified with the snapshot
+    truncated to the phases up to that transition, so the phase count of the snapshot matches its ordinal. Transitions
+    to phases excluded by the `phases` filter are not considered missed.
+
+    The last ordinals are remembered for at most `MAX_TRACKED_INSTANCES` instances, the least recently updated
+    are forgotten first (e.g. instances whose ended transition was lost).
+    """
+
+    def __init__(self, id_match=None, phases=(), **dispatch_options):
+        """
+        Args:
+            id_match (JobRunIdCriterion, optional): Only transitions of matching instances are received.
+            phases (Iterable[str], optional): Only transitions to these phases are received.
+            dispatch_options: Options of the dispatch queue, see `EventReceiver`.
+        """
+        super().__init__(_listener_socket_name(TRANSITION_LISTENER_FILE_EXTENSION), id_match, **dispatch_options)
         self.phases = phases
         self._notification = ObservableNotification[InstanceTransitionObserver]()
+        self._lock = Lock()
+        # Guarded by the lock:
+        self._last_ordinals: OrderedDict[str, int] = OrderedDict()
+        self._recovered = 0
+        # ----------------------- #
+
+    @property
+    def recovered_transitions(self) -> int:
+        """
+        Returns:
+            int: Number of missed transitions recovered from the snapshots of later events.
+        """
+        with self._lock:
+            return self._recovered
+
+    def listener_filter(self) -> ListenerFilter:
+        return super().listener_filter()._replace(phases=tuple(self.phases or ()))
+
+    def accepts_header(self, header):
+        if self.phases and header.phase is not None and header.phase not in self.phases:
+            return False
+        return super().accepts_header(header)
 
     def handle_event(self, _, instance_meta, event):
         new_phase = PhaseRun.deserialize(event["new_phase"])
@@ -88,8 +436,48 @@ class InstanceTransitionReceiver(EventReceiver):
         previous_phase = PhaseRun.deserialize(event['previous_phase'])
         ordinal = event['ordinal']
 
+        missed = self._track_ordinal(job_run, new_phase, ordinal)
+        for missed_job_run, missed_previous, missed_new, missed_ordinal in missed:
+            self._notification.observer_proxy.new_instance_phase(
+                missed_job_run, missed_previous, missed_new, missed_ordinal)
         self._notification.observer_proxy.new_instance_phase(job_run, previous_phase, new_phase, ordinal)
 
+    def _track_ordinal(self, job_run, new_phase, ordinal) -> List[Tuple[JobRun, PhaseRun, PhaseRun, int]]:
+        """
+        Returns:
+            List[Tuple[JobRun, PhaseRun, PhaseRun, int]]:
+                Transitions missed since the last received transition of the instance.
+        """
+        instance_id = job_run.metadata.instance_id
+        with self._lock:
+            last_ordinal = self._last_ordinals.get(instance_id)
+            if new_phase.run_state == RunState.ENDED:
+                self._last_ordinals.pop(instance_id, None)  # No more transitions
+            else:
+                self._last_ordinals[instance_id] = max(ordinal, last_ordinal or 0)
+                self._last_ordinals.move_to_end(instance_id)
+                if len(self._last_ordinals) > MAX_TRACKED_INSTANCES:
+                    self._last_ordinals.popitem(last=False)
+
+            if last_ordinal is None or ordinal <= last_ordinal + 1:
+                return []
+
+            phase_runs = job_run.run.lifecycle.phase_runs
+            missed = []
+            for missed_ordinal in range(last_ordinal + 1, min(ordinal, len(phase_runs) + 1)):
+                if self.phases and phase_runs[missed_ordinal - 1].phase_name not in self.phases:
+                    continue  # Filtered out, not missed
+                snapshot = _snapshot_at(job_run, missed_ordinal)
+                lifecycle = snapshot.run.lifecycle
+                missed.append(
+                    (snapshot, lifecycle.previous_run or NONE_PHASE_RUN, lifecycle.current_run, missed_ordinal))
+            self._recovered += len(missed)
+
+        if missed:
+            log.warning(f"event=[missed_transitions_recovered] instance=[{instance_id}] "
+                        f"ordinals=[{[m[3] for m in missed]}]")
+        return missed
+
     def add_observer_transition(self, observer):
         self._notification.add_observer(observer)
 
@@ -97,20 +485,409 @@ class InstanceTransitionReceiver(EventReceiver):
         self._notification.remove_observer(observer)
 
 
+def _snapshot_at(job_run: JobRun, ordinal: int) -> JobRun:
+    """
+    Returns:
+        JobRun: The snapshot of the instance as it was right after the transition with the given ordinal.
+        Only the lifecycle is reconstructed, the tracked task is the one of the provided snapshot.
+    """
+    phase_runs = [copy(phase_run) for phase_run in job_run.run.lifecycle.phase_runs[:ordinal]]
+    phase_runs[-1].ended_at = None
+    return replace(job_run, run=replace(job_run.run, lifecycle=Lifecycle(*phase_runs), termination=None))
+
+
 class InstanceOutputReceiver(EventReceiver):
 
-    def __init__(self, id_match=None):
-        super().__init__(_listener_socket_name(OUTPUT_LISTENER_FILE_EXTENSION), id_match)
+    def __init__(self, id_match=None, **dispatch_options):
+        """
+        Args:
+            id_match (JobRunIdCriterion, optional): Only output of matching instances is received.
+            dispatch_options: Options of the dispatch queue, see `EventReceiver`.
+        """
+        super().__init__(_listener_socket_name(OUTPUT_LISTENER_FILE_EXTENSION), id_match, **dispatch_options)
         self._notification = ObservableNotification[InstanceOutputObserver]()
 
+    def handle_events(self, events):
+        """
+        The observers are notified once per batch by `InstanceOutputObserver.new_instance_outputs`.
+        The batch contains the outputs dispatched together, see the `max_batch` option of `EventReceiver`.
+        """
+        outputs = [self._output(instance_meta, event) for _, instance_meta, event in events]
+        if outputs:
+            self._notification.observer_proxy.new_instance_outputs(outputs)
+
     def handle_event(self, _, instance_meta, event):
-        phase = PhaseMetadata.deserialize(event['phase'])
-        output = event['output']
-        is_error = event['is_error']
-        self._notification.observer_proxy.new_instance_output(instance_meta, phase, output, is_error)
+        self._notification.observer_proxy.new_instance_output(*self._output(instance_meta, event))
+
+    @staticmethod
+    def _output(instance_meta, event):
+        return instance_meta, PhaseMetadata.deserialize(event['phase']), event['output'], event['is_error']
 
     def add_observer_output(self, observer):
         self._notification.add_observer(observer)
 
     def remove_observer_output(self, observer):
         self._notification.remove_observer(observer)
+
+
+class ListenerStats(NamedTuple):
+    """
+    Attributes:
+        sent: Number of events delivered to the listener socket.
+        dropped: Number of events dropped because the listener was not able to receive them.
+        backlog: Number of events waiting to be sent in a batch.
+        filtered: Number of events not sent because they did not match the filter of the listener.
+    """
+    sent: int
+    dropped: int
+    backlog: int
+    filtered: int = 0
+
+
+class _Listener:
+
+    def __init__(self, listener_filter: Optional[ListenerFilter]):
+        self.filter = listener_filter
+        self.sent = 0
+        self.dropped = 0
+        self.filtered = 0
+        self.backlog: Deque[bytes] = deque()  # Encoded events, so the batches are limited by the sent bytes
+
+
+class EventSender:
+    """
+    Sends events to all listener sockets with the given extension without blocking the sending thread.
+
+    When the buffer of a listener socket is full, the event is dropped for that listener and the drop is counted.
+    Events marked as batchable (output) are not dropped immediately: they are kept in a bounded backlog of the listener
+    and sent together in a single datagram once the listener socket accepts data again. The backlog is sent with
+    the next event or by the flusher thread retrying every `BACKLOG_FLUSH_INTERVAL` seconds, so the tail of the output
+    is delivered even when no other event follows. On close, the rest of the backlog is sent for at most
+    `CLOSE_FLUSH_TIMEOUT` seconds. Listeners whose sockets are not bound anymore are pruned, and their socket files
+    are removed.
+
+    The filter published by a listener (see `ListenerFilter`) is read when the listener is discovered, and the events
+    not matching the filter are not sent to the listener.
+    """
+
+    def __init__(self, file_extension, *, discovery: Optional[SocketDiscovery] = None):
+        """
+        Args:
+            file_extension (str): Extension of the listener sockets.
+            discovery (SocketDiscovery, optional): Discovery of the listener sockets.
+                A discovery created by the sender when not provided is closed with the sender.
+        """
+        self._owns_discovery = discovery is None
+        self._discovery = discovery or SocketDiscovery(lambda: paths.socket_dir(False), file_extension)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+        self._lock = Lock()
+        self._closing = Event()
+        # Guarded by the lock:
+        self._listeners: Dict[Path, _Listener] = {}
+        self._flusher: Optional[Thread] = None
+        # ----------------------- #
+
+    def send(self, datagram: str, *, batchable=False):
+        """
+        Sends the encoded event to all listeners.
+
+        Args:
+            datagram (str): The event encoded by `encode_event`.
+            batchable (bool): Whether the event can be delayed and sent in a batch with other events when a listener
+                is not able to receive it immediately.
+        """
+        encoded = datagram.encode()
+        header = None
+        with self._lock:
+            listener_paths = self._discovery.sockets()
+            for path in listener_paths:
+                listener = self._listeners.get(path)
+                if listener is None:
+                    listener = self._listeners[path] = _Listener(read_filter(path))
+                if listener.filter:
+                    if header is None:
+                        header = _decode_datagram_header(datagram)
+                    if header and not listener.filter.accepts(header):
+                        listener.filtered += 1
+                        continue
+                if listener.backlog:
+                    if batchable:  # Sent in the batch with the backlog
+                        self._add_to_backlog(listener, encoded, batchable)
+                        self._flush_backlog(path, listener)
+                        continue
+                    if not self._flush_backlog(path, listener):
+                        listener.dropped += 1
+                        continue
+                try:
+                    self._sock.sendto(encoded, str(path))
+                    listener.sent += 1
+                except BlockingIOError:  # EAGAIN: the buffer of the listener is full
+                    self._add_to_backlog(listener, encoded, batchable)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    self._prune(path)
+                except OSError as e:
+                    if e.errno != errno.EMSGSIZE:
+                        raise
+                    log.error(f"event=[event_too_large] listener=[{path}] length=[{len(encoded)}]")
+                    listener.dropped += 1
+
+            for gone in self._listeners.keys() - set(listener_paths):
+                del self._listeners[gone]
+
+    def _add_to_backlog(self, listener, encoded, batchable):
+        if not batchable:
+            listener.dropped += 1
+            return
+        if len(listener.backlog) >= MAX_BACKLOG_EVENTS:
+            listener.backlog.popleft()
+            listener.dropped += 1
+        listener.backlog.append(encoded)
+        if not self._flusher and not self._closing.is_set():
+            self._flusher = Thread(target=self._run_flusher, name='Thread-EventFlusher', daemon=True)
+            self._flusher.start()
+
+    def _run_flusher(self):
+        while not self._closing.wait(BACKLOG_FLUSH_INTERVAL):
+            with self._lock:
+                if self._flush_backlogs():
+                    self._flusher = None  # Started again by the next backlog
+                    return
+
+    def _flush_backlogs(self) -> bool:
+        """
+        Returns:
+            bool: True if the backlogs of all the listeners were sent.
+        """
+        flushed = True
+        for path, listener in list(self._listeners.items()):
+            if listener.backlog and not self._flush_backlog(path, listener):
+                flushed = flushed and path not in self._listeners  # Pruned listeners have nothing to send
+        return flushed
+
+    def _flush_backlog(self, path, listener) -> bool:
+        """
+        Returns:
+            bool: True if the whole backlog was sent.
+        """
+        while listener.backlog:
+            batch = [listener.backlog[0]]
+            size = len(batch[0])
+            for encoded in islice(listener.backlog, 1, None):
+                size += len(encoded) + 1
+                if size > MAX_BATCH_BYTES:
+                    break
+                batch.append(encoded)
+            try:
+                self._sock.sendto(b'\n'.join(batch), str(path))
+            except BlockingIOError:
+                return False
+            except (ConnectionRefusedError, FileNotFoundError):
+                self._prune(path)
+                return False
+            for _ in batch:
+                listener.backlog.popleft()
+            listener.sent += len(batch)
+        return True
+
+    def _prune(self, path):
+        log.debug(f"event=[dead_listener_pruned] listener=[{path}]")
+        self._listeners.pop(path, None)
+        self._discovery.mark_stale(path)
+        path.unlink(missing_ok=True)
+        filter_file_path(path).unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, ListenerStats]:
+        """
+        Returns:
+            Dict[str, ListenerStats]: Statistics of the known listeners by their socket names.
+        """
+        with self._lock:
+            return {path.name: ListenerStats(listener.sent, listener.dropped, len(listener.backlog), listener.filtered)
+                    for path, listener in self._listeners.items()}
+
+    def close(self):
+        self._closing.set()
+        with self._lock:
+            flusher = self._flusher
+        if flusher:
+            flusher.join()
+
+        deadline = time.monotonic() + CLOSE_FLUSH_TIMEOUT
+        with self._lock:
+            while not self._flush_backlogs():
+                if time.monotonic() >= deadline:
+                    for path, listener in self._listeners.items():
+                        if listener.backlog:
+                            log.warning(f"event=[backlog_dropped_on_close] listener=[{path}] "
+                                        f"count=[{len(listener.backlog)}]")
+                            listener.dropped += len(listener.backlog)
+                            listener.backlog.clear()
+                    break
+                time.sleep(BACKLOG_FLUSH_INTERVAL)
+            self._sock.close()
+        if self._owns_discovery:
+            self._discovery.close()
+
+
+def _decode_datagram_header(datagram: str) -> Optional[EventHeader]:
+    if not datagram.startswith(_ENVELOPE_PREFIX):
+        return None  # Legacy event, cannot be filtered
+    try:
+        return EventHeader.decode(datagram[:datagram.find('\n')])
+    except ValueError:
+        return None
+
+
+def open_event_ring() -> EventRing:
+    """
+    Returns:
+        EventRing: The event ring of the host, created in the socket directory if it does not exist yet.
+    """
+    return EventRing.open(paths.socket_path(EVENT_RING_FILE, create=True))
+
+
+class EventRingSender:
+    """
+    Appends events to the event ring. It can be used instead of `EventSender` by `TransitionSender` and `OutputSender`.
+    Each event is written once regardless of the number of listeners and the sending never blocks on a listener.
+    """
+
+    def __init__(self, ring: Optional[EventRing] = None):
+        """
+        Args:
+            ring (EventRing, optional): The ring to append the events to. The event ring of the host by default.
+        """
+        self._owns_ring = ring is None
+        self._ring = ring or open_event_ring()
+        self._dropped = 0
+
+    def send(self, datagram: str, *, batchable=False):
+        """
+        Appends the encoded event to the ring.
+
+        Args:
+            datagram (str): The event encoded by `encode_event`.
+            batchable (bool): Ignored, the listeners read the ring in batches.
+        """
+        try:
+            self._ring.append(datagram.encode())
+        except ValueError:
+            self._dropped += 1
+            log.error(f"event=[event_too_large] ring=[{EVENT_RING_FILE}] length=[{len(datagram)}]")
+
+    @property
+    def dropped(self) -> int:
+        return self._dropped
+
+    def close(self):
+        if self._owns_ring:
+            self._ring.close()
+
+
+class EventRingReader:
+    """
+    Reads events from the event ring on a dedicated thread and passes them to the receiver, which filters and handles
+    them in the same way as the events received by its socket. The socket of the receiver does not have to be started,
+    but a receiver with a dispatch queue must be started for the events to be dispatched.
+    """
+
+    def __init__(self, receiver: EventReceiver, ring: Optional[EventRing] = None, *, max_records=256):
+        """
+        Args:
+            receiver (EventReceiver): The receiver handling the read events.
+            ring (EventRing, optional): The ring to read. The event ring of the host by default.
+            max_records (int): The maximum number of events read at once.
+        """
+        self._receiver = receiver
+        self._owns_ring = ring is None
+        self._ring = ring or open_event_ring()
+        self._reader = self._ring.reader()
+        self._max_records = max_records
+        self._stopped = Event()
+        self._thread = Thread(target=self._run, name='Thread-EventRing', daemon=True)
+        self._lost = 0
+
+    @property
+    def lost(self) -> int:
+        """
+        Returns:
+            int: Number of events overwritten in the ring before they were read.
+        """
+        return self._lost
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            if not self._reader.wait(timeout=0.1):
+                continue
+            read = self._reader.read(self._max_records)
+            if read.lost:
+                self._lost += read.lost
+                log.warning(f"event=[ring_events_lost] count=[{read.lost}] lost_total=[{self._lost}]")
+            for record in read.records:
+                try:
+                    self._receiver.handle(record.payload.decode())
+                except Exception as e:
+                    log.exception(f"event=[ring_event_handling_failed] error=[{e}]")
+
+    def close(self):
+        self._stopped.set()
+
+    def wait(self):
+        if self._thread.is_alive():
+            self._thread.join()
+        if self._owns_ring:
+            self._ring.close()
+
+    def close_and_wait(self):
+        self.close()
+        self.wait()
+
+
+class TransitionSender(InstanceTransitionObserver):
+    """
+    Sends transitions of the observed instances to the transition listeners (see `InstanceTransitionReceiver`).
+    """
+
+    def __init__(self, sender: Optional[EventSender] = None):
+        self._sender = sender or EventSender(TRANSITION_LISTENER_FILE_EXTENSION)
+
+    @property
+    def sender(self) -> EventSender:
+        return self._sender
+
+    def new_instance_phase(self, job_run: JobRun, previous_phase: PhaseRun, new_phase: PhaseRun, ordinal: int):
+        event = {
+            "job_run": job_run.serialize(),
+            "previous_phase": previous_phase.serialize(),
+            "new_phase": new_phase.serialize(),
+            "ordinal": ordinal,
+        }
+        self._sender.send(encode_event(TRANSITION_EVENT_TYPE, job_run.metadata, event, new_phase.phase_name))
+
+    def close(self):
+        self._sender.close()
+
+
+class OutputSender(InstanceOutputObserver):
+    """
+    Sends output of the observed instances to the output listeners (see `InstanceOutputReceiver`).
+    Output lines for listeners under pressure are batched.
+    """
+
+    def __init__(self, sender: Optional[EventSender] = None):
+        self._sender = sender or EventSender(OUTPUT_LISTENER_FILE_EXTENSION)
+
+    @property
+    def sender(self) -> EventSender:
+        return self._sender
+
+    def new_instance_output(self, instance_meta: JobInstanceMetadata, phase: PhaseMetadata, output: str, is_err: bool):
+        event = {"phase": phase.serialize(), "output": output, "is_error": is_err}
+        self._sender.send(encode_event(OUTPUT_EVENT_TYPE, instance_meta, event, phase.phase_name), batchable=True)
+
+    def close(self):
+        self._sender.close()
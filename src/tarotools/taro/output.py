@@ -1,5 +1,6 @@
 from enum import Enum, auto
-from typing import List, Tuple, Dict
+from threading import Condition
+from typing import List, Tuple, Dict, NamedTuple, Set
 
 
 class Mode(Enum):
@@ -7,20 +8,58 @@ class Mode(Enum):
     TAIL = auto()
 
 
+class OutputPage(NamedTuple):
+    """
+    A page of output lines read from a cursor position.
+
+    Attributes:
+        lines: Output lines of the page as (text, is_error) tuples.
+        next_cursor: The cursor to be used for reading the next page.
+    """
+    lines: List[Tuple[str, bool]]
+    next_cursor: int
+
+
+class OutputMatch(NamedTuple):
+    """
+    An output line matching a search pattern.
+
+    Attributes:
+        line_number: The number of the line in the output starting from 1.
+        text: The text of the line.
+        is_error: Whether the line was printed to the error output.
+    """
+    line_number: int
+    text: str
+    is_error: bool
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
 class InMemoryOutput:
 
     def __init__(self):
         self._output_lines: List[Tuple[str, bool]] = []
         self._source_ranges: Dict[str, range] = {}
+        self._new_output = Condition()
+        self._trigram_index: Dict[str, List[int]] = {}  # Lower-cased trigram -> indices of lines containing it
 
     def add(self, source: str, output: str, is_error: bool):
-        self._output_lines.append((output, is_error))
+        with self._new_output:
+            self._output_lines.append((output, is_error))
+            line_index = len(self._output_lines) - 1
+            for trigram in _trigrams(output.lower()):
+                self._trigram_index.setdefault(trigram, []).append(line_index)
+
+            if source not in self._source_ranges:
+                self._source_ranges[source] = range(len(self._output_lines) - 1, len(self._output_lines))
+            else:
+                start = self._source_ranges[source].start
+                self._source_ranges[source] = range(start, len(self._output_lines))
 
-        if source not in self._source_ranges:
-            self._source_ranges[source] = range(len(self._output_lines) - 1, len(self._output_lines))
-        else:
-            start = self._source_ranges[source].start
-            self._source_ranges[source] = range(start, len(self._output_lines))
+            self._new_output.notify_all()
 
     def fetch(self, mode=Mode.HEAD, *, source=None, lines=0) -> List[Tuple[str, bool]]:
         if lines < 0:
@@ -45,3 +84,76 @@ class InMemoryOutput:
                 return self._output_lines[-lines:]
 
         return self._output_lines
+
+    def fetch_page(self, since=0, *, max_bytes=0, timeout=0) -> OutputPage:
+        """
+        Reads output lines starting at the `since` cursor. The cursor is the number of lines already read,
+        so the cursor returned in the page can be passed to the next call to continue reading.
+
+        Args:
+            since (int): The cursor position to read from. Defaults to 0 (the beginning of the output).
+            max_bytes (int): The maximum size of the page in bytes of UTF-8 encoded lines. At least one line is always
+                returned if available. Zero means no limit.
+            timeout (float): Seconds to wait for new output when there is none after the cursor. Zero means no waiting.
+
+        Returns:
+            OutputPage: The lines of the page and the cursor for the next page.
+        """
+        if since < 0:
+            raise ValueError("Invalid argument: arg `since` cannot be negative but was " + str(since))
+
+        with self._new_output:
+            if timeout and since >= len(self._output_lines):
+                self._new_output.wait_for(lambda: since < len(self._output_lines), timeout)
+
+            end = len(self._output_lines)
+            if max_bytes:
+                size = 0
+                for index in range(since, end):
+                    size += len(self._output_lines[index][0].encode())
+                    if size > max_bytes and index > since:
+                        end = index
+                        break
+
+            return OutputPage(self._output_lines[since:end], max(since, end))
+
+    def search(self, pattern: str, *, ignore_case=False) -> List[OutputMatch]:
+        """
+        Finds output lines containing the provided text.
+
+        The lines are looked up in the trigram index which is updated when an output line is added.
+        Only the candidate lines containing all the trigrams of the pattern are tested, therefore the search does not
+        need to scan the whole output. Patterns shorter than three characters cannot use the index.
+
+        Args:
+            pattern (str): The text to search for.
+            ignore_case (bool): Whether the search is case-insensitive. Defaults to False.
+
+        Returns:
+            List[OutputMatch]: Matching lines in the order as they were added to the output.
+        """
+        if not pattern:
+            raise ValueError("Invalid argument: arg `pattern` cannot be empty")
+
+        needle = pattern.lower() if ignore_case else pattern
+
+        def matches(line):
+            return needle in (line.lower() if ignore_case else line)
+
+        with self._new_output:
+            pattern_trigrams = _trigrams(pattern.lower())
+            if not pattern_trigrams:
+                candidates = range(len(self._output_lines))
+            else:
+                postings = sorted((self._trigram_index.get(t, ()) for t in pattern_trigrams), key=len)
+                if not postings[0]:
+                    return []
+                candidates = set(postings[0])
+                for posting in postings[1:]:
+                    candidates.intersection_update(posting)
+                    if not candidates:
+                        return []
+                candidates = sorted(candidates)
+
+            return [OutputMatch(i + 1, *self._output_lines[i])
+                    for i in candidates if matches(self._output_lines[i][0])]
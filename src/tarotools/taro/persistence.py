@@ -4,11 +4,13 @@ This module consists of:
 - The persistence contract:
     The contract defines the mandatory methods for a class implementing the persistence functionality:
         > read_instances(instance_match, sort, *, asc, limit, offset, last)
+        > iter_job_runs(instance_match, sort, *, asc, limit, offset, last)
+        > read_job_runs_page(instance_match, sort, *, asc, limit, page_token)
         > read_stats(instance_match)
         > count_instances(instance_match)
         > store_instances(*job_inst)
         > remove_instances(instance_match)
-        > clean_up(max_records, max_age)
+        > clean_up(max_records, max_age, *, max_batches, slack)
     An instance of this class is returned when the `create_persistence()` function of the implementing module is called.
 
 - Persistence implementation lookup:
@@ -27,10 +29,13 @@ This module consists of:
 
 """
 
+import base64
+import binascii
 import importlib
+import json
 import pkgutil
 from enum import Enum
-from typing import List
+from typing import List, Iterator, NamedTuple, Optional, Any
 
 import sys
 
@@ -38,7 +43,7 @@ from tarotools import taro
 from tarotools.taro import paths, db
 from tarotools.taro import util, cfg
 from tarotools.taro.common import TaroException
-from tarotools.taro.job import JobStats, JobRuns
+from tarotools.taro.job import JobStats, JobRuns, JobRun
 from tarotools.taro.run import RunState
 
 
@@ -113,6 +118,54 @@ class SortCriteria(Enum):
     TIME = 3
 
 
+DEFAULT_PAGE_SIZE = 100
+STORE_CLEAN_UP_BATCHES = 1
+STORE_CLEAN_UP_SLACK = 1000
+
+
+class PageToken(NamedTuple):
+    """
+    Position in the sorted history after which the next page starts (keyset pagination).
+    The position is the sort value and the row ID of the last instance of the previous page.
+
+    Attributes:
+        sort: The sort criteria of the paged query.
+        asc: The sort direction of the paged query.
+        sort_value: The value of the sort column of the last instance of the previous page.
+        row_id: The row ID of the last instance of the previous page, breaking ties between equal sort values.
+    """
+    sort: SortCriteria
+    asc: bool
+    sort_value: Any
+    row_id: int
+
+    @classmethod
+    def decode(cls, token: str) -> 'PageToken':
+        """
+        Raises:
+            ValueError: If the token is not valid.
+        """
+        try:
+            sort, asc, sort_value, row_id = json.loads(base64.urlsafe_b64decode(token.encode()))
+            return cls(SortCriteria[sort], bool(asc), sort_value, int(row_id))
+        except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError, KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid page token: {token}") from e
+
+    def encode(self) -> str:
+        return base64.urlsafe_b64encode(
+            json.dumps([self.sort.name, self.asc, self.sort_value, self.row_id]).encode()).decode()
+
+
+class JobRunsPage(NamedTuple):
+    """
+    Attributes:
+        job_runs: The instances of the page.
+        next_page_token: Token of the next page or None if this is the last page.
+    """
+    job_runs: JobRuns
+    next_page_token: Optional[str]
+
+
 def read_instances(instance_match=None, sort=SortCriteria.ENDED, *, asc=True, limit=-1, offset=-1, last=False) \
         -> JobRuns:
     """
@@ -139,6 +192,47 @@ def read_instances(instance_match=None, sort=SortCriteria.ENDED, *, asc=True, li
     return _instance().read_instances(instance_match, sort, asc=asc, limit=limit, offset=offset, last=last)
 
 
+def read_instances_page(instance_match=None, sort=SortCriteria.ENDED, *, asc=True, limit=DEFAULT_PAGE_SIZE,
+                        page_token=None) -> JobRunsPage:
+    """
+    Fetches a page of ended job instances based on specified criteria. Unlike paging with `offset`, the page is located
+    by the position of the last instance of the previous page (keyset pagination), so the deep pages are fetched
+    as fast as the first one. Instances added or removed between the requests do not shift the pages.
+    Datasource: The database as defined by the configured persistence type.
+
+    Args:
+        instance_match (InstanceMatchCriteria, optional): Criteria to match specific job instances.
+        sort (SortCriteria): Determines the field by which records are sorted. Defaults to `SortCriteria.ENDED`.
+        asc (bool, optional): Determines if the sorting is in ascending order. Defaults to True.
+        limit (int, optional): Maximum number of instances in the page. Defaults to `DEFAULT_PAGE_SIZE`.
+        page_token (str, optional): `next_page_token` of the previous page. None for the first page.
+
+    Returns:
+        JobRunsPage: The instances of the page and the token of the next page.
+
+    Raises:
+        ValueError: If the page token is not valid or was issued for different sorting.
+    """
+    return _instance().read_job_runs_page(instance_match, sort, asc=asc, limit=limit, page_token=page_token)
+
+
+def iter_instances(instance_match=None, sort=SortCriteria.ENDED, *, asc=True, limit=-1, offset=-1, last=False) \
+        -> Iterator[JobRun]:
+    """
+    Iterates over ended job instances based on specified criteria. Unlike `read_instances`, the instances are read
+    from the database in chunks as the iterator is consumed, so exporting or analysing the whole history runs in
+    constant memory. The iterator should be exhausted or closed to release the database resources.
+    Datasource: The database as defined by the configured persistence type.
+
+    Args:
+        See `read_instances`.
+
+    Returns:
+        Iterator[JobRun]: Job instances that match the given criteria.
+    """
+    return _instance().iter_job_runs(instance_match, sort, asc=asc, limit=limit, offset=offset, last=last)
+
+
 def read_stats(instance_match=None) -> List[JobStats]:
     """
     Returns job statistics for each job based on specified criteria.
@@ -168,13 +262,16 @@ def count_instances(instance_match):
 def store_instances(*job_inst):
     """
     Stores the provided job instances to the configured persistence source.
-    After storing, it also initiates a cleanup based on configured criteria.
+    After storing, it also initiates a cleanup based on configured criteria. The cleanup removes records only
+    when more than `STORE_CLEAN_UP_SLACK` records exceed the limits, so the cost of the cleanup is paid once per that
+    many stored records, not by each store. It is limited to `STORE_CLEAN_UP_BATCHES` batches, so storing does not
+    wait for removing a large number of old records.
 
     Args:
         *job_inst (JobInst): Variable number of job instances to be stored.
     """
     _instance().store_instances(*job_inst)
-    clean_up_by_config()
+    clean_up_by_config(max_batches=STORE_CLEAN_UP_BATCHES, slack=STORE_CLEAN_UP_SLACK)
 
 
 def remove_instances(instance_match):
@@ -187,7 +284,7 @@ def remove_instances(instance_match):
     _instance().remove_instances(instance_match)
 
 
-def clean_up_by_config():
+def clean_up_by_config(*, max_batches=None, slack=0):
     """
     Cleans up the job instances in the configured persistence source based on max records and max age
     as defined in the configuration. See `clean_up` function for more details.
@@ -197,10 +294,10 @@ def clean_up_by_config():
     except ValueError:
         sys.stderr.write("Invalid max_age in " + str(paths.lookup_config_file()) + "\n")
         return
-    _instance().clean_up(cfg.persistence_max_records, max_age)
+    _instance().clean_up(cfg.persistence_max_records, max_age, max_batches=max_batches, slack=slack)
 
 
-def clean_up(max_records=-1, max_age=None):
+def clean_up(max_records=-1, max_age=None, *, max_batches=None, slack=0):
     """
     Cleans up old records in the configured persistence source based on given parameters.
     The cleanup can be based on a maximum number of records to retain or/and the age of the records.
@@ -212,8 +309,14 @@ def clean_up(max_records=-1, max_age=None):
         max_age (relativedelta, optional):
             The maximum age of the records to retain. Older records will be removed.
             If None, removal by age is not performed. Defaults to None.
+        max_batches (int, optional):
+            The maximum number of batches of records removed by this call. The remaining records are removed
+            by the following calls. If None, all the records are removed. Defaults to None.
+        slack (int, optional):
+            The number of records over the limits tolerated before the cleanup removes them. A positive value
+            lets frequent cleanups remove the records in larger, less frequent runs. Defaults to 0.
     """
-    _instance().clean_up(max_records, max_age)
+    _instance().clean_up(max_records, max_age, max_batches=max_batches, slack=slack)
 
 
 def close():
@@ -246,6 +349,12 @@ class _NoPersistence:
     def read_instances(self, instance_match=None, sort=SortCriteria.CREATED, *, asc, limit, offset, last=False):
         raise PersistenceDisabledError()
 
+    def iter_job_runs(self, instance_match=None, sort=SortCriteria.CREATED, *, asc, limit, offset, last=False):
+        raise PersistenceDisabledError()
+
+    def read_job_runs_page(self, instance_match=None, sort=SortCriteria.CREATED, *, asc, limit, page_token=None):
+        raise PersistenceDisabledError()
+
     def read_stats(self, instance_match=None):
         raise PersistenceDisabledError()
 
@@ -255,7 +364,7 @@ class _NoPersistence:
     def remove_instances(self, instance_match):
         raise PersistenceDisabledError()
 
-    def clean_up(self, max_records, max_age):
+    def clean_up(self, max_records, max_age, *, max_batches=None, slack=0):
         raise PersistenceDisabledError()
 
     def close(self):
@@ -0,0 +1,341 @@
+"""
+This module provides a push-based alternative to polling the active instances with `client.get_active_runs()`.
+
+A subscription takes an initial snapshot of the active instances using the instances API and then keeps it up to date
+using the transition events pushed by the instances to a transition listener. The observers of the subscription
+are notified only about changes, each identified by a sequence number continuing from the sequence number
+of the snapshot:
+    > A new instance appeared
+    > An instance transitioned to a new phase
+    > An instance ended (and therefore it is no longer active)
+    > An instance is no longer active, but its end was not received (the instance crashed or the event was lost)
+
+Transition events received before the snapshot is taken are buffered and applied after the snapshot, skipping the
+transitions already included in it. A transition is considered included when its ordinal is not greater than
+the ordinal of the last transition applied to the instance (the phase count of the instance in the snapshot).
+This ensures no change is lost between the snapshot and the first event.
+The same applies to `ActiveRunsSubscription.resync`, which reconciles the state with a new snapshot.
+"""
+
+import abc
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from enum import Enum, auto
+from threading import Lock
+from typing import Dict, List, Optional, Tuple, Set
+
+from tarotools.taro import client
+from tarotools.taro.client import APIError
+from tarotools.taro.common import TaroException
+from tarotools.taro.job import JobRun, InstanceTransitionObserver
+from tarotools.taro.listening import InstanceTransitionReceiver
+from tarotools.taro.run import PhaseRun, RunState, NONE_PHASE_RUN
+from tarotools.taro.util.observer import ObservableNotification, DEFAULT_OBSERVER_PRIORITY
+
+log = logging.getLogger(__name__)
+
+RECENTLY_ENDED_LIMIT = 1024  # Ended instances remembered, so a resync does not add them back
+
+
+class ChangeType(Enum):
+    NEW_INSTANCE = auto()
+    PHASE_TRANSITION = auto()
+    INSTANCE_ENDED = auto()
+    INSTANCE_LOST = auto()  # Not provided by the APIs anymore, the new phase is `NONE_PHASE_RUN`
+
+
+@dataclass(frozen=True)
+class ActiveRunsSnapshot:
+    """
+    The initial state of the subscription.
+
+    Attributes:
+        seq: Sequence number of the snapshot. The first change has the sequence number `seq + 1`.
+        runs: Active instances matching the subscription criteria.
+        errors: Errors of the APIs which failed to provide their instances.
+    """
+    seq: int
+    runs: List[JobRun]
+    errors: List[APIError]
+
+
+@dataclass(frozen=True)
+class ActiveRunChange:
+    """
+    A change of the active instances.
+
+    Attributes:
+        seq: Sequence number of the change, incremented by one for each change.
+        change_type: The type of the change.
+        job_run: Snapshot of the changed instance.
+        previous_phase: The previous phase of the instance.
+        new_phase: The new phase of the instance.
+    """
+    seq: int
+    change_type: ChangeType
+    job_run: JobRun
+    previous_phase: PhaseRun
+    new_phase: PhaseRun
+
+
+class ActiveRunsObserver(abc.ABC):
+
+    @abc.abstractmethod
+    def active_run_changed(self, change: ActiveRunChange):
+        """
+        Called for each change of the active instances in the order of the sequence numbers.
+        The notification is executed on the thread of the transition listener (or of the thread calling `resync`),
+        so it should not block. The state of the subscription is not locked during the notification.
+
+        Args:
+            change (ActiveRunChange): The change of an active instance.
+        """
+
+
+class ActiveRunsSubscription(InstanceTransitionObserver):
+    """
+    Keeps the state of active instances matching the provided criteria and pushes their changes to the observers.
+    The subscription must be opened to start receiving the changes and closed after it is no longer used.
+    """
+
+    def __init__(self, run_match=None):
+        """
+        Args:
+            run_match (JobRunAggregatedCriteria, optional):
+                Only instances matching these criteria are included. If not provided, all instances are included.
+        """
+        self._run_match = run_match
+        self._receiver = InstanceTransitionReceiver()
+        self._receiver.add_observer_transition(self)
+        self._notification = ObservableNotification[ActiveRunsObserver]()
+        self._sync_lock = Lock()  # Serializes taking of the snapshots
+        self._notify_lock = Lock()  # Keeps the order of the notifications without holding the state lock
+        self._lock = Lock()
+        # Guarded by the lock:
+        self._runs: Dict[str, JobRun] = {}
+        self._ordinals: Dict[str, int] = {}  # Ordinal of the last transition applied to the active instance
+        self._seq = 0
+        self._pending: Optional[List[Tuple[JobRun, PhaseRun, PhaseRun, int]]] = None
+        self._recently_ended: OrderedDict[str, None] = OrderedDict()
+        # ----------------------- #
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def open(self) -> ActiveRunsSnapshot:
+        """
+        Starts the transition listener and takes the initial snapshot of the active instances.
+
+        Returns:
+            ActiveRunsSnapshot: The snapshot of the active instances.
+
+        Raises:
+            SubscriptionError: If the transition listener cannot be started.
+        """
+        with self._sync_lock:
+            with self._lock:
+                self._pending = []
+            if not self._receiver.start():
+                with self._lock:
+                    self._pending = None
+                raise SubscriptionError("The transition listener cannot be started, see the log for details")
+
+            try:
+                runs, errors = client.get_active_runs(self._run_match)
+            except BaseException:
+                self.close()
+                raise
+
+            with self._notify_lock:
+                with self._lock:
+                    for run in runs:
+                        self._put(run, run.run.lifecycle.phase_count)
+                    self._seq += 1
+                    snapshot = ActiveRunsSnapshot(self._seq, list(runs), errors)
+                    changes, _ = self._apply_pending()
+                self._notify(changes)
+
+            return snapshot
+
+    def resync(self) -> List[ActiveRunChange]:
+        """
+        Reconciles the state with a new snapshot of the active instances. Instances and transitions missing
+        in the state are added, and instances no longer provided by the APIs are removed with the `INSTANCE_LOST`
+        change, so the state does not keep instances which crashed or whose end event was lost. Nothing is removed
+        if some of the APIs failed, as their instances are unknown. It is recommended to call this method periodically.
+
+        Returns:
+            List[ActiveRunChange]: Changes caused by the reconciliation, the observers are notified about them too.
+        """
+        with self._sync_lock:
+            with self._lock:
+                self._pending = []
+            try:
+                runs, errors = client.get_active_runs(self._run_match)
+            except BaseException:
+                with self._notify_lock:
+                    with self._lock:
+                        changes, _ = self._apply_pending()
+                    self._notify(changes)
+                raise
+
+            with self._notify_lock:
+                with self._lock:
+                    changes = self._reconcile(runs)
+                    pending_changes, updated = self._apply_pending()
+                    changes += pending_changes
+                    if errors:
+                        log.warning(f"event=[subscription_resync_incomplete] failed_apis=[{len(errors)}]")
+                    else:
+                        provided = {run.metadata.instance_id for run in runs}
+                        changes += self._remove_lost(provided | updated)
+                self._notify(changes)
+
+            return changes
+
+    @property
+    def active_runs(self) -> List[JobRun]:
+        """
+        Returns:
+            List[JobRun]: The current state of the active instances.
+        """
+        with self._lock:
+            return list(self._runs.values())
+
+    @property
+    def seq(self) -> int:
+        """
+        Returns:
+            int: The sequence number of the last change (or of the snapshot if there was no change).
+        """
+        with self._lock:
+            return self._seq
+
+    def new_instance_phase(self, job_run: JobRun, previous_phase: PhaseRun, new_phase: PhaseRun, ordinal: int):
+        with self._notify_lock:
+            with self._lock:
+                if self._pending is not None:
+                    self._pending.append((job_run, previous_phase, new_phase, ordinal))
+                    return
+
+                change = self._apply(job_run, previous_phase, new_phase, ordinal)
+            if change:
+                self._notify([change])
+
+    def _apply_pending(self) -> Tuple[List[ActiveRunChange], Set[str]]:
+        """
+        Returns:
+            Tuple[List[ActiveRunChange], Set[str]]: Changes caused by the buffered transitions
+            and IDs of the instances changed by them.
+        """
+        pending, self._pending = self._pending, None
+        changes = []
+        for event in pending:
+            change = self._apply(*event)
+            if change:
+                changes.append(change)
+        return changes, {c.job_run.metadata.instance_id for c in changes}
+
+    def _apply(self, job_run, previous_phase, new_phase, ordinal) -> Optional[ActiveRunChange]:
+        if self._run_match and not self._run_match(job_run):
+            return None
+
+        instance_id = job_run.metadata.instance_id
+        known = self._runs.get(instance_id)
+        if known and self._ordinals[instance_id] >= ordinal:
+            return None  # Already included in the current state
+
+        if new_phase.run_state == RunState.ENDED:
+            if not known:
+                return None  # Never reported as active
+            self._remove(instance_id)
+            change_type = ChangeType.INSTANCE_ENDED
+        else:
+            self._put(job_run, ordinal)
+            change_type = ChangeType.PHASE_TRANSITION if known else ChangeType.NEW_INSTANCE
+
+        return self._change(change_type, job_run, previous_phase, new_phase)
+
+    def _reconcile(self, runs) -> List[ActiveRunChange]:
+        changes = []
+        for run in runs:
+            instance_id = run.metadata.instance_id
+            lifecycle = run.run.lifecycle
+            if instance_id in self._recently_ended or lifecycle.is_ended:
+                continue  # The end was already received, the API of the instance just has not closed yet
+            known = self._runs.get(instance_id)
+            if known and self._ordinals[instance_id] >= lifecycle.phase_count:
+                continue
+
+            self._put(run, lifecycle.phase_count)
+            if known:
+                changes.append(self._change(ChangeType.PHASE_TRANSITION, run, known.run.lifecycle.current_run,
+                                            lifecycle.current_run))
+            else:
+                changes.append(self._change(ChangeType.NEW_INSTANCE, run, lifecycle.previous_run or NONE_PHASE_RUN,
+                                            lifecycle.current_run))
+        return changes
+
+    def _remove_lost(self, active_ids) -> List[ActiveRunChange]:
+        changes = []
+        for instance_id in [i for i in self._runs if i not in active_ids]:
+            lost = self._remove(instance_id)
+            log.warning(f"event=[active_instance_lost] instance=[{instance_id}]")
+            changes.append(self._change(ChangeType.INSTANCE_LOST, lost, lost.run.lifecycle.current_run, NONE_PHASE_RUN))
+        return changes
+
+    def _put(self, job_run, ordinal):
+        instance_id = job_run.metadata.instance_id
+        self._runs[instance_id] = job_run
+        self._ordinals[instance_id] = ordinal
+
+    def _remove(self, instance_id) -> JobRun:
+        self._recently_ended[instance_id] = None
+        if len(self._recently_ended) > RECENTLY_ENDED_LIMIT:
+            self._recently_ended.popitem(last=False)
+        self._ordinals.pop(instance_id)
+        return self._runs.pop(instance_id)
+
+    def _change(self, change_type, job_run, previous_phase, new_phase) -> ActiveRunChange:
+        self._seq += 1
+        return ActiveRunChange(self._seq, change_type, job_run, previous_phase, new_phase)
+
+    def _notify(self, changes):
+        for change in changes:
+            self._notification.observer_proxy.active_run_changed(change)
+
+    def add_observer(self, observer, priority=DEFAULT_OBSERVER_PRIORITY):
+        self._notification.add_observer(observer, priority)
+
+    def remove_observer(self, observer):
+        self._notification.remove_observer(observer)
+
+    def close(self):
+        self._receiver.close_and_wait()
+
+
+class SubscriptionError(TaroException):
+    pass
+
+
+def subscribe_active_runs(run_match=None, observer=None) -> Tuple[ActiveRunsSubscription, ActiveRunsSnapshot]:
+    """
+    Creates and opens a subscription to the changes of active instances matching the provided criteria.
+
+    Args:
+        run_match (JobRunAggregatedCriteria, optional): Only instances matching these criteria are included.
+        observer (ActiveRunsObserver, optional): An observer registered before the subscription is opened.
+
+    Returns:
+        The opened subscription, which must be closed by the caller, and the initial snapshot.
+    """
+    subscription = ActiveRunsSubscription(run_match)
+    if observer:
+        subscription.add_observer(observer)
+    snapshot = subscription.open()
+    return subscription, snapshot
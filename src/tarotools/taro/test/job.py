@@ -85,6 +85,12 @@ class FakeJobInstance(JobInstance):
     def fetch_output(self, mode=Mode.HEAD, *, lines=0):
         return self.output.fetch(mode, lines=lines)
 
+    def fetch_output_page(self, since=0, *, max_bytes=0, timeout=0):
+        return self.output.fetch_page(since, max_bytes=max_bytes, timeout=timeout)
+
+    def search_output(self, pattern, *, ignore_case=False):
+        return self.output.search(pattern, ignore_case=ignore_case)
+
     def run(self):
         pass
 
@@ -17,6 +17,11 @@ def reset_config():
     cfg.persistence_enabled = cfg.DEF_PERSISTENCE_ENABLED
     cfg.persistence_type = cfg.DEF_PERSISTENCE_TYPE
     cfg.persistence_database = cfg.DEF_PERSISTENCE_DATABASE
+    cfg.persistence_journal_mode = cfg.DEF_PERSISTENCE_JOURNAL_MODE
+    cfg.persistence_synchronous = cfg.DEF_PERSISTENCE_SYNCHRONOUS
+    cfg.persistence_busy_timeout = cfg.DEF_PERSISTENCE_BUSY_TIMEOUT
+    cfg.persistence_mmap_size = cfg.DEF_PERSISTENCE_MMAP_SIZE
+    cfg.persistence_read_pool_size = cfg.DEF_PERSISTENCE_READ_POOL_SIZE
 
     cfg.plugins_load = cfg.DEF_PLUGINS_LOAD
 
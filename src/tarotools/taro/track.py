@@ -10,7 +10,7 @@ from typing import Optional, Sequence
 
 from tarotools.taro import util
 from tarotools.taro.util import format_dt_iso, is_empty
-from tarotools.taro.util.observer import ObservableNotification
+from tarotools.taro.util.observer import ObservableNotification, DEFAULT_OBSERVER_PRIORITY
 
 log = logging.getLogger(__name__)
 
@@ -43,6 +43,12 @@ class Trackable:
         self._notification = ObservableNotification[TrackedTaskObserver]()  # TODO Error hook
         self._active = True
 
+    def add_observer(self, observer, priority=DEFAULT_OBSERVER_PRIORITY):
+        self._notification.add_observer(observer, priority)
+
+    def remove_observer(self, observer):
+        self._notification.remove_observer(observer)
+
     def _updated(self, timestamp):
         timestamp = timestamp or self._timestamp_gen()
         self._updated_at = timestamp
@@ -0,0 +1,322 @@
+"""
+Cached discovery of socket files in a directory.
+
+Listing the socket directory requires reading the directory and stat-ing each of its entries. Instead of doing that
+for each request, `SocketDiscovery` keeps the list of the sockets in memory and rescans the directory only when it has
+changed. The changes are detected using inotify when available (Linux), otherwise by comparing the modification time
+of the directory, which is a single stat call. The inotify instance is created by the first scan and released by
+`SocketDiscovery.close`, so discoveries which are never used do not take the per-user inotify instances.
+
+Sockets of terminated processes which were not removed are detected by the janitor thread, which periodically probes
+the known sockets and removes the stale ones. Clients can report a stale socket with `mark_stale` to exclude it from
+the cache immediately. The janitor can be started lazily on the first reported stale socket, so short-lived processes
+which never encounter a stale socket do not run the thread.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import socket
+import stat
+import struct
+from pathlib import Path
+from threading import Lock, Event, Thread
+from typing import Callable, Optional, Tuple, List, Set
+
+DEFAULT_JANITOR_INTERVAL = 30
+
+log = logging.getLogger(__name__)
+
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = os.O_CLOEXEC
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_IGNORED = 0x00008000
+_WATCH_MASK = _IN_CREATE | _IN_DELETE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_DELETE_SELF | _IN_MOVE_SELF
+_EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+
+class _Inotify:
+
+    def __init__(self, libc, fd):
+        self._libc = libc
+        self._fd = fd
+
+    @classmethod
+    def create(cls) -> Optional['_Inotify']:
+        """
+        Returns:
+            Optional[_Inotify]: Inotify instance or None if inotify is not supported by the platform.
+        """
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            inotify_init1 = libc.inotify_init1
+        except (OSError, AttributeError):
+            return None
+
+        fd = inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            log.warning('event=[inotify_init_failed] error=[%s]', os.strerror(ctypes.get_errno()))
+            return None
+        return cls(libc, fd)
+
+    def add_watch(self, directory: Path) -> int:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), str(directory))
+        return wd
+
+    def read_changes(self) -> Tuple[bool, bool]:
+        """
+        Reads all pending events without blocking.
+
+        Returns:
+            Tuple[bool, bool]: Whether there was any change and whether the watch was removed.
+        """
+        changed = False
+        watch_removed = False
+        while True:
+            try:
+                data = os.read(self._fd, 4096)
+            except BlockingIOError:
+                return changed, watch_removed
+
+            changed = True
+            offset = 0
+            while offset < len(data):
+                _, mask, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size + name_len
+                if mask & (_IN_IGNORED | _IN_DELETE_SELF | _IN_MOVE_SELF):
+                    watch_removed = True
+
+    def close(self):
+        os.close(self._fd)
+
+
+def is_stale_socket(path: Path) -> bool:
+    """
+    Checks whether a socket file has no process bound to it. No data is sent to the socket. A stream connection
+    is closed immediately after it is established, stream servers drop such connections without handling them.
+    The probe does not block: a stream server with a full backlog of connections is considered alive.
+
+    Args:
+        path (Path): The socket file.
+
+    Returns:
+        bool: True if nothing is bound to the socket (or the file no longer exists), False otherwise.
+    """
+    for sock_type in (socket.SOCK_DGRAM, socket.SOCK_STREAM):
+        with socket.socket(socket.AF_UNIX, sock_type) as probe:
+            probe.setblocking(False)  # Connecting to a stream server with a full backlog would block
+            try:
+                probe.connect(str(path))
+                return False
+            except BlockingIOError:
+                return False  # The backlog of the server is full, so the server is bound
+            except (ConnectionRefusedError, FileNotFoundError):
+                return True
+            except OSError as e:
+                if e.errno == errno.EPROTOTYPE:
+                    continue  # Try the other socket type
+                log.warning('event=[socket_probe_failed] socket=[%s] error=[%s]', path, e)
+                return False
+    return False
+
+
+class SocketDiscovery:
+    """
+    Keeps the list of socket files with the given extension in a directory.
+    The instances are thread-safe.
+    """
+
+    def __init__(self, directory_provider: Callable[[], Path], file_extension: str, *, use_inotify=True):
+        """
+        Args:
+            directory_provider (Callable[[], Path]): Provides the directory with the sockets.
+            file_extension (str): Only files with this extension are included.
+            use_inotify (bool): Whether to detect the changes using inotify when available. Defaults to True.
+        """
+        self._directory_provider = directory_provider
+        self._file_extension = file_extension
+        self._use_inotify = use_inotify
+        self._lock = Lock()
+        self._closed = Event()
+        # Guarded by the lock:
+        self._inotify: Optional[_Inotify] = None  # Created by the first scan
+        self._janitor: Optional[Thread] = None
+        self._lazy_janitor_interval: Optional[float] = None
+        self._directory: Optional[Path] = None
+        self._watch: Optional[int] = None
+        self._dir_mtime: Optional[int] = None
+        self._sockets: Optional[Tuple[Path, ...]] = None  # None means a rescan is needed
+        self._stale: Set[Path] = set()
+        # ----------------------- #
+
+    def __call__(self) -> List[Path]:
+        return self.sockets()
+
+    @property
+    def watching(self) -> bool:
+        """
+        Returns:
+            bool: Whether the changes in the directory are currently detected using inotify.
+        """
+        with self._lock:
+            return self._watch is not None
+
+    def sockets(self) -> List[Path]:
+        """
+        Returns:
+            List[Path]: Socket files known to be in the directory, excluding sockets reported as stale.
+        """
+        with self._lock:
+            if self._sockets is None or self._changed():
+                self._rescan()
+            return list(self._sockets)
+
+    def _changed(self) -> bool:
+        if self._watch is not None:
+            changed, watch_removed = self._inotify.read_changes()
+            if watch_removed:
+                self._watch = None
+            return changed
+
+        return self._read_dir_mtime() != self._dir_mtime
+
+    def _read_dir_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self._directory).st_mtime_ns
+        except OSError:
+            return None
+
+    def _rescan(self):
+        self._directory = self._directory_provider()
+        if self._use_inotify and not self._inotify and not self._closed.is_set():
+            self._inotify = _Inotify.create()
+            self._use_inotify = bool(self._inotify)  # Not tried again when inotify is not available
+        if self._inotify and self._watch is None:
+            try:
+                self._watch = self._inotify.add_watch(self._directory)
+            except OSError:
+                pass  # The directory does not exist yet, the modification time is checked until it is created
+        # Changes made during the scan are detected on the next call as the watch/mtime are taken before the scan
+        self._dir_mtime = self._read_dir_mtime()
+
+        try:
+            with os.scandir(self._directory) as entries:
+                sockets = [Path(entry.path) for entry in entries
+                           if entry.name.endswith(self._file_extension) and _is_socket_entry(entry)]
+        except FileNotFoundError:
+            sockets = []
+
+        self._stale.intersection_update(sockets)
+        self._sockets = tuple(s for s in sockets if s not in self._stale)
+
+    def mark_stale(self, socket_path: Path):
+        """
+        Excludes the socket from the cached list. The janitor removes the socket file
+        if it confirms nothing is bound to it.
+
+        Args:
+            socket_path (Path): The socket reported as stale.
+        """
+        socket_path = Path(socket_path)
+        with self._lock:
+            self._stale.add(socket_path)
+            if self._sockets:
+                self._sockets = tuple(s for s in self._sockets if s != socket_path)
+            janitor = None
+            if self._lazy_janitor_interval is not None and not self._janitor and not self._closed.is_set():
+                janitor = self._janitor = self._new_janitor(self._lazy_janitor_interval, prune_first=True)
+        if janitor:
+            janitor.start()
+
+    def prune(self) -> List[Path]:
+        """
+        Probes all known sockets, including the ones reported as stale, and removes the stale ones.
+
+        Returns:
+            List[Path]: Removed sockets.
+        """
+        with self._lock:
+            candidates = set(self._sockets or ()) | self._stale
+
+        pruned = []
+        alive = []
+        for candidate in candidates:
+            if is_stale_socket(candidate):
+                candidate.unlink(missing_ok=True)
+                pruned.append(candidate)
+                log.debug('event=[stale_socket_removed] socket=[%s]', candidate)
+            else:
+                alive.append(candidate)
+
+        with self._lock:
+            restored = self._stale.intersection(alive)  # Reported by mistake, e.g. the server was just starting
+            self._stale.difference_update(alive)
+            self._stale.difference_update(pruned)
+            if restored:
+                self._sockets = None
+            elif self._sockets is not None:
+                self._sockets = tuple(s for s in self._sockets if s not in pruned)
+
+        return pruned
+
+    def start_janitor(self, interval=DEFAULT_JANITOR_INTERVAL, *, lazy=False):
+        """
+        Starts a daemon thread pruning stale sockets periodically.
+
+        Args:
+            interval (float): Seconds between the prune runs.
+            lazy (bool): Start the thread only when the first stale socket is reported by `mark_stale`.
+                The reported socket is then pruned immediately.
+        """
+        with self._lock:
+            if self._janitor:
+                return
+            if lazy:
+                self._lazy_janitor_interval = interval
+                return
+            self._janitor = self._new_janitor(interval, prune_first=False)
+        self._janitor.start()
+
+    def _new_janitor(self, interval, *, prune_first) -> Thread:
+        return Thread(target=self._run_janitor, args=(interval, prune_first), name='SocketJanitor', daemon=True)
+
+    def _run_janitor(self, interval, prune_first):
+        if prune_first:
+            self._prune_logged()
+        while not self._closed.wait(interval):
+            self._prune_logged()
+
+    def _prune_logged(self):
+        try:
+            self.prune()
+        except Exception as e:
+            log.warning('event=[socket_prune_failed] error=[%s]', e)
+
+    def close(self):
+        self._closed.set()
+        with self._lock:
+            janitor = self._janitor
+        if janitor:
+            janitor.join()
+        with self._lock:
+            if self._inotify:
+                self._inotify.close()
+                self._inotify = None
+                self._watch = None
+
+
+def _is_socket_entry(entry) -> bool:
+    try:
+        return stat.S_ISSOCK(entry.stat().st_mode)
+    except OSError:
+        return False
@@ -0,0 +1,155 @@
+"""
+Bounded queue decoupling the producer of items (e.g. a thread reading a socket) from their processing
+on a dedicated dispatching thread.
+"""
+
+import logging
+from collections import deque
+from enum import Enum, auto
+from threading import Condition, Thread
+from typing import Callable, Deque, Generic, List, NamedTuple, Optional, TypeVar
+
+log = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+DROP_LOG_INTERVAL = 100  # A warning is logged for the first dropped item and then for every N-th dropped item
+
+
+class OverflowPolicy(Enum):
+    """
+    Behaviour of a full queue when a new item is added.
+
+    Attributes:
+        BLOCK: The producer waits until there is free space in the queue (or until the block timeout elapses,
+            after which the new item is dropped).
+        DROP_OLDEST: The oldest item in the queue is dropped to make space for the new item.
+        DROP_NEWEST: The new item is dropped.
+    """
+    BLOCK = auto()
+    DROP_OLDEST = auto()
+    DROP_NEWEST = auto()
+
+
+class DispatchStats(NamedTuple):
+    """
+    Attributes:
+        dispatched: Number of items passed to the handler.
+        dropped: Number of items dropped due to the overflow of the queue.
+        queue_depth: Number of items currently waiting in the queue.
+    """
+    dispatched: int
+    dropped: int
+    queue_depth: int
+
+
+class DispatchQueue(Generic[T]):
+    """
+    Bounded queue with a single dispatching thread passing the queued items to the handler in the order they were added.
+    The handler is called with a batch of items, which contains at most `max_batch` items which were waiting
+    in the queue at the time.
+    """
+
+    def __init__(self, handler: Callable[[List[T]], None], *, capacity=1024, overflow=OverflowPolicy.BLOCK,
+                 block_timeout: Optional[float] = None, max_batch=1, name='Thread-Dispatch'):
+        """
+        Args:
+            handler (Callable[[List[T]], None]): Function processing a batch of items.
+            capacity (int): The maximum number of items waiting in the queue.
+            overflow (OverflowPolicy): What to do when an item is added to the full queue.
+            block_timeout (float, optional): The maximum time to block with the `BLOCK` policy. No limit by default.
+            max_batch (int): The maximum number of items passed to the handler in a single call.
+            name (str): Name of the dispatching thread.
+        """
+        if capacity < 1:
+            raise ValueError("Invalid argument: arg `capacity` must be positive but was " + str(capacity))
+        if max_batch < 1:
+            raise ValueError("Invalid argument: arg `max_batch` must be positive but was " + str(max_batch))
+
+        self._handler = handler
+        self._capacity = capacity
+        self._overflow = overflow
+        self._block_timeout = block_timeout
+        self._max_batch = max_batch
+        self._thread = Thread(target=self._run, name=name, daemon=True)
+        self._condition = Condition()
+        # Guarded by the condition:
+        self._items: Deque[T] = deque()
+        self._dispatched = 0
+        self._dropped = 0
+        self._closed = False
+        # ----------------------- #
+
+    def start(self):
+        self._thread.start()
+
+    def put(self, item: T) -> bool:
+        """
+        Adds the item to the queue applying the overflow policy when the queue is full.
+
+        Args:
+            item: The item to add.
+
+        Returns:
+            bool: True if the item was added, False if it was dropped.
+            Note that with the `DROP_OLDEST` policy, an item can be added while another one is dropped.
+        """
+        with self._condition:
+            if self._closed:
+                return False
+
+            if len(self._items) >= self._capacity:
+                if self._overflow == OverflowPolicy.DROP_NEWEST:
+                    self._item_dropped()
+                    return False
+                if self._overflow == OverflowPolicy.DROP_OLDEST:
+                    self._items.popleft()
+                    self._item_dropped()
+                else:
+                    has_space = self._condition.wait_for(
+                        lambda: self._closed or len(self._items) < self._capacity, self._block_timeout)
+                    if not has_space or self._closed:
+                        self._item_dropped()
+                        return False
+
+            self._items.append(item)
+            self._condition.notify_all()
+            return True
+
+    def _item_dropped(self):
+        self._dropped += 1
+        if self._dropped % DROP_LOG_INTERVAL == 1:
+            log.warning("event=[dispatch_queue_overflow] policy=[%s] dropped_total=[%s]",
+                        self._overflow.name, self._dropped)
+
+    @property
+    def stats(self) -> DispatchStats:
+        with self._condition:
+            return DispatchStats(self._dispatched, self._dropped, len(self._items))
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._items or self._closed)
+                if not self._items:
+                    return  # Closed and drained
+                batch = [self._items.popleft() for _ in range(min(self._max_batch, len(self._items)))]
+                self._dispatched += len(batch)
+                self._condition.notify_all()  # Wake up blocked producers
+
+            try:
+                self._handler(batch)
+            except Exception as e:
+                log.exception(f"event=[dispatch_handler_failed] error=[{e}]")
+
+    def close(self):
+        """
+        Stops accepting new items. The items already in the queue are still dispatched.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def wait(self):
+        if self._thread.is_alive():
+            self._thread.join()
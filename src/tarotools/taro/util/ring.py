@@ -0,0 +1,256 @@
+"""
+Ring buffer of variable-length records in a memory-mapped file shared by processes on the same host.
+
+Producers append records under an exclusive file lock, so several processes can write to the same ring. The file lock
+is held by the open file description, which does not exclude the threads of the process sharing the ring, so appends
+of one ring instance are also serialized by a thread lock.
+Readers do not lock: each reader keeps its own position and reads the records at its own pace. When a reader is
+too slow and the producers overwrite records it has not read yet (the reader is lapped), the lost records are reported
+by the sequence number gap and the reader continues with the newest records.
+
+File layout:
+    header: magic, version, capacity of the data area, write position, sequence number of the last record,
+            reserved position (the end of the record being written)
+    data: records [length: u32][sequence: u64][payload], a record which does not fit before the end of the data area
+          is preceded by a padding marker and written at the beginning of the data area
+
+The write position is an absolute number of bytes written since the ring was created. The position of a record
+in the data area is the absolute position modulo the capacity. Using the absolute positions allows readers to detect
+that they were lapped. Before a producer starts writing a record, it publishes the reserved position, so a reader can
+verify that the record it has just copied was not being overwritten meanwhile.
+
+There is no portable cross-process wakeup available without native extensions, so waiting readers poll the write
+position with a short, increasing interval.
+"""
+
+import fcntl
+import mmap
+import os
+import struct
+import time
+from pathlib import Path
+from threading import Lock
+from typing import List, NamedTuple, Optional
+
+MAGIC = b'TRNG'
+VERSION = 1
+DEFAULT_CAPACITY = 4 * 1024 * 1024
+
+_HEADER = struct.Struct('<4sIQQQQ')  # magic, version, capacity, write position, last sequence, reserved position
+_HEADER_SIZE = 64
+_POSITION = struct.Struct('<QQQ')  # write position, last sequence, reserved position
+_POSITION_OFFSET = 16
+_RESERVED = struct.Struct('<Q')
+_RESERVED_OFFSET = 32
+_RECORD = struct.Struct('<IQ')  # length, sequence
+_PADDING = 0xFFFFFFFF
+
+
+class RingRecord(NamedTuple):
+    seq: int
+    payload: bytes
+
+
+class RingRead(NamedTuple):
+    """
+    Attributes:
+        records: Read records in the order they were appended.
+        lost: Number of records overwritten before they were read.
+    """
+    records: List[RingRecord]
+    lost: int
+
+
+class EventRing:
+    """
+    A memory-mapped ring buffer. Use `open` to create or attach to a ring file.
+    """
+
+    def __init__(self, path: Path, fd: int, mm: mmap.mmap, capacity: int):
+        self._path = path
+        self._fd = fd
+        self._mm = mm
+        self._capacity = capacity
+        self._append_lock = Lock()  # The file lock does not exclude the threads sharing the file descriptor
+
+    @classmethod
+    def open(cls, path, capacity=DEFAULT_CAPACITY) -> 'EventRing':
+        """
+        Opens the ring file, creating it if it does not exist.
+
+        Args:
+            path (Path): The ring file.
+            capacity (int): Size of the data area in bytes, used only when the ring is created.
+
+        Returns:
+            EventRing: The opened ring.
+
+        Raises:
+            ValueError: If the file is not a valid ring file.
+        """
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_size == 0:
+                    os.ftruncate(fd, _HEADER_SIZE + capacity)
+                    os.pwrite(fd, _HEADER.pack(MAGIC, VERSION, capacity, 0, 0, 0), 0)
+                header = os.pread(fd, _HEADER.size, 0)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+            magic, version, capacity, *_ = _HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"Invalid ring file: {path}")
+            mm = mmap.mmap(fd, _HEADER_SIZE + capacity)
+        except BaseException:
+            os.close(fd)
+            raise
+        return cls(Path(path), fd, mm, capacity)
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def _position(self):
+        return _POSITION.unpack_from(self._mm, _POSITION_OFFSET)
+
+    def append(self, payload: bytes) -> int:
+        """
+        Appends the record to the ring, overwriting the oldest records if needed.
+
+        Args:
+            payload (bytes): The content of the record.
+
+        Returns:
+            int: The sequence number of the appended record.
+
+        Raises:
+            ValueError: If the record is larger than half of the capacity.
+        """
+        size = _RECORD.size + len(payload)
+        if size > self._capacity // 2:
+            raise ValueError(f"Record too large for the ring: {len(payload)} bytes")
+
+        with self._append_lock:
+            return self._append_locked(payload, size)
+
+    def _append_locked(self, payload, size) -> int:
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            write_pos, seq, _ = self._position()
+            offset = write_pos % self._capacity
+            padding = self._capacity - offset if offset + size > self._capacity else 0
+            end = write_pos + padding + size
+            _RESERVED.pack_into(self._mm, _RESERVED_OFFSET, end)
+
+            if padding:  # Does not fit before the end -> continue at the beginning
+                if padding >= 4:
+                    struct.pack_into('<I', self._mm, _HEADER_SIZE + offset, _PADDING)
+                offset = 0
+
+            seq += 1
+            start = _HEADER_SIZE + offset
+            _RECORD.pack_into(self._mm, start, len(payload), seq)
+            self._mm[start + _RECORD.size:start + size] = payload
+            # Published to the readers only after the record is complete
+            _POSITION.pack_into(self._mm, _POSITION_OFFSET, end, seq, end)
+            return seq
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def reader(self) -> 'RingReader':
+        """
+        Returns:
+            RingReader: A new reader of the records appended after the reader is created.
+        """
+        write_pos, seq, _ = self._position()
+        return RingReader(self, write_pos, seq + 1)
+
+    def close(self):
+        self._mm.close()
+        os.close(self._fd)
+
+
+class RingReader:
+    """
+    Reads records of a ring. Each reader must be used by a single thread.
+    """
+
+    def __init__(self, ring: EventRing, position: int, next_seq: int):
+        self._ring = ring
+        self._position = position
+        self._next_seq = next_seq
+
+    def read(self, max_records=0) -> RingRead:
+        """
+        Reads the records appended since the last read without blocking.
+
+        Args:
+            max_records (int): The maximum number of records to read. Zero means no limit.
+
+        Returns:
+            RingRead: The read records and the number of lost records.
+        """
+        ring = self._ring
+        capacity = ring.capacity
+        mm = ring._mm
+        write_pos, _, _ = ring._position()
+        records = []
+        lost = 0
+
+        while self._position < write_pos and (not max_records or len(records) < max_records):
+            offset = self._position % capacity
+            start = _HEADER_SIZE + offset
+            length = struct.unpack_from('<I', mm, start)[0] if capacity - offset >= 4 else _PADDING
+            if length != _PADDING:
+                _, seq = _RECORD.unpack_from(mm, start)
+                payload = bytes(mm[start + _RECORD.size:start + _RECORD.size + length])
+
+            # The data could have been overwritten while they were copied
+            current_pos, current_seq, reserved = ring._position()
+            if reserved - self._position > capacity:
+                lost += self._skip_to(current_pos, current_seq)
+                break
+
+            if length == _PADDING:
+                self._position += capacity - offset
+                continue
+
+            if seq > self._next_seq:
+                lost += seq - self._next_seq
+            records.append(RingRecord(seq, payload))
+            self._next_seq = seq + 1
+            self._position += _RECORD.size + length
+
+        return RingRead(records, lost)
+
+    def _skip_to(self, write_pos, last_seq) -> int:
+        lost = last_seq + 1 - self._next_seq
+        self._position = write_pos
+        self._next_seq = last_seq + 1
+        return lost
+
+    def wait(self, timeout: Optional[float] = None, poll_interval=0.001, max_poll_interval=0.05) -> bool:
+        """
+        Waits until there is a new record to read. The ring is polled with an increasing interval.
+
+        Args:
+            timeout (float, optional): The maximum time to wait in seconds. No limit by default.
+            poll_interval (float): The initial polling interval.
+            max_poll_interval (float): The maximum polling interval.
+
+        Returns:
+            bool: True if there is a new record, False if the timeout elapsed.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        interval = poll_interval
+        while self._ring._position()[0] <= self._position:
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                interval = min(interval, remaining)
+            time.sleep(interval)
+            interval = min(interval * 2, max_poll_interval)
+        return True
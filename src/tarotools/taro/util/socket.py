@@ -1,27 +1,158 @@
 import abc
+import errno
 import logging
 import os
+import selectors
 import socket
+import struct
+import time
 from dataclasses import dataclass
 from enum import Enum, auto
 from pathlib import Path
-from threading import Thread
+from queue import Queue
+from threading import Thread, Lock
 from types import coroutine
-from typing import List, NamedTuple, Optional
+from typing import List, NamedTuple, Optional, Dict, Callable
 
 # Default=32768, Max= 262142, https://docstore.mik.ua/manuals/hp-ux/en/B2355-60130/UNIX.7P.html
 RECV_BUFFER_LENGTH = 65536  # Can be increased to 163840?
 
+FRAME_HEADER = struct.Struct('>I')  # Length prefix of a message sent over the stream transport
+MAX_FRAME_LENGTH = 64 * 1024 * 1024
+STREAM_CONNECTION_TIMEOUT = 5
+STREAM_POLL_INTERVAL = 0.5  # How often the stream server checks the timeouts of the connections
+
 log = logging.getLogger(__name__)
 
 
+class Transport(Enum):
+    """
+    Socket type used for the communication with a server.
+
+    Attributes:
+        DATAGRAM: Each message is a single datagram, so its size is limited by the datagram size limit of the OS.
+        STREAM: Each request is sent over a new connection, and the messages are framed by a length prefix.
+            Supports messages larger than the datagram size limit.
+
+    A client does not need to know the transport of a server in advance. It contacts servers using datagrams and
+    switches to the stream transport for the servers which reject a datagram as a wrong socket type.
+    """
+    DATAGRAM = auto()
+    STREAM = auto()
+
+
+def frame(payload: bytes) -> bytes:
+    """
+    Prefixes the payload with its length for sending over the stream transport.
+
+    :raises PayloadTooLarge: when the payload exceeds `MAX_FRAME_LENGTH`
+    """
+    if len(payload) > MAX_FRAME_LENGTH:
+        raise PayloadTooLarge(len(payload))
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+class _FrameReader:
+    """
+    Accumulates bytes received from a stream until a whole frame is read.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._length: Optional[int] = None
+
+    @property
+    def empty(self) -> bool:
+        return not self._buffer
+
+    def feed(self, data: bytes) -> Optional[bytes]:
+        """
+        :return: payload of the frame when the whole frame has been read, otherwise None
+        """
+        self._buffer += data
+        if self._length is None and len(self._buffer) >= FRAME_HEADER.size:
+            self._length = FRAME_HEADER.unpack_from(self._buffer)[0]
+            if self._length > MAX_FRAME_LENGTH:
+                raise ConnectionError(f"Frame length {self._length} exceeds the limit")
+        if self._length is not None and len(self._buffer) >= FRAME_HEADER.size + self._length:
+            return bytes(self._buffer[FRAME_HEADER.size:FRAME_HEADER.size + self._length])
+        return None
+
+
+def _recv_frame(sock) -> Optional[bytes]:
+    """
+    :return: payload of the received frame or None when the connection was closed before any data were received
+    :raises ConnectionError: when the connection was closed in the middle of the frame
+    """
+    reader = _FrameReader()
+    while True:
+        data = sock.recv(RECV_BUFFER_LENGTH)
+        if not data:
+            if reader.empty:
+                return None
+            raise ConnectionError("Connection closed before the whole frame was received")
+        payload = reader.feed(data)
+        if payload is not None:
+            return payload
+
+
+@dataclass
+class ServerStats:
+    """
+    Request handling statistics of a server.
+
+    Attributes:
+        handled: Number of handled requests.
+        expired: Number of requests dropped because their deadline passed while they were waiting in the queue.
+        queue_depth: Number of requests currently waiting for a worker.
+        average_latency: Average time in seconds from receiving a request to sending its response.
+        max_latency: Maximum time in seconds from receiving a request to sending its response.
+    """
+    handled: int
+    expired: int
+    queue_depth: int
+    average_latency: float
+    max_latency: float
+
+
+class _PendingStream(NamedTuple):
+    """
+    Stream connection accepted by the server, which has not sent the whole request frame yet.
+    """
+    reader: _FrameReader
+    deadline: float
+
+
+class _Request(NamedTuple):
+    body: str
+    reply: Callable[[Optional[str]], None]
+    received_at: float
+
+
 class SocketServer(abc.ABC):
 
-    def __init__(self, socket_path_provider, *, allow_ping=False):
+    def __init__(self, socket_path_provider, *, allow_ping=False, transport=Transport.DATAGRAM, workers=0,
+                 request_timeout=None):
+        """
+        :param socket_path_provider: function returning the path of the server socket
+        :param allow_ping: whether the server replies to 'ping' requests
+        :param transport: socket type of the server, the stream transport supports large messages
+        :param workers: number of worker threads handling the requests, see `serve` for details
+        :param request_timeout: seconds after which a request still waiting for a worker is dropped
+        """
         self._socket_path_provider = socket_path_provider
         self._allow_ping = allow_ping
+        self._transport = transport
+        self._request_timeout = request_timeout
         self._server: socket = None
         self._serving_thread = Thread(target=self.serve, name='Thread-ApiServer')
+        self._requests: Queue[Optional[_Request]] = Queue()
+        self._workers = [Thread(target=self._work, name=f'Thread-ApiServer-Worker-{i}') for i in range(workers)]
+        self._stats_lock = Lock()
+        self._handled = 0
+        self._expired = 0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
         self._stopped = False
 
     def start(self) -> bool:
@@ -33,40 +164,229 @@ class SocketServer(abc.ABC):
             log.error("event=[unable_create_socket_dir] socket_dir=[%s] message=[%s]", e.filename, e)
             return False
 
-        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        if self._transport == Transport.STREAM:
+            self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self._server = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
         try:
             self._server.bind(str(socket_path))
+            if self._transport == Transport.STREAM:
+                self._server.listen()
+            for worker in self._workers:
+                worker.start()
             self._serving_thread.start()
             return True
         except PermissionError as e:
             log.error("event=[unable_create_socket] socket=[%s] message=[%s]", socket_path, e)
             return False
 
+    @property
+    def has_workers(self) -> bool:
+        """
+        :return: whether the requests are handled by worker threads. Without workers, the requests are handled
+                 on the serving thread, so a handler must not block (e.g. a long-polling request must be replied
+                 immediately, otherwise it holds all other requests to the server)
+        """
+        return bool(self._workers)
+
     def serve(self):
+        """
+        Reads the requests and dispatches them for handling.
+
+        Without workers, each request is handled on the serving thread before the next one is read. With workers,
+        the serving thread only reads the requests and puts them into a queue processed by the worker threads.
+        Priority requests (pings and those identified by the `is_priority` method) skip the queue and are handled
+        directly on the serving thread, so they are not delayed by slow requests.
+        """
         log.debug('event=[server_started]')
+        if self._transport == Transport.STREAM:
+            self._serve_stream()
+        else:
+            self._serve_datagram()
+        log.debug('event=[server_stopped]')
+
+    def _resolve_response(self, req_body):
+        if self._allow_ping and req_body == 'ping':
+            return 'pong'
+        return self.handle(req_body)  # TODO catch exceptions?
+
+    def _dispatch(self, req_body, reply):
+        received_at = time.monotonic()
+        if not self._workers or (self._allow_ping and req_body == 'ping') or self.is_priority(req_body):
+            reply(self._resolve_response(req_body))
+            self._record_latency(received_at)
+        else:
+            self._requests.put(_Request(req_body, reply, received_at))
+
+    def _work(self):
+        while True:
+            request = self._requests.get()
+            if request is None:
+                break
+
+            if self._request_timeout and (time.monotonic() - request.received_at) > self._request_timeout:
+                log.warning('event=[request_expired] waited=[%.3f]', time.monotonic() - request.received_at)
+                with self._stats_lock:
+                    self._expired += 1
+                request.reply(None)
+                continue
+
+            resp_body = None
+            try:
+                resp_body = self._resolve_response(request.body)
+            except Exception as e:
+                log.exception(f"event=[request_handling_failed] error=[{e}]")
+                continue
+            finally:
+                request.reply(resp_body)  # No response closes the stream connection instead of letting the client wait
+            self._record_latency(request.received_at)
+
+    def _record_latency(self, received_at):
+        latency = time.monotonic() - received_at
+        with self._stats_lock:
+            self._handled += 1
+            self._total_latency += latency
+            self._max_latency = max(self._max_latency, latency)
+
+    def is_priority(self, req_body) -> bool:
+        """
+        Override this method to mark requests which must not wait in the queue behind slow requests when the server
+        uses workers, for example stop requests. Such requests are handled directly on the serving thread,
+        therefore they should be cheap.
+
+        :return: True if the request should be handled immediately
+        """
+        return False
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        :return: number of requests waiting for a worker
+        """
+        return self._requests.qsize()
+
+    @property
+    def stats(self) -> ServerStats:
+        with self._stats_lock:
+            average = (self._total_latency / self._handled) if self._handled else 0.0
+            return ServerStats(self._handled, self._expired, self.queue_depth, average, self._max_latency)
+
+    def _serve_datagram(self):
         while not self._stopped:
-            datagram, client_address = self._server.recvfrom(RECV_BUFFER_LENGTH)
+            try:
+                datagram, client_address = self._server.recvfrom(RECV_BUFFER_LENGTH)
+            except OSError:
+                if self._stopped:
+                    break  # Server socket closed before the thread started to read it
+                raise
             if not datagram:
                 break
 
-            req_body = datagram.decode()
-            if self._allow_ping and req_body == 'ping':
-                resp_body = 'pong'
-            else:
-                resp_body = self.handle(req_body)  # TODO catch exceptions?
+            def reply(resp_body, address=client_address):
+                self._send_datagram_response(resp_body, address)
 
-            if resp_body:
-                if client_address:
-                    encoded = resp_body.encode()
-                    try:
-                        self._server.sendto(encoded, client_address)
-                    except OSError as e:
-                        if e.errno == 90:
-                            log.error(f"event=[server_response_payload_too_large] length=[{len(encoded)}]")
-                        raise e
-                else:
-                    log.warning('event=[missing_client_address]')
-        log.debug('event=[server_stopped]')
+            self._dispatch(datagram.decode(), reply)
+
+    def _send_datagram_response(self, resp_body, client_address):
+        if not resp_body:
+            return
+        if not client_address:
+            log.warning('event=[missing_client_address]')
+            return
+
+        encoded = resp_body.encode()
+        try:
+            self._server.sendto(encoded, client_address)
+        except (ConnectionRefusedError, FileNotFoundError):
+            # The client has gone meanwhile, for example after it timed out waiting for this response
+            log.warning(f"event=[client_not_available] client=[{client_address}]")
+        except OSError as e:
+            if e.errno == 90:
+                log.error(f"event=[server_response_payload_too_large] length=[{len(encoded)}]")
+            raise e
+
+    def _serve_stream(self):
+        """
+        The connections are accepted and their request frames are read using a selector, so a slow or idle client
+        does not delay the other clients. A connection not sending its request within `STREAM_CONNECTION_TIMEOUT`
+        is closed.
+        """
+        with selectors.DefaultSelector() as selector:
+            selector.register(self._server, selectors.EVENT_READ)
+            try:
+                while not self._stopped:
+                    for key, _ in selector.select(STREAM_POLL_INTERVAL):
+                        if key.fileobj is self._server:
+                            if not self._accept_stream(selector):
+                                return
+                        else:
+                            self._read_stream(selector, key.fileobj, key.data)
+                    self._close_expired_streams(selector)
+            finally:
+                for key in list(selector.get_map().values()):
+                    if key.fileobj is not self._server:
+                        key.fileobj.close()
+
+    def _accept_stream(self, selector) -> bool:
+        try:
+            connection, _ = self._server.accept()
+        except OSError:
+            if self._stopped:
+                return False  # Server socket closed
+            raise
+
+        connection.setblocking(False)
+        pending = _PendingStream(_FrameReader(), time.monotonic() + STREAM_CONNECTION_TIMEOUT)
+        selector.register(connection, selectors.EVENT_READ, pending)
+        return True
+
+    def _read_stream(self, selector, connection, pending: _PendingStream):
+        try:
+            data = connection.recv(RECV_BUFFER_LENGTH)
+            if not data and not pending.reader.empty:
+                raise ConnectionError("Connection closed before the whole frame was received")
+            req = pending.reader.feed(data) if data else None
+        except BlockingIOError:
+            return
+        except ConnectionError as e:
+            log.warning(f"event=[stream_connection_failed] error=[{e}]")
+            data = None
+
+        if not data:  # Closed by the client (a connection without a request is used to check the server is alive)
+            selector.unregister(connection)
+            connection.close()
+            return
+        if req is None:
+            return  # Waiting for the rest of the frame
+
+        selector.unregister(connection)
+        connection.settimeout(STREAM_CONNECTION_TIMEOUT)  # Blocking mode with a timeout for sending the response
+
+        def reply(resp_body, conn=connection):
+            self._send_stream_response(resp_body, conn)
+
+        self._dispatch(req.decode(), reply)
+
+    @staticmethod
+    def _close_expired_streams(selector):
+        now = time.monotonic()
+        expired = [key for key in selector.get_map().values() if key.data and key.data.deadline < now]
+        for key in expired:
+            log.warning("event=[stream_connection_failed] error=[request not received in time]")
+            selector.unregister(key.fileobj)
+            key.fileobj.close()
+
+    @staticmethod
+    def _send_stream_response(resp_body, connection):
+        with connection:
+            if not resp_body:
+                return
+            try:
+                connection.sendall(frame(resp_body.encode()))
+            except (TimeoutError, ConnectionError) as e:
+                log.warning(f"event=[stream_connection_failed] error=[{e}]")
+            except PayloadTooLarge as e:
+                log.error(f"event=[server_response_payload_too_large] message=[{e}]")
 
     @abc.abstractmethod
     def handle(self, req_body):
@@ -76,7 +396,11 @@ class SocketServer(abc.ABC):
         """
 
     def stop(self):
+        if self._stopped:
+            return
         self._stopped = True
+        for _ in self._workers:
+            self._requests.put(None)
 
     def close(self):
         self.stop()
@@ -86,14 +410,22 @@ class SocketServer(abc.ABC):
 
         socket_name = self._server.getsockname()
         try:
-            self._server.shutdown(socket.SHUT_RD)
+            try:
+                self._server.shutdown(socket.SHUT_RD)
+            except OSError:
+                if self._transport != Transport.STREAM:  # Unblocks the listening socket but may raise ENOTCONN
+                    raise
             self._server.close()
         finally:
             if os.path.exists(socket_name):
                 os.remove(socket_name)
 
     def wait(self):
-        self._serving_thread.join()
+        if self._serving_thread.is_alive():
+            self._serving_thread.join()
+        for worker in self._workers:
+            if worker.is_alive():
+                worker.join()
 
     def close_and_wait(self):
         self.close()
@@ -102,6 +434,7 @@ class SocketServer(abc.ABC):
 
 class Error(Enum):
     TIMEOUT = auto()
+    CLOSED = auto()  # Stream connection closed by the server without a response
 
 
 class ServerResponse(NamedTuple):
@@ -112,21 +445,34 @@ class ServerResponse(NamedTuple):
 
 class SocketClient:
 
-    def __init__(self, servers_provider, bidirectional: bool, *, timeout=2):
+    def __init__(self, servers_provider, bidirectional: bool, *, timeout=2, concurrent=False,
+                 stale_socket_hook: Optional[Callable[[Path], None]] = None):
+        """
+        :param servers_provider: function returning paths of server sockets
+        :param bidirectional: whether responses are expected from the servers
+        :param timeout: timeout for a response of a single server, or for all responses in the concurrent mode
+        :param concurrent: send the request to all servers first and then gather all responses (see `communicate`)
+        :param stale_socket_hook: called with the path of each detected stale socket (e.g. to update a socket cache)
+        """
         self._servers_provider = servers_provider
+        self._stale_socket_hook = stale_socket_hook
         self._bidirectional = bidirectional
+        self._timeout = timeout
+        self._concurrent = concurrent
         self._client = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
         if bidirectional:
             self._client.bind(self._client.getsockname())
             self._client.settimeout(timeout)
         self.timed_out_servers = []
         self.stale_sockets = []
+        self._stream_servers = set()  # Addresses of servers detected to use the stream transport
 
     @coroutine
-    def servers(self, include=()):
+    def servers(self, include=(), accept=None):
         """
 
         :param include: server IDs exact match filter
+        :param accept: datagram responses for which this predicate returns false are ignored (see `communicate`)
         :return: response if bidirectional
         :raises PayloadTooLarge: when request payload is too large
         """
@@ -146,28 +492,94 @@ class SocketClient:
 
                 encoded = req_body.encode()
                 try:
-                    self._client.sendto(encoded, str(server_file))
-                    if self._bidirectional:
-                        datagram = self._client.recv(RECV_BUFFER_LENGTH)
-                        resp = ServerResponse(server_id, datagram.decode())
+                    if str(server_file) in self._stream_servers:
+                        stream_resp = self._exchange_stream(server_file, encoded)
+                        if self._bidirectional:
+                            resp = ServerResponse(server_id, stream_resp)
+                    else:
+                        self._client.sendto(encoded, str(server_file))
+                        if self._bidirectional:
+                            resp = ServerResponse(server_id, self._recv_from(str(server_file), accept))
                 except TimeoutError:
                     log.warning('event=[socket_timeout] socket=[{}]'.format(server_file))
                     self.timed_out_servers.append(server_id)
                     resp = ServerResponse(server_id, None, Error.TIMEOUT)
                 except ConnectionRefusedError:  # TODO what about other errors?
-                    log.warning('event=[stale_socket] socket=[{}]'.format(server_file))
-                    self.stale_sockets.append(server_file)
+                    self._stale_socket(server_file)
                     skip = True  # Ignore this one and continue with another one
                     break
+                except ConnectionError as e:
+                    log.warning('event=[stream_connection_closed] socket=[{}] error=[{}]'.format(server_file, e))
+                    resp = ServerResponse(server_id, None, Error.CLOSED)
                 except OSError as e:
+                    if e.errno == errno.EPROTOTYPE:
+                        self._stream_servers.add(str(server_file))
+                        skip = True  # Repeat the request using the stream transport
+                        continue
                     if e.errno == 2 or e.errno == 32:
                         continue  # The server closed meanwhile
                     if e.errno == 90:
                         raise PayloadTooLarge(len(encoded))
                     raise e
 
-    def communicate(self, req, include=()) -> List[ServerResponse]:
-        server = self.servers(include=include)
+    def _stale_socket(self, server_file):
+        log.warning('event=[stale_socket] socket=[{}]'.format(server_file))
+        self.stale_sockets.append(server_file)
+        if self._stale_socket_hook:
+            self._stale_socket_hook(server_file)
+
+    def _open_stream(self, server_file, encoded, timeout=None):
+        stream = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            stream.settimeout(self._timeout if timeout is None else timeout)
+            stream.connect(str(server_file))
+            stream.sendall(frame(encoded))
+            return stream
+        except BaseException:
+            stream.close()
+            raise
+
+    def _exchange_stream(self, server_file, encoded) -> Optional[str]:
+        with self._open_stream(server_file, encoded) as stream:
+            if not self._bidirectional:
+                return None
+            payload = _recv_frame(stream)
+        if payload is None:
+            raise ConnectionError("Connection closed by the server")
+        return payload.decode()
+
+    def _recv_from(self, server_address, accept) -> str:
+        while True:
+            datagram, address = self._client.recvfrom(RECV_BUFFER_LENGTH)
+            if address == server_address:
+                resp = datagram.decode()
+                if not accept or accept(resp):
+                    return resp
+            # Most likely a late response of a server which timed out before
+            log.warning('event=[unexpected_response_ignored] socket=[{}]'.format(address))
+
+    def communicate(self, req, include=(), *, accept=None) -> List[ServerResponse]:
+        """
+        Sends the request to all servers and collects their responses.
+
+        In the concurrent mode, the request is sent to all the servers first, and then the responses are gathered
+        as they arrive. The timeout of the client is applied to the whole operation, so the total time is about
+        the time of the slowest response rather than the sum of all of them.
+
+        When the client is reused for several requests, a late response to an earlier request can arrive from
+        the same server while waiting for the response to the current one. The `accept` predicate allows to recognize
+        such responses (e.g. by a correlation ID) so they are ignored.
+
+        :param req: request body
+        :param include: server IDs exact match filter
+        :param accept: predicate returning false for datagram responses not belonging to this request
+        :return: responses in the order of the contacted servers
+        :raises PayloadTooLarge: when request payload is too large
+        """
+        if self._concurrent:
+            return self._communicate_concurrently(req, include, accept)
+
+        server = self.servers(include=include, accept=accept)
         responses = []
         while True:
             try:
@@ -177,6 +589,107 @@ class SocketClient:
                 break
         return responses
 
+    def _communicate_concurrently(self, req, include, accept) -> List[ServerResponse]:
+        encoded = req.encode()
+        deadline = time.monotonic() + self._timeout
+        address_to_id: Dict[str, str] = {}  # Preserves the order of the contacted servers
+        streams: Dict[str, socket.socket] = {}
+        client_timeout = self._client.gettimeout()
+        try:
+            for server_file in self._servers_provider():
+                server_id = server_file.stem
+                address = str(server_file)
+                if (server_file in self.stale_sockets) or (include and server_id not in include):
+                    continue
+                # Sending to a server with a full buffer blocks, so the sending is limited by the overall deadline too
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining <= 0:
+                        raise TimeoutError
+                    self._client.settimeout(remaining)
+                    if address in self._stream_servers:
+                        streams[address] = self._open_stream(server_file, encoded, remaining)
+                    else:
+                        try:
+                            self._client.sendto(encoded, address)
+                        except OSError as e:
+                            if e.errno != errno.EPROTOTYPE:
+                                raise
+                            self._stream_servers.add(address)
+                            streams[address] = self._open_stream(server_file, encoded, remaining)
+                except TimeoutError:  # Buffer of the server socket is full or no time left, reported as timed out
+                    log.warning('event=[socket_timeout] socket=[{}]'.format(server_file))
+                except ConnectionRefusedError:
+                    self._stale_socket(server_file)
+                    continue
+                except OSError as e:
+                    if e.errno == 2 or e.errno == 32:
+                        continue  # The server closed meanwhile
+                    if e.errno == 90:
+                        raise PayloadTooLarge(len(encoded))
+                    raise e
+                address_to_id[address] = server_id
+        except BaseException:
+            for stream in streams.values():
+                stream.close()
+            raise
+        finally:
+            self._client.settimeout(client_timeout)
+
+        try:
+            if not self._bidirectional:
+                return []
+            responses = self._gather_responses(address_to_id, streams, deadline, accept)
+        finally:
+            for stream in streams.values():
+                stream.close()
+
+        for address, server_id in address_to_id.items():
+            if address not in responses:
+                log.warning('event=[socket_timeout] socket=[{}]'.format(address))
+                self.timed_out_servers.append(server_id)
+                responses[address] = ServerResponse(server_id, None, Error.TIMEOUT)
+
+        return [responses[address] for address in address_to_id]
+
+    def _gather_responses(self, address_to_id, streams, deadline, accept) -> Dict[str, ServerResponse]:
+        responses: Dict[str, ServerResponse] = {}
+        with selectors.DefaultSelector() as selector:
+            selector.register(self._client, selectors.EVENT_READ)
+            for address, stream in streams.items():
+                selector.register(stream, selectors.EVENT_READ, (address, _FrameReader()))
+
+            while len(responses) < len(address_to_id):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                for key, _ in selector.select(remaining):
+                    if key.data is None:  # Datagram socket
+                        datagram, address = self._client.recvfrom(RECV_BUFFER_LENGTH)
+                        resp = datagram.decode() if address in address_to_id and address not in responses else None
+                        if resp is None or (accept and not accept(resp)):
+                            log.warning('event=[unexpected_response_ignored] socket=[{}]'.format(address))
+                            continue
+                        responses[address] = ServerResponse(address_to_id[address], resp)
+                        continue
+
+                    address, reader = key.data
+                    try:
+                        data = key.fileobj.recv(RECV_BUFFER_LENGTH)
+                        payload = reader.feed(data) if data else None
+                        if not data:
+                            raise ConnectionError("Connection closed by the server")
+                    except ConnectionError as e:
+                        log.warning('event=[stream_connection_closed] socket=[{}] error=[{}]'.format(address, e))
+                        selector.unregister(key.fileobj)
+                        responses[address] = ServerResponse(address_to_id[address], None, Error.CLOSED)
+                        continue
+                    if payload is not None:
+                        selector.unregister(key.fileobj)
+                        responses[address] = ServerResponse(address_to_id[address], payload.decode())
+
+        return responses
+
     def close(self):
         self._client.shutdown(socket.SHUT_RDWR)
         self._client.close()
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import socket
+
+import pytest
+
+from tarotools.taro import client
+from tarotools.taro.client import APIClientPool, _correlated, _process_batch_responses, _output_resp_mapper, \
+    _stop_resp_mapper, APIErrorType, AsyncAPIClient, APIClient, _output_call
+from tarotools.taro.util.discovery import SocketDiscovery
+from tarotools.taro.util.socket import ServerResponse, Error, SocketServer, Transport
+
+
+@pytest.fixture
+def sut():
+    pool = APIClientPool(max_idle=1)
+    yield pool
+    pool.close()
+
+
+def test_client_reused(sut):
+    with sut.client() as c1:
+        pass
+    with sut.client() as c2:
+        with sut.client() as c3:
+            pass
+
+    assert c1 is c2
+    assert c3 is not c1
+
+
+def test_failed_client_not_reused(sut):
+    with pytest.raises(OSError):
+        with sut.client() as c1:
+            raise OSError
+
+    with sut.client() as c2:
+        pass
+
+    assert c1 is not c2
+
+
+def test_correlation():
+    accept = _correlated('abc')
+
+    assert accept('{"response_metadata": {"request_id": "abc"}}')
+    assert not accept('{"response_metadata": {"request_id": "xyz"}}')
+    assert not accept('{"response_metadata": {"request_id": "abcd"}}')
+    assert not accept('{"response_metadata": {"request_id": "xyz"}, "output": "abc"}')
+    assert accept('{"response_metadata": {}}')
+
+
+def _instance_resp(job_id, **body):
+    return {"instance_metadata": {"job_id": job_id, "run_id": job_id, "instance_id": job_id, "system_parameters": {},
+                                  "user_params": {}}, **body}
+
+
+def test_batch_responses_demultiplexed():
+    batch_resp = {
+        "response_metadata": {"code": 200},
+        "responses": [
+            {"response_metadata": {"code": 200},
+             "instance_responses": [_instance_resp('j1', output=[["line", False]])]},
+            {"response_metadata": {"code": 422, "error": {"reason": "invalid"}}},
+        ]
+    }
+    server_responses = [ServerResponse('s1', json.dumps(batch_resp)), ServerResponse('s2', None, Error.TIMEOUT)]
+
+    output, stop = _process_batch_responses(server_responses, [_output_resp_mapper, _stop_resp_mapper])
+
+    assert [r.output for r in output.responses] == [[["line", False]]]
+    assert [e.api_id for e in output.errors] == ['s2']
+    assert not stop.responses
+    assert [(e.api_id, e.error_type) for e in stop.errors] == \
+           [('s1', APIErrorType.API_CLIENT), ('s2', APIErrorType.SOCKET)]
+
+
+class InstanceAPI(SocketServer):
+
+    def __init__(self, socket_path, transport):
+        super().__init__(lambda: socket_path, transport=transport)
+        self.name = socket_path.stem
+
+    def handle(self, req_body):
+        req_metadata = json.loads(req_body)["request_metadata"]
+        return json.dumps({
+            "response_metadata": {"code": 200, "request_id": req_metadata["request_id"]},
+            "instance_responses": [_instance_resp(self.name, output=[["line", False]])]
+        })
+
+
+@pytest.mark.parametrize('transport', [Transport.DATAGRAM, Transport.STREAM])
+def test_async_client(tmp_path, transport):
+    servers = [InstanceAPI(tmp_path / f's{i}.api', transport) for i in range(3)]
+    for server in servers:
+        assert server.start()
+    discovery = SocketDiscovery(lambda: tmp_path, '.api')
+
+    async def fetch_all():
+        async with AsyncAPIClient(discovery=discovery) as client:
+            return await asyncio.gather(*(client.fetch_output() for _ in range(5)))
+
+    try:
+        results = asyncio.run(fetch_all())
+    finally:
+        for server in servers:
+            server.close_and_wait()
+        discovery.close()
+
+    for responses, errors in results:
+        assert not errors
+        assert sorted(r.instance_metadata.job_id for r in responses) == ['s0', 's1', 's2']
+
+
+def test_async_client_timeout(tmp_path):
+    socket_path = tmp_path / 'silent.api'
+    silent = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    silent.bind(str(socket_path))
+    discovery = SocketDiscovery(lambda: tmp_path, '.api')
+
+    async def fetch():
+        async with AsyncAPIClient(timeout=0.1, discovery=discovery) as client:
+            return await client.get_active_runs()
+
+    try:
+        responses, errors = asyncio.run(fetch())
+    finally:
+        silent.close()
+        discovery.close()
+
+    assert not responses
+    assert [(e.api_id, e.socket_error) for e in errors] == [('silent', Error.TIMEOUT)]
+
+
+def test_follow_output_without_paging_support(tmp_path, monkeypatch):
+    server = InstanceAPI(tmp_path / 'legacy.api', Transport.DATAGRAM)  # Ignores the cursor, no `next_cursor`
+    assert server.start()
+    discovery = SocketDiscovery(lambda: tmp_path, '.api')
+    monkeypatch.setattr(client, 'api_discovery', lambda: discovery)
+
+    try:
+        with APIClient() as c:
+            pages = list(c.follow_output(wait=0))
+    finally:
+        server.close_and_wait()
+        discovery.close()
+
+    assert [p.output for p in pages] == [[["line", False]]]
+
+
+def test_output_wait_capped():
+    assert _output_call(None, 0, 0, 3600).req_body['wait'] == client.MAX_OUTPUT_WAIT
+    assert _output_call(None, 0, 0, 1).req_body['wait'] == 1
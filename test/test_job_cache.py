@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from tarotools.taro.job import CachedJobRun
+from tarotools.taro.run import RunState
+from tarotools.taro.test.job import FakeJobInstanceBuilder
+
+
+@pytest.fixture
+def instance():
+    return FakeJobInstanceBuilder('j1').add_phase('EXEC', RunState.EXECUTING).build()
+
+
+@pytest.fixture
+def sut(instance):
+    cache = CachedJobRun(instance)
+    yield cache
+    cache.close()
+
+
+def test_cached_until_changed(sut, instance):
+    encoded = sut.encoded()
+    assert sut.encoded() is encoded
+
+    instance.task_tracker.operation('op1').update(1, 10)
+    updated = sut.encoded()
+    assert updated is not encoded
+    assert json.loads(updated)['task']['operations'][0]['completed'] == 1
+
+
+def test_transition_invalidates(sut, instance):
+    encoded = sut.encoded()
+
+    instance.phaser.prime()
+
+    assert sut.version == 1
+    assert sut.encoded() != encoded
+
+
+def test_fields_cached_separately(sut):
+    full = sut.encoded()
+    projected = sut.encoded(['metadata'])
+
+    assert json.loads(projected).keys() == {'metadata', 'run'}
+    assert sut.encoded() is full
+    assert sut.encoded(['metadata']) is projected
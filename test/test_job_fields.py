@@ -0,0 +1,41 @@
+import pytest
+
+from tarotools.taro.job import JobRunView, JOB_RUN_FIELDS
+from tarotools.taro.run import TerminationStatus
+from tarotools.taro.test.job import ended_run
+
+
+@pytest.fixture
+def job_run():
+    return ended_run('j1', term_status=TerminationStatus.FAILED)
+
+
+def test_only_requested_fields_serialized(job_run):
+    serialized = job_run.serialize_fields(['metadata', 'lifecycle.current'])
+
+    assert set(serialized) == {'metadata', 'run'}
+    assert set(serialized['run']) == {'current_phase'}
+
+
+def test_view_deserialization(job_run):
+    view = JobRunView.deserialize(job_run.serialize_fields(JOB_RUN_FIELDS))
+
+    assert view.metadata == job_run.metadata
+    assert view.phases == job_run.run.phases
+    assert view.lifecycle == job_run.run.lifecycle
+    assert view.current_phase == job_run.run.lifecycle.current_run
+    assert view.termination == job_run.run.termination
+    assert view.task_summary == str(job_run.task)
+
+
+def test_missing_metadata_provided(job_run):
+    view = JobRunView.deserialize(job_run.serialize_fields(['termination']), job_run.metadata)
+
+    assert view.job_id == 'j1'
+    assert view.termination.status == TerminationStatus.FAILED
+    assert view.lifecycle is None
+
+
+def test_unknown_field(job_run):
+    with pytest.raises(ValueError):
+        job_run.serialize_fields(['unknown'])
@@ -0,0 +1,383 @@
+import json
+import socket
+import time
+
+import pytest
+
+from tarotools.taro import listening, paths
+from tarotools.taro.criteria import JobRunIdCriterion
+from tarotools.taro.listening import InstanceTransitionReceiver, encode_event, EventHeader, EventSender, \
+    InstanceOutputReceiver, ListenerStats, OUTPUT_EVENT_TYPE, OUTPUT_LISTENER_FILE_EXTENSION, EventRingSender, \
+    EventRingReader, TransitionSender, ListenerFilter, publish_filter, read_filter, filter_file_path
+from tarotools.taro.run import RunState, PhaseNames, PhaseMetadata
+from tarotools.taro.util.discovery import SocketDiscovery
+from tarotools.taro.util.ring import EventRing
+from tarotools.taro.util.socket import RECV_BUFFER_LENGTH
+from tarotools.taro.test.job import TestJobRunBuilder
+from tarotools.taro.test.observer import GenericObserver, TestOutputObserver
+
+
+def _transition_event(job_id):
+    job_run = TestJobRunBuilder(job_id).add_phase('EXEC', RunState.EXECUTING).build()
+    lifecycle = job_run.run.lifecycle
+    event = {
+        "job_run": job_run.serialize(),
+        "previous_phase": lifecycle.previous_run.serialize(),
+        "new_phase": lifecycle.current_run.serialize(),
+        "ordinal": lifecycle.phase_count,
+    }
+    return job_run.metadata, event
+
+
+@pytest.fixture
+def observer():
+    return GenericObserver()
+
+
+def _receiver(observer, **kwargs):
+    receiver = InstanceTransitionReceiver(**kwargs)
+    receiver.add_observer_transition(observer)
+    return receiver
+
+
+def test_envelope(observer):
+    sut = _receiver(observer)
+    metadata, event = _transition_event('j1')
+
+    sut.handle(encode_event('instance_phase_transition', metadata, event, 'EXEC'))
+
+    _, (job_run, _, new_phase, ordinal) = observer.updates.get_nowait()
+    assert job_run.job_id == 'j1'
+    assert new_phase.phase_name == 'EXEC'
+    assert ordinal == 2
+
+
+def test_filtered_by_header_without_parsing_body(observer):
+    sut = _receiver(observer, id_match=JobRunIdCriterion('j1'), phases=(PhaseNames.TERMINAL,))
+    header = EventHeader(1, 'instance_phase_transition', 'j2', 'r1', PhaseNames.TERMINAL)
+
+    sut.handle(header.encode() + '\n' + 'not a json body')  # The body is not reached
+    assert sut.accepts_header(header._replace(job_id='j1'))
+    assert not sut.accepts_header(header._replace(job_id='j1', phase='EXEC'))
+    assert observer.updates.empty()
+
+
+def test_legacy_event(observer):
+    sut = _receiver(observer, id_match=JobRunIdCriterion('j1'))
+    metadata, event = _transition_event('j1')
+    legacy = {"event_metadata": {"event_type": "instance_phase_transition"},
+              "instance_metadata": metadata.serialize(), "event": event}
+
+    sut.handle(json.dumps(legacy))
+
+    assert observer.updates.get_nowait()[1][0].job_id == 'j1'
+
+
+def test_dispatch_queue(observer):
+    sut = _receiver(observer, dispatch_capacity=10)
+    sut._dispatch.start()
+    metadata, event = _transition_event('j1')
+
+    sut.handle(encode_event('instance_phase_transition', metadata, event, 'EXEC'))
+    sut._dispatch.close()
+    sut._dispatch.wait()
+
+    assert observer.updates.get_nowait()[1][0].job_id == 'j1'
+    assert sut.dispatch_stats.dispatched == 1
+
+
+@pytest.fixture
+def listener_socket(tmp_path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.bind(str(tmp_path / 'l1.olistener'))
+    sock.setblocking(False)
+    yield sock
+    sock.close()
+
+
+@pytest.fixture
+def sender(tmp_path):
+    discovery = SocketDiscovery(lambda: tmp_path, OUTPUT_LISTENER_FILE_EXTENSION)
+    event_sender = EventSender(OUTPUT_LISTENER_FILE_EXTENSION, discovery=discovery)
+    yield event_sender
+    event_sender.close()
+    discovery.close()
+
+
+def _drain(sock):
+    datagrams = []
+    while True:
+        try:
+            datagrams.append(sock.recv(RECV_BUFFER_LENGTH).decode())
+        except BlockingIOError:
+            return datagrams
+
+
+def _stats(sender):
+    return sender.stats().get('l1.olistener', ListenerStats(0, 0, 0))
+
+
+def _output_event(metadata, text):
+    event = {"phase": PhaseMetadata('EXEC', RunState.EXECUTING, {}).serialize(), "output": text, "is_error": False}
+    return encode_event(OUTPUT_EVENT_TYPE, metadata, event, 'EXEC')
+
+
+def _fill_backlog(sender, metadata):
+    """Sends output events until the buffer of the listener is full, returns the number of sent events"""
+    count = 0
+    while not _stats(sender).backlog:
+        sender.send(_output_event(metadata, f'line{count}'), batchable=True)
+        count += 1
+    return count
+
+
+def test_output_batched_under_pressure(sender, listener_socket, observer, monkeypatch):
+    monkeypatch.setattr(listening, 'BACKLOG_FLUSH_INTERVAL', 60)  # The backlog is flushed by the next event
+    metadata = TestJobRunBuilder('j1').build().metadata
+    count = _fill_backlog(sender, metadata)
+
+    receiver = InstanceOutputReceiver()
+    receiver.add_observer_output(observer)
+    for datagram in _drain(listener_socket):
+        receiver.handle(datagram)
+    sender.send(_output_event(metadata, 'last'), batchable=True)  # Flushes the backlog in a batch
+    datagrams = _drain(listener_socket)
+    for datagram in datagrams:
+        receiver.handle(datagram)
+
+    assert len(datagrams) == 1
+    assert sender.stats()['l1.olistener'] == ListenerStats(count + 1, 0, 0)
+    outputs = [output for _, _, output, _ in _received_outputs(observer)]
+    assert outputs == [f'line{i}' for i in range(count)] + ['last']
+
+
+def test_batch_limited_by_encoded_size(sender, listener_socket, monkeypatch):
+    monkeypatch.setattr(listening, 'BACKLOG_FLUSH_INTERVAL', 60)  # The backlog is flushed by the next event
+    monkeypatch.setattr(listening, 'MAX_BATCH_BYTES', 4096)
+    metadata = TestJobRunBuilder('j1').build().metadata
+    count = _fill_backlog(sender, metadata)
+    for i in range(20):  # Encoded events are ASCII (escaped by JSON), but the sender does not rely on it
+        sender.send(json.dumps({"output": 'ž' * 400}, ensure_ascii=False), batchable=True)
+    _drain(listener_socket)
+
+    sender.send(_output_event(metadata, 'last'), batchable=True)
+    batches = [datagram.encode() for datagram in _drain(listener_socket)]
+
+    assert len(batches) > 1
+    assert all(len(batch) <= 4096 for batch in batches)
+    assert _stats(sender) == ListenerStats(count + 21, 0, 0)
+
+
+def _received_lines(listener_socket):
+    receiver = InstanceOutputReceiver()
+    observer = GenericObserver()
+    receiver.add_observer_output(observer)
+    for datagram in _drain(listener_socket):
+        receiver.handle(datagram)
+    return [output for _, _, output, _ in _received_outputs(observer)]
+
+
+def test_backlog_flushed_without_next_event(sender, listener_socket):
+    count = _fill_backlog(sender, TestJobRunBuilder('j1').build().metadata)
+
+    lines = _received_lines(listener_socket)
+    deadline = time.monotonic() + 5
+    while _stats(sender).backlog and time.monotonic() < deadline:
+        time.sleep(0.01)
+    lines += _received_lines(listener_socket)
+
+    assert lines == [f'line{i}' for i in range(count)]
+    assert _stats(sender) == ListenerStats(count, 0, 0)
+
+
+def test_backlog_flushed_on_close(sender, listener_socket, monkeypatch):
+    monkeypatch.setattr(listening, 'BACKLOG_FLUSH_INTERVAL', 60)  # Only the close flushes the backlog
+    count = _fill_backlog(sender, TestJobRunBuilder('j1').build().metadata)
+    lines = _received_lines(listener_socket)
+
+    sender.close()
+
+    assert lines + _received_lines(listener_socket) == [f'line{i}' for i in range(count)]
+    assert _stats(sender) == ListenerStats(count, 0, 0)
+
+
+def _received_outputs(observer):
+    outputs = []
+    while not observer.updates.empty():
+        method, args = observer.updates.get_nowait()
+        assert method == 'new_instance_outputs'
+        outputs += args[0]
+    return outputs
+
+
+def test_outputs_notified_in_dispatched_batches(observer):
+    metadata = TestJobRunBuilder('j1').build().metadata
+    sut = InstanceOutputReceiver(dispatch_capacity=10, max_batch=10)
+    sut.add_observer_output(observer)
+    for i in range(3):
+        sut.handle(_output_event(metadata, f'line{i}'))
+    sut._dispatch.start()  # Started after the events are queued so they are drained in a single batch
+    sut._dispatch.close()
+    sut._dispatch.wait()
+
+    method, (outputs,) = observer.updates.get_nowait()
+    assert method == 'new_instance_outputs'
+    assert [output for _, _, output, _ in outputs] == ['line0', 'line1', 'line2']
+    assert observer.updates.empty()
+
+
+def test_output_batch_notified_per_output_by_default():
+    metadata = TestJobRunBuilder('j1').build().metadata
+    observer = TestOutputObserver()
+    sut = InstanceOutputReceiver()
+    sut.add_observer_output(observer)
+
+    sut.handle(_output_event(metadata, 'line0') + '\n' + _output_event(metadata, 'line1'))
+
+    assert [output for _, _, output, _ in observer.outputs] == ['line0', 'line1']
+
+
+def test_events_dropped_for_full_listener(sender, listener_socket):
+    metadata = TestJobRunBuilder('j1').build().metadata
+    while not _stats(sender).dropped:
+        sender.send(_output_event(metadata, 'line'))
+
+    stats = sender.stats()['l1.olistener']
+    assert stats.sent == len(_drain(listener_socket))
+    assert stats.dropped == 1
+
+
+def test_sender_applies_listener_filter(sender, listener_socket, tmp_path):
+    publish_filter(tmp_path / 'l1.olistener', ListenerFilter(id_match=JobRunIdCriterion('j1')))
+
+    for job_id in ('j2', 'j1'):
+        sender.send(_output_event(TestJobRunBuilder(job_id).build().metadata, 'line'))
+
+    datagrams = _drain(listener_socket)
+    assert len(datagrams) == 1
+    assert EventHeader.decode(datagrams[0].split('\n')[0]).job_id == 'j1'
+    assert _stats(sender) == ListenerStats(1, 0, 0, 1)
+
+
+def test_receiver_publishes_filter(observer, tmp_path, monkeypatch):
+    monkeypatch.setattr(paths, 'socket_dir', lambda create: tmp_path)
+    sut = _receiver(observer, id_match=JobRunIdCriterion('j1'), phases=('EXEC',))
+    socket_path = sut._socket_path_provider()  # Called by `start` before binding the socket
+    try:
+        assert read_filter(socket_path) == ListenerFilter((), JobRunIdCriterion('j1'), ('EXEC',))
+    finally:
+        sut.close()
+
+    assert socket_path.parent == tmp_path
+    assert not filter_file_path(socket_path).exists()
+
+
+def test_sender_closes_own_discovery(tmp_path, monkeypatch):
+    monkeypatch.setattr(paths, 'socket_dir', lambda create: tmp_path)
+    sut = EventSender(OUTPUT_LISTENER_FILE_EXTENSION)
+    sut.send(_output_event(TestJobRunBuilder('j1').build().metadata, 'line'))
+
+    sut.close()
+
+    assert sut._discovery._closed.is_set()
+    assert sut._discovery._inotify is None
+
+
+def test_dead_listener_pruned(sender, tmp_path):
+    dead = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    dead.bind(str(tmp_path / 'dead.olistener'))
+    dead.close()
+
+    sender.send(_output_event(TestJobRunBuilder('j1').build().metadata, 'line'))
+
+    assert not (tmp_path / 'dead.olistener').exists()
+    assert sender.stats() == {}
+
+
+def test_events_through_ring(observer, tmp_path):
+    ring = EventRing.open(tmp_path / 'events.ring', capacity=64 * 1024)
+    sut = EventRingReader(_receiver(observer, id_match=JobRunIdCriterion('j1')), ring)
+    sut.start()
+    sender = TransitionSender(EventRingSender(ring))
+
+    for job_id in ('j2', 'j1'):
+        job_run = TestJobRunBuilder(job_id).add_phase('EXEC', RunState.EXECUTING).build()
+        lifecycle = job_run.run.lifecycle
+        sender.new_instance_phase(job_run, lifecycle.previous_run, lifecycle.current_run, lifecycle.phase_count)
+
+    _, (job_run, _, new_phase, _) = observer.updates.get(timeout=2)
+    sut.close_and_wait()
+    ring.close()
+
+    assert job_run.job_id == 'j1'
+    assert new_phase.phase_name == 'EXEC'
+    assert observer.updates.empty()
+    assert sut.lost == 0
+
+
+def _transition_of(job_run, ordinal):
+    phase_runs = job_run.run.lifecycle.phase_runs
+    event = {
+        "job_run": job_run.serialize(),
+        "previous_phase": phase_runs[ordinal - 2].serialize(),
+        "new_phase": phase_runs[ordinal - 1].serialize(),
+        "ordinal": ordinal,
+    }
+    return encode_event('instance_phase_transition', job_run.metadata, event, phase_runs[ordinal - 1].phase_name)
+
+
+def _four_phases_run():
+    return (TestJobRunBuilder('j1', 'r1')
+            .add_phase('A', RunState.PENDING)
+            .add_phase('B', RunState.EXECUTING)
+            .add_phase('C', RunState.EXECUTING)
+            .build())
+
+
+def test_missed_transitions_recovered(observer):
+    sut = _receiver(observer)
+    job_run = _four_phases_run()
+
+    sut.handle(_transition_of(job_run, 2))
+    sut.handle(_transition_of(job_run, 4))  # Transition to B was lost
+
+    updates = _drain_updates(observer)
+    transitions = [(prev.phase_name, new.phase_name, o) for _, (_, prev, new, o) in updates]
+    assert transitions == [('INIT', 'A', 2), ('A', 'B', 3), ('B', 'C', 4)]
+    recovered_run = updates[1][1][0]
+    assert recovered_run.run.lifecycle.phases == ['INIT', 'A', 'B']
+    assert recovered_run.run.lifecycle.current_run.ended_at is None
+    assert sut.recovered_transitions == 1
+
+
+def test_last_ordinals_bounded(observer, monkeypatch):
+    monkeypatch.setattr(listening, 'MAX_TRACKED_INSTANCES', 1)
+    sut = _receiver(observer)
+    job_run = _four_phases_run()
+
+    sut.handle(_transition_of(job_run, 2))
+    # Evicts the ordinal of the first instance
+    sut.handle(encode_event('instance_phase_transition', *_transition_event('j2')))
+    sut.handle(_transition_of(job_run, 4))
+
+    assert len(sut._last_ordinals) == 1
+    assert sut.recovered_transitions == 0
+
+
+def test_filtered_transitions_not_recovered(observer):
+    sut = _receiver(observer, phases=('A', 'C'))
+    job_run = _four_phases_run()
+
+    sut.handle(_transition_of(job_run, 2))
+    sut.handle(_transition_of(job_run, 3))  # Filtered out
+    sut.handle(_transition_of(job_run, 4))
+
+    assert [o for _, (_, _, _, o) in _drain_updates(observer)] == [2, 4]
+    assert sut.recovered_transitions == 0
+
+
+def _drain_updates(observer):
+    updates = []
+    while not observer.updates.empty():
+        updates.append(observer.updates.get_nowait())
+    return updates
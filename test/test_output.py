@@ -1,3 +1,5 @@
+from threading import Timer
+
 from tarotools.taro.output import InMemoryOutput
 
 
@@ -32,3 +34,63 @@ def test_empty_output():
     output = InMemoryOutput()
     assert output.fetch() == []
     assert output.fetch(source='source1') == []
+
+
+def test_fetch_page():
+    output = InMemoryOutput()
+    output.add('source1', 'output1', False)
+    output.add('source1', 'output2', False)
+    output.add('source2', 'output3', True)
+
+    page = output.fetch_page()
+    assert page.lines == [('output1', False), ('output2', False), ('output3', True)]
+    assert page.next_cursor == 3
+
+    page = output.fetch_page(1)
+    assert page.lines == [('output2', False), ('output3', True)]
+    assert output.fetch_page(page.next_cursor) == ([], 3)
+
+
+def test_fetch_page_max_bytes():
+    output = InMemoryOutput()
+    output.add('source1', 'output1', False)
+    output.add('source1', 'output2', False)
+    output.add('source1', 'output3', False)
+
+    page = output.fetch_page(max_bytes=15)
+    assert page.lines == [('output1', False), ('output2', False)]
+    assert page.next_cursor == 2
+
+    assert output.fetch_page(page.next_cursor, max_bytes=1).lines == [('output3', False)]  # At least one line
+
+
+def test_fetch_page_wait_for_output():
+    output = InMemoryOutput()
+    Timer(0.05, output.add, ('source1', 'output1', False)).start()
+
+    page = output.fetch_page(timeout=2)
+    assert page.lines == [('output1', False)]
+    assert page.next_cursor == 1
+
+
+def test_search():
+    output = InMemoryOutput()
+    output.add('source1', 'Download started', False)
+    output.add('source1', 'Downloading file 1', False)
+    output.add('source2', 'download failed', True)
+    output.add('source2', 'Done', False)
+
+    assert output.search('Download') == [(1, 'Download started', False), (2, 'Downloading file 1', False)]
+    assert output.search('download') == [(3, 'download failed', True)]
+    assert [m.line_number for m in output.search('download', ignore_case=True)] == [1, 2, 3]
+    assert output.search('upload') == []
+    assert output.search('Do') == [(1, 'Download started', False), (2, 'Downloading file 1', False), (4, 'Done', False)]
+
+
+def test_search_requires_all_trigrams():
+    output = InMemoryOutput()
+    output.add('source1', 'abcd', False)
+    output.add('source1', 'bcde', False)
+
+    assert output.search('abcde') == []
+    assert output.search('bcd') == [(1, 'abcd', False), (2, 'bcde', False)]
@@ -1,11 +1,15 @@
 import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime as dt
+from multiprocessing import Process
 
 import pytest
 
 from tarotools.taro.criteria import IntervalCriterion, JobRunAggregatedCriteria, \
     parse_criteria
-from tarotools.taro.db.sqlite import SQLite
+from tarotools.taro.db import sqlite as sqlite_module
+from tarotools.taro.db.sqlite import SQLite, ReadConnectionPool, connect, SCHEMA_VERSION
+from tarotools.taro.persistence import SortCriteria
 from tarotools.taro.run import RunState, TerminationStatus
 from tarotools.taro.test.job import ended_run as run
 from tarotools.taro.util import parse_iso8601_duration, MatchingStrategy
@@ -98,6 +102,60 @@ def test_cleanup(sut):
     assert jobs[0].job_id == 'j2'
 
 
+def test_cleanup_in_batches(sut, monkeypatch):
+    monkeypatch.setattr(sqlite_module, 'RETENTION_BATCH_SIZE', 2)
+    sut.store_job_runs(*(run(f'j{i}', offset_min=i % 4) for i in range(9)))  # Equal end times included
+
+    assert sut.clean_up(2, None, max_batches=1) == 2
+    assert sut.clean_up(2, None) == 5
+    assert sut.clean_up(2, None) == 0
+    assert sorted(sut.read_job_runs().job_ids) == ['j3', 'j7']
+    assert sum(s.count for s in sut.read_stats()) == 2
+
+
+def test_cleanup_with_slack(sut):
+    sut.store_job_runs(*(run(f'j{i}', offset_min=i) for i in range(5)))
+
+    assert sut.clean_up(2, None, slack=3) == 0  # 3 rows over the limit tolerated
+    sut.store_job_runs(run('j5', offset_min=5))
+    assert sut.clean_up(2, None, slack=3) == 4  # Deleted down to the limit once the slack is exceeded
+    assert sorted(sut.read_job_runs().job_ids) == ['j4', 'j5']
+
+    sut.store_job_runs(run('old1', offset_min=-120), run('old2', offset_min=-120))
+    assert sut.clean_up(-1, parse_iso8601_duration('PT50M'), slack=2) == 0
+    sut.store_job_runs(run('old3', offset_min=-120))
+    assert sut.clean_up(-1, parse_iso8601_duration('PT50M'), slack=2) == 3
+    assert sorted(sut.read_job_runs().job_ids) == ['j4', 'j5']
+
+
+def _history_job_ids(sut):
+    return [row[0] for row in sut._conn.execute("SELECT job_id FROM history ORDER BY job_id")]
+
+
+def test_cleanup_null_ended_deleted_first(sut, monkeypatch):
+    monkeypatch.setattr(sqlite_module, 'RETENTION_BATCH_SIZE', 2)
+    sut.store_job_runs(*(run(f'j{i}', offset_min=i) for i in range(6)))
+    sut._conn.execute("UPDATE history SET ended = NULL WHERE job_id IN ('j1', 'j3', 'j4')")
+    sut._conn.commit()
+
+    assert sut.clean_up(-1, parse_iso8601_duration('PT1S')) == 0  # Not deleted by age
+    assert sut.clean_up(4, None) == 2  # The limit is reached in the rows without the end
+    assert _history_job_ids(sut) == ['j0', 'j2', 'j4', 'j5']
+    assert sut.clean_up(2, None) == 2
+    assert _history_job_ids(sut) == ['j2', 'j5']
+    assert sum(s.count for s in sut.read_stats()) == 2
+
+
+def test_cleanup_releases_free_pages(tmp_path):
+    sut = _file_persistence(tmp_path / 'test.db')
+    sut.store_job_runs(*(run(f'j{i}') for i in range(500)))
+
+    sut.clean_up(0, None)
+    assert not sut.read_job_runs()
+    assert sut._conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+    sut.close()
+
+
 def test_interval(sut):
     sut.store_job_runs(run('j1', created=dt(2023, 4, 23), completed=dt(2023, 4, 23)))
     sut.store_job_runs(run('j2', created=dt(2023, 4, 22), completed=dt(2023, 4, 22, 23, 59, 59)))
@@ -118,3 +176,190 @@ def test_interval(sut):
     ic = IntervalCriterion(run_state=RunState.ENDED, from_dt=dt(2023, 4, 22, 23, 59, 59), to_dt=dt(2023, 4, 23))
     jobs = sut.read_job_runs(JobRunAggregatedCriteria(interval_criteria=ic))
     assert sorted(jobs.job_ids) == ['j1', 'j2']
+
+
+def _file_persistence(db_file, read_pool_size=2):
+    database = str(db_file)
+    read_pool = ReadConnectionPool(lambda: connect(database, read_only=True), read_pool_size)
+    sqlite_ = SQLite(connect(database, journal_mode='wal', busy_timeout=10000), read_pool=read_pool)
+    sqlite_.check_tables_exist()
+    return sqlite_
+
+
+def _store_runs(db_file, prefix, count):
+    sqlite_ = _file_persistence(db_file)
+    for i in range(count):
+        sqlite_.store_job_runs(run(f'{prefix}-{i}'))
+    sqlite_.close()
+
+
+def test_concurrent_multiprocess_writes(tmp_path):
+    db_file = tmp_path / 'jobs.db'
+    writers = [Process(target=_store_runs, args=(db_file, f'p{i}', 25)) for i in range(4)]
+    for w in writers:
+        w.start()
+    for w in writers:
+        w.join()
+
+    assert [w.exitcode for w in writers] == [0] * 4
+    sut = _file_persistence(db_file)
+    try:
+        assert len(sut.read_job_runs()) == 100
+    finally:
+        sut.close()
+
+
+def test_concurrent_reads_from_pool(tmp_path):
+    sut = _file_persistence(tmp_path / 'jobs.db')
+    sut.store_job_runs(run('j1'), run('j2', offset_min=1))
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: sut.read_job_runs().job_ids, range(32)))
+    sut.close()
+
+    assert results == [['j1', 'j2']] * 32
+
+
+def test_wal_mode(tmp_path):
+    conn = connect(str(tmp_path / 'jobs.db'), journal_mode='wal')
+    try:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+    finally:
+        conn.close()
+
+
+def test_invalid_journal_mode(tmp_path):
+    with pytest.raises(ValueError):
+        connect(str(tmp_path / 'jobs.db'), journal_mode='invalid')
+
+
+def test_values_bound_as_parameters(sut):
+    sut.store_job_runs(run('j"1'), run("j'2"))
+
+    jobs = sut.read_job_runs(parse_criteria('j"1', MatchingStrategy.EXACT))
+    assert jobs.job_ids == ['j"1']
+    jobs = sut.read_job_runs(parse_criteria("j'", MatchingStrategy.PARTIAL))
+    assert jobs.job_ids == ["j'2"]
+
+
+def _legacy_db():
+    db_con = sqlite3.connect(':memory:')
+    db_con.execute('''CREATE TABLE history (job_id text, run_id text, instance_id text, user_params text,
+                      created timestamp, ended timestamp, exec_time real, phases text, lifecycle text,
+                      termination_status int, failure text, error text, track text, warnings text, misc text)''')
+    db_con.execute('CREATE INDEX job_id_index ON history (job_id)')
+    return db_con
+
+
+def test_schema_migrated(sut):
+    legacy = SQLite(_legacy_db())
+    legacy.store_job_runs(run('j1'))
+    legacy.check_tables_exist()
+
+    for migrated in (legacy, sut):
+        conn = migrated._conn
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        indexes = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+        assert {'job_id_ended_index', 'created_index', 'exec_time_index'} <= indexes
+        assert 'job_id_index' not in indexes
+    assert legacy.read_job_runs().job_ids == ['j1']
+
+
+def test_sort_by_exec_time_uses_index(sut):
+    plan = sut._conn.execute("EXPLAIN QUERY PLAN SELECT * FROM history h ORDER BY h.exec_time DESC LIMIT 5").fetchall()
+    assert any('exec_time_index' in row[-1] for row in plan)
+
+    sut.store_job_runs(run('j1'), run('j2'))
+    sut._conn.execute("UPDATE history SET exec_time = 100000 WHERE job_id = 'j2'")
+    assert sut.read_job_runs(sort=SortCriteria.TIME, asc=False).job_ids == ['j2', 'j1']
+
+
+def _aggregated_stats(sut):
+    # Forces the full aggregation by using criteria matching all rows
+    return sut.read_stats(parse_criteria('*', MatchingStrategy.FN_MATCH))
+
+
+def _stats_by_job(stats):
+    return {s.job_id: s for s in stats}
+
+
+def test_stats_table(sut):
+    sut.store_job_runs(run('j1', 'r1', offset_min=1),
+                       run('j2', 'r1', offset_min=2, term_status=TerminationStatus.FAILED),
+                       run('j1', 'r2', offset_min=3, term_status=TerminationStatus.FAILED))
+
+    stats = _stats_by_job(sut.read_stats())
+    assert stats == _stats_by_job(_aggregated_stats(sut))
+    assert stats['j1'].count == 2
+    assert stats['j1'].failed_count == 1
+    assert stats['j1'].last_state == TerminationStatus.FAILED
+
+    sut.remove_instances(parse_criteria('j1@r2'))
+    stats = _stats_by_job(sut.read_stats())
+    assert stats == _stats_by_job(_aggregated_stats(sut))
+    assert stats['j1'].count == 1
+    assert stats['j1'].last_state == TerminationStatus.COMPLETED
+
+    sut.remove_instances(parse_criteria('j2'))
+    assert list(_stats_by_job(sut.read_stats())) == ['j1']
+
+
+def test_stats_with_history_changed_externally(sut):
+    sut.store_job_runs(run('j1', 'r1'), run('j1', 'r2'))
+    sut._conn.execute("DELETE FROM history WHERE run_id = 'r2'")  # Stats marked as dirty but not refreshed
+
+    assert sut.read_stats()[0].count == 1
+
+
+def test_iter_job_runs(sut):
+    sut.store_job_runs(*(run(f'j{i}', offset_min=i) for i in range(5)))
+
+    runs = sut.iter_job_runs(asc=False, fetch_size=2)
+    assert next(runs).job_id == 'j4'
+    sut.store_job_runs(run('j5', offset_min=-1))  # Writing while iterating over the writer connection
+    assert [r.job_id for r in runs][:4] == ['j3', 'j2', 'j1', 'j0']  # The new row may be included or not
+    assert [r.job_id for r in sut.iter_job_runs(limit=2)] == ['j5', 'j0']
+
+
+@pytest.mark.parametrize('sort', list(SortCriteria))
+@pytest.mark.parametrize('asc', [True, False])
+def test_keyset_pagination(sut, sort, asc):
+    sut.store_job_runs(*(run(f'j{i}', offset_min=i % 3) for i in range(7)))  # Equal sort values included
+
+    paged = []
+    page = sut.read_job_runs_page(sort=sort, asc=asc, limit=3)
+    while True:
+        paged += page.job_runs
+        if not page.next_page_token:
+            break
+        page = sut.read_job_runs_page(sort=sort, asc=asc, limit=3, page_token=page.next_page_token)
+
+    assert paged == sut.read_job_runs(sort=sort, asc=asc)
+
+
+def test_page_token_validated(sut):
+    sut.store_job_runs(run('j1'), run('j2', offset_min=1))
+    token = sut.read_job_runs_page(limit=1).next_page_token
+
+    assert sut.read_job_runs_page(limit=1, page_token=token).job_runs.job_ids == ['j2']
+    with pytest.raises(ValueError):
+        sut.read_job_runs_page(asc=False, limit=1, page_token=token)
+    with pytest.raises(ValueError):
+        sut.read_job_runs_page(limit=1, page_token='invalid')
+
+
+@pytest.mark.parametrize('asc', [True, False])
+def test_keyset_pagination_null_sort_values(sut, asc):
+    sut.store_job_runs(*(run(f'j{i}', offset_min=i) for i in range(5)))
+    sut._conn.execute("UPDATE history SET exec_time = NULL WHERE job_id IN ('j1', 'j3')")
+
+    paged = []
+    page_token = None
+    while True:
+        page = sut.read_job_runs_page(sort=SortCriteria.TIME, asc=asc, limit=1, page_token=page_token)
+        paged += page.job_runs.job_ids
+        if not (page_token := page.next_page_token):
+            break
+
+    assert sorted(paged) == ['j0', 'j1', 'j2', 'j3', 'j4']
+    assert paged[:2] == (['j1', 'j3'] if asc else ['j3', 'j1'])
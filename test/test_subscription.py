@@ -0,0 +1,178 @@
+import pytest
+
+from tarotools.taro import paths, subscription
+from tarotools.taro.client import AggregatedResponse, APIError, APIErrorType
+from tarotools.taro.criteria import parse_criteria
+from tarotools.taro.listening import encode_event
+from tarotools.taro.run import RunState, PhaseNames, PhaseRun
+from tarotools.taro.subscription import ActiveRunsSubscription, ChangeType, SubscriptionError
+from tarotools.taro.test.job import TestJobRunBuilder
+from tarotools.taro.test.observer import GenericObserver
+from tarotools.taro.util.socket import Error
+
+
+def _run(job_id, *phases):
+    builder = TestJobRunBuilder(job_id)
+    for name, state in phases:
+        builder.add_phase(name, state)
+    return builder.build()
+
+
+def _transition(sut, job_run):
+    lifecycle = job_run.run.lifecycle
+    sut.new_instance_phase(job_run, lifecycle.previous_run, lifecycle.current_run, lifecycle.phase_count)
+
+
+def _changes(observer):
+    changes = []
+    while not observer.updates.empty():
+        changes.append(observer.updates.get_nowait()[1][0])
+    return changes
+
+
+def test_changes():
+    sut = ActiveRunsSubscription()
+    observer = GenericObserver()
+    sut.add_observer(observer)
+
+    builder = TestJobRunBuilder('j1')
+    for name, state in ((PhaseNames.INIT, RunState.CREATED), ('EXEC', RunState.EXECUTING),
+                        (PhaseNames.TERMINAL, RunState.ENDED)):
+        builder.add_phase(name, state)
+        _transition(sut, builder.build())
+
+    changes = _changes(observer)
+    assert [c.change_type for c in changes] == \
+           [ChangeType.NEW_INSTANCE, ChangeType.PHASE_TRANSITION, ChangeType.INSTANCE_ENDED]
+    assert [c.seq for c in changes] == [1, 2, 3]
+    assert sut.active_runs == []
+
+
+@pytest.fixture
+def socket_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(paths, 'socket_dir', lambda create: tmp_path)
+    return tmp_path
+
+
+def _snapshots(monkeypatch, *snapshots, during_snapshot=lambda: None):
+    """Replaces the instances API with the provided snapshots, one for each call"""
+    remaining = list(snapshots)
+
+    def get_active_runs(_):
+        during_snapshot()
+        return remaining.pop(0)
+
+    monkeypatch.setattr(subscription.client, 'get_active_runs', get_active_runs)
+
+
+def _event(job_run):
+    lifecycle = job_run.run.lifecycle
+    event = {"job_run": job_run.serialize(), "previous_phase": lifecycle.previous_run.serialize(),
+             "new_phase": lifecycle.current_run.serialize(), "ordinal": lifecycle.phase_count}
+    return encode_event('instance_phase_transition', job_run.metadata, event, lifecycle.current_phase_name)
+
+
+def test_missed_transitions_applied_before_end(socket_dir):
+    sut = ActiveRunsSubscription()
+    observer = GenericObserver()
+    sut.add_observer(observer)
+    builder = TestJobRunBuilder('j1', 'r1').add_phase(PhaseNames.INIT, RunState.CREATED)
+    sut._receiver.handle(_event(builder.build()))
+    builder.add_phase('A', RunState.PENDING).add_phase('B', RunState.EXECUTING)
+    builder.add_phase(PhaseNames.TERMINAL, RunState.ENDED)
+    sut._receiver.handle(_event(builder.build()))  # The transitions to A and B were lost
+
+    changes = _changes(observer)
+    assert [(c.change_type, c.new_phase.phase_name) for c in changes] == [
+        (ChangeType.NEW_INSTANCE, PhaseNames.INIT),
+        (ChangeType.PHASE_TRANSITION, 'A'),
+        (ChangeType.PHASE_TRANSITION, 'B'),
+        (ChangeType.INSTANCE_ENDED, PhaseNames.TERMINAL),
+    ]
+    assert sut.active_runs == []
+    assert sut._receiver._last_ordinals == {}
+
+
+def test_pending_transitions_already_in_snapshot_skipped(socket_dir, monkeypatch):
+    sut = ActiveRunsSubscription()
+    observer = GenericObserver()
+    sut.add_observer(observer)
+
+    builder = TestJobRunBuilder('j1').add_phase(PhaseNames.INIT, RunState.CREATED).add_phase('A', RunState.EXECUTING)
+    snapshot_run = builder.build()
+    next_run = builder.add_phase('B', RunState.EXECUTING).build()
+
+    def events_received_during_snapshot():
+        sut._receiver.handle(_event(snapshot_run))  # Already in the snapshot
+        sut._receiver.handle(_event(next_run))
+
+    _snapshots(monkeypatch, AggregatedResponse([snapshot_run], []), during_snapshot=events_received_during_snapshot)
+    try:
+        snapshot = sut.open()
+    finally:
+        sut.close()
+
+    changes = _changes(observer)
+    assert snapshot.seq == 1
+    assert [(c.seq, c.change_type, c.new_phase.phase_name) for c in changes] == \
+           [(2, ChangeType.PHASE_TRANSITION, 'B')]
+
+
+def test_listener_start_failure(monkeypatch):
+    def socket_dir(create):
+        raise FileNotFoundError(2, 'No such file or directory', '/nonexistent')
+
+    monkeypatch.setattr(paths, 'socket_dir', socket_dir)
+    sut = ActiveRunsSubscription()
+
+    with pytest.raises(SubscriptionError):
+        sut.open()
+
+
+def test_resync(socket_dir, monkeypatch):
+    sut = ActiveRunsSubscription()
+    observer = GenericObserver()
+    sut.add_observer(observer)
+
+    j2 = TestJobRunBuilder('j2').add_phase(PhaseNames.INIT, RunState.CREATED)
+    initial = AggregatedResponse([_run('j1', (PhaseNames.INIT, RunState.CREATED)), j2.build()], [])
+    api_failed = AggregatedResponse([], [APIError('api', APIErrorType.SOCKET, Error.TIMEOUT, None)])
+    current = AggregatedResponse([j2.add_phase('EXEC', RunState.EXECUTING).build(),
+                                  _run('j3', (PhaseNames.INIT, RunState.CREATED))], [])
+    _snapshots(monkeypatch, initial, api_failed, current)
+    try:
+        sut.open()
+        assert sut.resync() == []  # Nothing removed when an API failed
+        changes = sut.resync()
+    finally:
+        sut.close()
+
+    assert [(c.job_run.job_id, c.change_type) for c in changes] == \
+           [('j2', ChangeType.PHASE_TRANSITION), ('j3', ChangeType.NEW_INSTANCE), ('j1', ChangeType.INSTANCE_LOST)]
+    assert [c.seq for c in changes] == [2, 3, 4]
+    assert _changes(observer) == changes
+    assert sorted(r.job_id for r in sut.active_runs) == ['j2', 'j3']
+
+
+def test_run_match():
+    sut = ActiveRunsSubscription(parse_criteria('j2'))
+    observer = GenericObserver()
+    sut.add_observer(observer)
+
+    _transition(sut, _run('j1', (PhaseNames.INIT, RunState.CREATED)))
+    _transition(sut, _run('j2', (PhaseNames.INIT, RunState.CREATED)))
+
+    assert [c.job_run.job_id for c in _changes(observer)] == ['j2']
+    assert [r.job_id for r in sut.active_runs] == ['j2']
+
+
+def test_unknown_ended_instance_ignored():
+    sut = ActiveRunsSubscription()
+    observer = GenericObserver()
+    sut.add_observer(observer)
+
+    job_run = _run('j1', (PhaseNames.INIT, RunState.CREATED), (PhaseNames.TERMINAL, RunState.ENDED))
+    sut.new_instance_phase(job_run, PhaseRun(PhaseNames.INIT, RunState.CREATED, None),
+                           job_run.run.lifecycle.current_run, 2)
+
+    assert _changes(observer) == []
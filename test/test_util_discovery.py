@@ -0,0 +1,150 @@
+import socket
+import time
+
+import pytest
+
+from tarotools.taro.util.discovery import SocketDiscovery, is_stale_socket
+from tarotools.taro.util.socket import SocketServer, SocketClient, Transport
+
+
+@pytest.fixture
+def bound_sockets():
+    sockets = []
+    yield sockets
+    for s in sockets:
+        s.close()
+
+
+def _bind(directory, name, bound_sockets):
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    s.bind(str(directory / name))
+    bound_sockets.append(s)
+    return directory / name
+
+
+@pytest.fixture(params=[True, False], ids=['inotify', 'mtime'])
+def sut(request, tmp_path):
+    discovery = SocketDiscovery(lambda: tmp_path, '.api', use_inotify=request.param)
+    yield discovery
+    discovery.close()
+
+
+def test_changes_detected(sut, tmp_path, bound_sockets):
+    assert sut.sockets() == []
+
+    s1 = _bind(tmp_path, 's1.api', bound_sockets)
+    _bind(tmp_path, 's2.other', bound_sockets)
+    (tmp_path / 'file.api').touch()
+    assert sut.sockets() == [s1]
+
+    s1.unlink()
+    assert sut.sockets() == []
+
+
+def test_missing_directory(tmp_path, bound_sockets):
+    directory = tmp_path / 'sockets'
+    sut = SocketDiscovery(lambda: directory, '.api')
+    assert sut.sockets() == []
+
+    directory.mkdir()
+    s1 = _bind(directory, 's1.api', bound_sockets)
+    assert sut.sockets() == [s1]
+    sut.close()
+
+
+def test_stale_socket_pruned(sut, tmp_path, bound_sockets):
+    alive = _bind(tmp_path, 'alive.api', bound_sockets)
+    stale = _bind(tmp_path, 'stale.api', bound_sockets)
+    bound_sockets.pop().close()  # The file remains after the socket is closed
+    assert sorted(sut.sockets()) == [alive, stale]
+    assert is_stale_socket(stale)
+    assert not is_stale_socket(alive)
+
+    sut.mark_stale(stale)
+    assert sut.sockets() == [alive]
+
+    assert sut.prune() == [stale]
+    assert not stale.exists()
+    assert sut.sockets() == [alive]
+
+
+def test_live_socket_marked_stale_restored(sut, tmp_path, bound_sockets):
+    alive = _bind(tmp_path, 'alive.api', bound_sockets)
+    sut.sockets()
+    sut.mark_stale(alive)
+    assert sut.sockets() == []
+
+    assert sut.prune() == []
+    assert sut.sockets() == [alive]
+
+
+def test_lazy_janitor(sut, tmp_path, bound_sockets):
+    stale = _bind(tmp_path, 'stale.api', bound_sockets)
+    bound_sockets.pop().close()
+    sut.start_janitor(lazy=True)
+    assert sut._janitor is None
+
+    sut.mark_stale(stale)  # Starts the janitor, which prunes the socket immediately
+    assert sut._janitor
+    deadline = time.monotonic() + 2
+    while stale.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not stale.exists()
+
+
+def test_inotify_created_on_first_scan_and_closed(tmp_path):
+    sut = SocketDiscovery(lambda: tmp_path, '.api')
+    assert sut._inotify is None
+
+    sut.sockets()
+    inotify_expected = sut._inotify is not None or not sut._use_inotify  # Not available on all platforms
+    sut.close()
+
+    assert inotify_expected
+    assert sut._inotify is None
+
+
+def test_probe_does_not_occupy_stream_server(tmp_path):
+    server = _Echo(tmp_path / 'stream.api')
+    assert server.start()
+    client = SocketClient(lambda: [tmp_path / 'stream.api'], bidirectional=True, timeout=1)
+    try:
+        assert not is_stale_socket(tmp_path / 'stream.api')
+        assert client.communicate('hello')[0].response == 'hello'
+    finally:
+        client.close()
+        server.close_and_wait()
+
+
+def test_probe_does_not_block_on_full_backlog(tmp_path):
+    path = tmp_path / 'busy.api'
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(path))
+    server.listen(0)
+    pending = []
+    try:
+        while True:  # Fill the backlog, the server never accepts
+            client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            client.setblocking(False)
+            pending.append(client)
+            client.connect(str(path))
+    except BlockingIOError:
+        pass
+
+    try:
+        start = time.monotonic()
+        assert not is_stale_socket(path)
+        assert time.monotonic() - start < 1
+    finally:
+        for client in pending:
+            client.close()
+        server.close()
+
+
+class _Echo(SocketServer):
+
+    def __init__(self, socket_path):
+        super().__init__(lambda: socket_path, transport=Transport.STREAM)
+
+    def handle(self, req_body):
+        return req_body
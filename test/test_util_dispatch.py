@@ -0,0 +1,70 @@
+import time
+from threading import Event
+
+import pytest
+
+from tarotools.taro.util.dispatch import DispatchQueue, OverflowPolicy
+
+
+class BlockingHandler:
+
+    def __init__(self):
+        self.release = Event()
+        self.batches = []
+
+    def __call__(self, batch):
+        self.release.wait(2)
+        self.batches.append(batch)
+
+
+@pytest.fixture
+def handler():
+    return BlockingHandler()
+
+
+def _fill(sut, handler, count):
+    sut.start()
+    sut.put(0)  # Taken by the dispatching thread which is then blocked by the handler
+    while sut.stats.queue_depth:
+        time.sleep(0.001)
+    return [sut.put(i) for i in range(1, count + 1)]
+
+
+def _close(sut, handler):
+    handler.release.set()
+    sut.close()
+    sut.wait()
+    return [item for batch in handler.batches for item in batch]
+
+
+def test_drop_newest(handler):
+    sut = DispatchQueue(handler, capacity=2, overflow=OverflowPolicy.DROP_NEWEST)
+
+    assert _fill(sut, handler, 3) == [True, True, False]
+    assert _close(sut, handler) == [0, 1, 2]
+    assert sut.stats.dropped == 1
+
+
+def test_drop_oldest(handler):
+    sut = DispatchQueue(handler, capacity=2, overflow=OverflowPolicy.DROP_OLDEST)
+
+    assert _fill(sut, handler, 3) == [True, True, True]
+    assert _close(sut, handler) == [0, 2, 3]
+    assert sut.stats.dropped == 1
+
+
+def test_block_timeout(handler):
+    sut = DispatchQueue(handler, capacity=1, overflow=OverflowPolicy.BLOCK, block_timeout=0.05)
+
+    assert _fill(sut, handler, 2) == [True, False]
+    assert _close(sut, handler) == [0, 1]
+    assert sut.stats.dropped == 1
+
+
+def test_batching(handler):
+    sut = DispatchQueue(handler, capacity=10, max_batch=3)
+
+    _fill(sut, handler, 5)
+    assert _close(sut, handler) == [0, 1, 2, 3, 4, 5]
+    assert [len(b) for b in handler.batches] == [1, 3, 2]
+    assert sut.stats.dispatched == 6
@@ -0,0 +1,149 @@
+import time
+from multiprocessing import Process
+from threading import Thread
+
+import pytest
+
+from tarotools.taro.util.ring import EventRing
+
+
+@pytest.fixture
+def sut(tmp_path):
+    ring = EventRing.open(tmp_path / 'test.ring', capacity=256)
+    yield ring
+    ring.close()
+
+
+def test_append_and_read(sut):
+    reader = sut.reader()
+    assert sut.append(b'first') == 1
+    assert sut.append(b'second') == 2
+
+    read = reader.read()
+    assert [r.payload for r in read.records] == [b'first', b'second']
+    assert [r.seq for r in read.records] == [1, 2]
+    assert read.lost == 0
+    assert not reader.read().records
+
+
+def test_reader_starts_at_end(sut):
+    sut.append(b'old')
+    reader = sut.reader()
+    sut.append(b'new')
+
+    assert [r.payload for r in reader.read().records] == [b'new']
+
+
+def test_wrap_around(sut):
+    reader = sut.reader()
+    for i in range(50):
+        payload = str(i).encode() * 10
+        sut.append(payload)
+        assert reader.read().records == [(i + 1, payload)]
+
+
+def test_lapped_reader_reports_lost(sut):
+    reader = sut.reader()
+    for i in range(30):
+        sut.append(b'x' * 20)
+
+    read = reader.read()
+    assert read.lost > 0
+    assert read.lost + len(read.records) == 30
+    sut.append(b'next')
+    assert reader.read() == ([(31, b'next')], 0)
+
+
+def test_max_records(sut):
+    reader = sut.reader()
+    for _ in range(3):
+        sut.append(b'r')
+
+    assert len(reader.read(max_records=2).records) == 2
+    assert len(reader.read().records) == 1
+
+
+def test_record_too_large(sut):
+    with pytest.raises(ValueError):
+        sut.append(b'x' * 128)
+
+
+def test_wait(sut):
+    reader = sut.reader()
+    assert not reader.wait(timeout=0.01)
+    sut.append(b'r')
+    assert reader.wait(timeout=0.01)
+
+
+def test_attach_existing(tmp_path, sut):
+    reader = sut.reader()
+    attached = EventRing.open(tmp_path / 'test.ring', capacity=1024)
+    try:
+        assert attached.capacity == 256
+        attached.append(b'from other')
+    finally:
+        attached.close()
+
+    assert [r.payload for r in reader.read().records] == [b'from other']
+
+
+def test_invalid_file(tmp_path):
+    (tmp_path / 'invalid.ring').write_bytes(b'x' * 128)
+    with pytest.raises(ValueError):
+        EventRing.open(tmp_path / 'invalid.ring')
+
+
+def _produce(path, name, count):
+    ring = EventRing.open(path)
+    for i in range(count):
+        ring.append(f'{name}:{i}'.encode())
+    ring.close()
+
+
+def test_multiple_producers(tmp_path):
+    ring = EventRing.open(tmp_path / 'shared.ring', capacity=64 * 1024)
+    reader = ring.reader()
+    producers = [Process(target=_produce, args=(tmp_path / 'shared.ring', f'p{i}', 200)) for i in range(3)]
+    for p in producers:
+        p.start()
+    for p in producers:
+        p.join()
+
+    read = reader.read()
+    ring.close()
+    assert read.lost == 0
+    assert [r.seq for r in read.records] == list(range(1, 601))
+    for name in ('p0', 'p1', 'p2'):
+        assert [r.payload for r in read.records if r.payload.startswith(name.encode())] == \
+               [f'{name}:{i}'.encode() for i in range(200)]
+
+
+def test_multiple_producer_threads(tmp_path, monkeypatch):
+    ring = EventRing.open(tmp_path / 'shared.ring', capacity=64 * 1024)
+    reader = ring.reader()
+    read_position = ring._position
+
+    def position_and_switch():
+        position = read_position()
+        time.sleep(0.0001)  # Lets the other thread run in the middle of the append
+        return position
+
+    monkeypatch.setattr(ring, '_position', position_and_switch)
+
+    def produce(name):
+        for i in range(300):
+            ring.append(f'{name}:{i}'.encode())
+
+    producers = [Thread(target=produce, args=(f't{i}',)) for i in range(2)]
+    for t in producers:
+        t.start()
+    for t in producers:
+        t.join()
+
+    read = reader.read()
+    ring.close()
+    assert read.lost == 0
+    assert [r.seq for r in read.records] == list(range(1, 601))
+    for name in ('t0', 't1'):
+        assert [r.payload for r in read.records if r.payload.startswith(name.encode())] == \
+               [f'{name}:{i}'.encode() for i in range(300)]
@@ -0,0 +1,229 @@
+import socket
+import time
+from threading import Thread
+
+import pytest
+
+from tarotools.taro.util.socket import SocketServer, SocketClient, Error, Transport, RECV_BUFFER_LENGTH
+
+
+class EchoServer(SocketServer):
+
+    def __init__(self, socket_path, delay=0.0, transport=Transport.DATAGRAM, **kwargs):
+        super().__init__(lambda: socket_path, allow_ping=True, transport=transport, **kwargs)
+        self.delay = delay
+
+    def is_priority(self, req_body):
+        return req_body == 'stop'
+
+    def handle(self, req_body):
+        if req_body != 'stop':
+            time.sleep(self.delay)
+        if req_body == 'slow':
+            time.sleep(0.4)
+        if req_body == 'fail':
+            raise ValueError('failed')
+        if req_body == 'large':
+            return 'x' * RECV_BUFFER_LENGTH * 3
+        return 'echo:' + req_body
+
+
+@pytest.fixture
+def servers(tmp_path):
+    started = []
+
+    def start(name, delay=0.0, transport=Transport.DATAGRAM, **kwargs):
+        server = EchoServer(tmp_path / (name + '.test'), delay, transport, **kwargs)
+        assert server.start()
+        started.append(server)
+        return server
+
+    yield start
+
+    for s in started:
+        s.close_and_wait()
+
+
+def _client(tmp_path, **kwargs):
+    return SocketClient(lambda: sorted(tmp_path.glob('*.test')), bidirectional=True, **kwargs)
+
+
+def test_communicate(tmp_path, servers):
+    servers('s1')
+    servers('s2')
+
+    client = _client(tmp_path)
+    try:
+        responses = client.communicate('hello')
+    finally:
+        client.close()
+
+    assert [(r.server_id, r.response) for r in responses] == [('s1', 'echo:hello'), ('s2', 'echo:hello')]
+
+
+def test_concurrent_communicate(tmp_path, servers):
+    for i in range(5):
+        servers(f's{i}', delay=0.2)
+
+    client = _client(tmp_path, concurrent=True)
+    try:
+        start = time.monotonic()
+        responses = client.communicate('hello')
+        elapsed = time.monotonic() - start
+    finally:
+        client.close()
+
+    assert [r.server_id for r in responses] == [f's{i}' for i in range(5)]
+    assert all(r.response == 'echo:hello' for r in responses)
+    assert elapsed < 0.8  # Not a sum of all delays
+
+
+def test_concurrent_communicate_timeout(tmp_path, servers):
+    servers('fast')
+    servers('slow', delay=0.5)
+
+    client = _client(tmp_path, concurrent=True, timeout=0.3)
+    try:
+        responses = client.communicate('hello')
+    finally:
+        client.close()
+
+    assert responses[0].response == 'echo:hello'
+    assert responses[1] == ('slow', None, Error.TIMEOUT)
+    assert client.timed_out_servers == ['slow']
+    time.sleep(0.3)  # Let the slow server reply to the closed client
+
+
+def _stuck_server(path):
+    """Returns a bound socket which does not read, with its receive queue full"""
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    server.bind(str(path))
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sender:
+        sender.setblocking(False)
+        try:
+            while True:
+                sender.sendto(b'x' * 1024, str(path))
+        except BlockingIOError:
+            pass
+    return server
+
+
+def test_concurrent_communicate_sending_within_deadline(tmp_path):
+    stuck = [_stuck_server(tmp_path / f'stuck{i}.test') for i in range(3)]
+    client = _client(tmp_path, concurrent=True, timeout=0.3)
+    try:
+        start = time.monotonic()
+        responses = client.communicate('hello')
+        elapsed = time.monotonic() - start
+    finally:
+        client.close()
+        for server in stuck:
+            server.close()
+
+    assert [r.error for r in responses] == [Error.TIMEOUT] * 3
+    assert elapsed < 0.6  # Not a sum of the timeouts of the stuck servers
+
+
+@pytest.mark.parametrize('concurrent', [False, True])
+def test_stream_transport(tmp_path, servers, concurrent):
+    servers('s1')
+    servers('s2', transport=Transport.STREAM)
+
+    client = _client(tmp_path, concurrent=concurrent)
+    try:
+        responses = client.communicate('hello')
+        large_responses = client.communicate('large', include=('s2',))
+    finally:
+        client.close()
+
+    assert [(r.server_id, r.response) for r in responses] == [('s1', 'echo:hello'), ('s2', 'echo:hello')]
+    assert len(large_responses[0].response) == RECV_BUFFER_LENGTH * 3
+
+
+def test_idle_stream_connection_not_blocking(tmp_path, servers):
+    servers('s1', transport=Transport.STREAM)
+    idle = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    idle.connect(str(tmp_path / 's1.test'))
+    idle.sendall(b'\x00\x00')  # Incomplete frame header
+
+    client = _client(tmp_path, timeout=1)
+    try:
+        assert client.communicate('hello')[0].response == 'echo:hello'
+        assert client.communicate('hello')[0].response == 'echo:hello'
+    finally:
+        client.close()
+        idle.close()
+
+
+@pytest.mark.parametrize('transport', [Transport.DATAGRAM, Transport.STREAM])
+def test_workers_priority_requests(tmp_path, servers, transport):
+    server = servers('s1', delay=0.5, transport=transport, workers=1)
+
+    slow_client = _client(tmp_path, timeout=2)
+    fast_client = _client(tmp_path, timeout=0.3)
+    try:
+        slow_request = Thread(target=slow_client.communicate, args=('slow',))
+        slow_request.start()
+        time.sleep(0.1)
+        assert server.queue_depth == 0  # Taken by the worker
+
+        assert fast_client.communicate('ping')[0].response == 'pong'
+        assert fast_client.communicate('stop')[0].response == 'echo:stop'
+        slow_request.join()
+    finally:
+        slow_client.close()
+        fast_client.close()
+
+    assert server.stats.handled == 3
+
+
+def test_workers_request_timeout(tmp_path, servers):
+    server = servers('s1', delay=0.3, workers=1, request_timeout=0.1)
+
+    client = _client(tmp_path, concurrent=True, timeout=1)
+    other_client = _client(tmp_path, concurrent=True, timeout=1)
+    try:
+        t = Thread(target=client.communicate, args=('first',))
+        t.start()
+        time.sleep(0.05)
+        responses = other_client.communicate('second')  # Expires in the queue behind the first request
+        t.join()
+    finally:
+        client.close()
+        other_client.close()
+
+    assert responses[0].error == Error.TIMEOUT
+    assert server.stats.handled == 1
+    assert server.stats.expired == 1
+
+
+def test_workers_failed_request_closes_connection(tmp_path, servers):
+    servers('s1', transport=Transport.STREAM, workers=1)
+
+    client = _client(tmp_path, timeout=2)
+    try:
+        start = time.monotonic()
+        responses = client.communicate('fail')
+        elapsed = time.monotonic() - start
+        assert client.communicate('hello')[0].response == 'echo:hello'
+    finally:
+        client.close()
+
+    assert responses[0].error == Error.CLOSED
+    assert elapsed < 1
+
+
+@pytest.mark.parametrize('concurrent', [False, True])
+def test_late_response_not_accepted(tmp_path, servers, concurrent):
+    servers('s1')
+
+    client = _client(tmp_path, concurrent=concurrent, timeout=0.2)
+    try:
+        assert client.communicate('slow')[0].error == Error.TIMEOUT
+        time.sleep(0.4)  # The late response is waiting in the socket buffer
+
+        responses = client.communicate('hello', accept=lambda resp: resp == 'echo:hello')
+    finally:
+        client.close()
+
+    assert responses[0].response == 'echo:hello'